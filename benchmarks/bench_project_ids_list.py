@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""Compare the date bounded and the full scan lookup of the runs of a project
+in the 'names/project_ids_list' view of a run database.
+
+Example:
+    python benchmarks/bench_project_ids_list.py -p P12345 -o 2024-01-01 --db x_flowcells
+"""
+
+import argparse
+import json
+import time
+
+from ngi_reports.utils import statusdb
+
+run_connections = {
+    "x_flowcells": statusdb.X_FlowcellRunMetricsConnection,
+    "element_runs": statusdb.ElementRunConnection,
+    "nanopore_runs": statusdb.NanoporeRunConnection,
+}
+
+
+def time_lookup(db, fetch_mode, project_id, open_date, repeats):
+    """Time get_project_flowcell with a fresh connection for every repeat"""
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        con = run_connections[db](fetch_mode=fetch_mode)
+        flowcells = con.get_project_flowcell(project_id, open_date)
+        timings.append(time.perf_counter() - start)
+    return flowcells, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        "Benchmark bounded vs full project_ids_list lookups"
+    )
+    parser.add_argument("-p", "--project", required=True, help="NGI project ID")
+    parser.add_argument(
+        "-o", "--open_date", default="2015-01-01", help="Project open date YYYY-MM-DD"
+    )
+    parser.add_argument("--db", default="x_flowcells", choices=run_connections.keys())
+    parser.add_argument("-r", "--repeats", default=3, type=int)
+    args = parser.parse_args()
+
+    # Authenticate once up front so that neither mode pays for it
+    statusdb.statusdb_connection()
+
+    results = {}
+    flowcells = {}
+    for fetch_mode in ["full", "bounded"]:
+        flowcells[fetch_mode], timings = time_lookup(
+            args.db, fetch_mode, args.project, args.open_date, args.repeats
+        )
+        results[fetch_mode] = {
+            "min_s": round(min(timings), 4),
+            "mean_s": round(sum(timings) / len(timings), 4),
+            "flowcells": len(flowcells[fetch_mode]),
+        }
+    results["identical"] = flowcells["full"] == flowcells["bounded"]
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+
+"""Time the stages of generating a project summary report for synthetic projects,
+served from memory by the file backend so that no StatusDB is needed.
+
+Every stage is timed on its own: populating the project, rendering the markdown
+report with the Report module of the platform, building the text of the tables
+(included in the rendering time), writing the TXT files and converting the markdown
+to HTML. Peak memory is measured with tracemalloc in a separate pass, as tracing
+slows everything down. Results are printed as JSON.
+
+Example, a NovaSeq X project with 3000 samples on four flowcells:
+    python benchmarks/bench_reports.py --platform illumina --samples 3000 --flowcells 4 \\
+        --lanes 8 --other_projects 2 -o novaseqx_3000.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import synthetic
+from ngi_reports import __version__, api
+from ngi_reports.reports import (
+    element_project_summary,
+    ont_project_summary,
+    project_summary,
+)
+from ngi_reports.utils import backends, templates
+from ngi_reports.utils.entities import Project
+
+report_modules = {
+    "illumina": project_summary,
+    "element": element_project_summary,
+    "ont": ont_project_summary,
+}
+
+reports_dir = os.path.realpath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "data", "report_templates")
+)
+
+STAGES = [
+    "populate",
+    "generate_report_template",
+    "create_table_text",
+    "create_txt_files",
+    "markdown_to_html",
+]
+
+
+class StageTimer(object):
+    """Wall time and peak traced memory of the stages of one report"""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.wall = dict.fromkeys(STAGES, 0.0)
+        self.peak = dict.fromkeys(STAGES, 0)
+
+    def run(self, stage, func, *args, **kwargs):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            start_size = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.wall[stage] += time.perf_counter() - start
+            if self.trace_memory:
+                self.peak[stage] = max(
+                    self.peak[stage], tracemalloc.get_traced_memory()[1] - start_size
+                )
+
+
+def generate_report(
+    backend, project_id, platform_name, out_dir, log, timer, direct_html=False, **kwargs
+):
+    """Generate all files of the report of a project, timing every stage"""
+    proj = Project()
+    timer.run(
+        "populate",
+        proj.populate,
+        log,
+        {"GRCh38": "Homo sapiens"},
+        project=project_id,
+        statusdb_client=backend,
+        exclude_fc=[],
+        **kwargs,
+    )
+
+    report = report_modules[platform_name].Report(
+        log, out_dir, signature="Benchmark", project=project_id
+    )
+    # Time the table text on its own, it is built while the report is rendered
+    create_table_text = report.create_table_text
+    report.create_table_text = lambda *args, **kwargs: timer.run(
+        "create_table_text", create_table_text, *args, **kwargs
+    )
+    env = templates.get_environment(reports_dir)
+    template = env.get_template("project_summary.md")
+    output_mds = timer.run(
+        "generate_report_template",
+        report.generate_report_template,
+        proj,
+        template,
+        "support@example.com",
+    )
+    timer.run("create_txt_files", report.create_txt_files, op_dir=out_dir)
+    for output_basename, output_md in output_mds.items():
+        if direct_html:
+            output_md = timer.run(
+                "generate_report_template",
+                report.render_template,
+                proj,
+                template,
+                html_tables=True,
+            )
+        timer.run(
+            "markdown_to_html",
+            api.markdown_to_html,
+            "project_summary",
+            jinja2_env=env,
+            markdown_text=output_md,
+            reports_dir=reports_dir,
+            out_path=os.path.join(out_dir, f"{os.path.basename(output_basename)}.html"),
+            html_tables=direct_html,
+        )
+
+
+def benchmark_platform(platform_name, args, log):
+    fixture, project_id = synthetic.project_fixture(
+        platform=platform_name,
+        samples=args.samples,
+        preps=args.preps,
+        flowcells=args.flowcells,
+        lanes=args.lanes,
+        barcodes=args.barcodes,
+        other_projects=args.other_projects,
+        other_samples=args.other_samples,
+        other_runs=args.other_runs,
+        seed=args.seed,
+    )
+    if args.write_fixture:
+        with open(f"{args.write_fixture}_{platform_name}.json", "w") as fh:
+            json.dump(fixture, fh)
+    backend = backends.FileBackend(fixture, latency=args.latency)
+    kwargs = {"workers": args.workers, "async_fetch": args.async_fetch}
+
+    out_dir = tempfile.mkdtemp(prefix="ngi_reports_bench_")
+    try:
+        timings = []
+        for i in range(args.repeats):
+            timer = StageTimer()
+            generate_report(
+                backend,
+                project_id,
+                platform_name,
+                out_dir,
+                log,
+                timer,
+                direct_html=args.direct_html,
+                **kwargs,
+            )
+            timings.append(timer.wall)
+        result = {
+            stage: {
+                "min_s": round(min(t[stage] for t in timings), 4),
+                "median_s": round(statistics.median(t[stage] for t in timings), 4),
+            }
+            for stage in STAGES
+        }
+        if not args.no_memory:
+            timer = StageTimer(trace_memory=True)
+            tracemalloc.start()
+            try:
+                generate_report(
+                    backend,
+                    project_id,
+                    platform_name,
+                    out_dir,
+                    log,
+                    timer,
+                    direct_html=args.direct_html,
+                    **kwargs,
+                )
+            finally:
+                tracemalloc.stop()
+            for stage in STAGES:
+                result[stage]["peak_mb"] = round(timer.peak[stage] / 1024**2, 2)
+        result["output_mb"] = round(
+            sum(
+                os.path.getsize(os.path.join(out_dir, fname))
+                for fname in os.listdir(out_dir)
+            )
+            / 1024**2,
+            2,
+        )
+    finally:
+        shutil.rmtree(out_dir)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        "Benchmark project summary report generation on synthetic projects"
+    )
+    parser.add_argument(
+        "--platform",
+        nargs="+",
+        default=["illumina", "element", "ont"],
+        choices=report_modules.keys(),
+    )
+    parser.add_argument("--samples", default=96, type=int)
+    parser.add_argument("--preps", default=1, type=int, help="Preps per sample")
+    parser.add_argument(
+        "--flowcells", default=2, type=int, help="Runs the project was sequenced on"
+    )
+    parser.add_argument(
+        "--lanes", default=8, type=int, help="Lanes per run (Illumina and Element)"
+    )
+    parser.add_argument(
+        "--barcodes",
+        default=1,
+        type=int,
+        help="Barcode rows per sample and lane (Illumina and Element)",
+    )
+    parser.add_argument(
+        "--other_projects", default=5, type=int, help="Other projects on every run"
+    )
+    parser.add_argument(
+        "--other_samples",
+        default=96,
+        type=int,
+        help="Samples of each of the other projects",
+    )
+    parser.add_argument(
+        "--other_runs",
+        default=50,
+        type=int,
+        help="Runs in the same database without the project",
+    )
+    parser.add_argument("--seed", default=1, type=int)
+    parser.add_argument("-r", "--repeats", default=3, type=int)
+    parser.add_argument(
+        "--latency",
+        default=0,
+        type=float,
+        help="Seconds added to every StatusDB request",
+    )
+    parser.add_argument("--workers", default=1, type=int)
+    parser.add_argument("--async_fetch", action="store_true")
+    parser.add_argument(
+        "--direct_html",
+        action="store_true",
+        help="Render the tables of the HTML report directly, as with ngi_reports --direct_html",
+    )
+    parser.add_argument(
+        "--no_memory", action="store_true", help="Skip the memory tracing pass"
+    )
+    parser.add_argument(
+        "--write_fixture",
+        default=None,
+        help="Also write the fixtures to <prefix>_<platform>.json, for use with 'backend: file'",
+    )
+    parser.add_argument(
+        "-o", "--output", default=None, help="Write the results to this JSON file"
+    )
+    args = parser.parse_args()
+
+    log = logging.getLogger("NGI Reports benchmark")
+    log.setLevel(logging.CRITICAL)
+
+    results = {
+        "ngi_reports_version": __version__,
+        "python": platform.python_version(),
+        "parameters": {
+            key: value for key, value in vars(args).items() if key != "output"
+        },
+        "platforms": {},
+    }
+    for platform_name in args.platform:
+        results["platforms"][platform_name] = benchmark_platform(
+            platform_name, args, log
+        )
+    # ru_maxrss is in KB on Linux
+    results["max_rss_mb"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2
+    )
+
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=4)
+
+
+if __name__ == "__main__":
+    main()
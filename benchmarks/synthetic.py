@@ -0,0 +1,435 @@
+"""Generate synthetic StatusDB data for benchmarks: a project document and the run
+documents of its flowcells, shaped like the documents in the projects, x_flowcells,
+element_runs and nanopore_runs databases. The result is a fixture for
+ngi_reports.utils.backends.FileBackend, and can be written to a file to be used
+with 'backend: file' in statusdb.yaml.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+PLATFORMS = {
+    "illumina": ("x_flowcells", "NovaSeq X Plus"),
+    "element": ("element_runs", "Element AVITI"),
+    "ont": ("nanopore_runs", "PromethION"),
+}
+
+BASES = "ACGT"
+
+
+def random_index(rnd, length=10):
+    return "".join(rnd.choice(BASES) for i in range(length))
+
+
+def project_document(
+    project_id, project_name, platform, samples, preps, run_names, open_date, rnd
+):
+    """Project document with the given number of samples and preps per sample"""
+    sample_docs = {}
+    for i in range(1, samples + 1):
+        sample_id = f"{project_id}_{1000 + i}"
+        library_prep = {}
+        for p in range(preps):
+            prep_id = chr(ord("A") + p)
+            library_prep[prep_id] = {
+                "reagent_label": f"{random_index(rnd)}-{random_index(rnd)}",
+                "prep_status": rnd.choice(["PASSED"] * 9 + ["FAILED"]),
+                "sample_run_metrics": {
+                    f"{sample_id}_{prep_id}_{run_name}": {} for run_name in run_names
+                },
+                "library_validation": {
+                    "24-123456": {
+                        "start_date": open_date,
+                        "average_size_bp": round(rnd.uniform(300, 600), 4),
+                    }
+                },
+            }
+        details = {"total_reads_(m)": round(rnd.uniform(10, 500), 2)}
+        if rnd.random() < 0.01:
+            details["status_(manual)"] = "Aborted"
+        sample_docs[sample_id] = {
+            "customer_name": f"sample_{i}",
+            "initial_qc": {
+                "initial_qc_status": rnd.choice(["PASSED"] * 9 + ["FAILED"]),
+                "concentration": round(rnd.uniform(1, 100), 2),
+                "conc_units": "ng/ul",
+                "volume_(ul)": 50,
+                "amount_(ng)": round(rnd.uniform(100, 5000), 2),
+                "rin": None,
+            },
+            "library_prep": library_prep,
+            "details": details,
+        }
+    return {
+        "_id": f"doc_{project_id}",
+        "_rev": "1-synthetic",
+        "project_name": project_name,
+        "project_id": project_id,
+        "source": "lims",
+        "open_date": open_date,
+        "application": "WG re-seq",
+        "no_of_samples": samples,
+        "reference_genome": "GRCh38",
+        "delivery_type": "GRUS",
+        "order_details": {"owner": {"email": "pi@example.com"}},
+        "details": {
+            "sequencing_platform": PLATFORMS[platform][1],
+            "type": "Production",
+            "flowcell": "25B",
+            "library_construction_method": "Genomic DNA, Illumina TruSeq, PCR-free, Standard, A [1]",
+            "sequence_units_ordered_(lanes)": len(run_names),
+            "customer_project_reference": "synthetic",
+            "order_received": open_date,
+            "accredited_(library_preparation)": "Yes",
+            "accredited_(data_processing)": "Yes",
+            "accredited_(sequencing)": "Yes",
+            "accredited_(data_analysis)": "No",
+        },
+        "samples": sample_docs,
+    }
+
+
+def lane_samples(sample_ids, barcodes, other_projects, other_samples, rnd):
+    """(project, sample, barcode) of every barcode row of a lane, the samples of the
+    project followed by the samples of the other projects on the run"""
+    rows = []
+    for sample_id in sample_ids:
+        for b in range(barcodes):
+            rows.append((None, sample_id, f"{random_index(rnd)}+{random_index(rnd)}"))
+    for o in range(other_projects):
+        for s in range(1, other_samples + 1):
+            rows.append(
+                (
+                    o,
+                    f"P{90000 + o}_{1000 + s}",
+                    f"{random_index(rnd)}+{random_index(rnd)}",
+                )
+            )
+    return rows
+
+
+def illumina_run(
+    run_name,
+    project_name,
+    sample_ids,
+    lanes,
+    barcodes,
+    other_projects,
+    other_samples,
+    rnd,
+):
+    barcode_rows = []
+    samplesheet = []
+    for lane in range(1, lanes + 1):
+        for project, sample_id, barcode in lane_samples(
+            sample_ids, barcodes, other_projects, other_samples, rnd
+        ):
+            name = (
+                project_name.replace(".", "__", 1)
+                if project is None
+                else f"X.Other_{project}_24_01".replace(".", "__", 1)
+            )
+            barcode_rows.append(
+                {
+                    "Project": name,
+                    "Lane": str(lane),
+                    "Sample": sample_id,
+                    "Barcode sequence": barcode,
+                    "PF Clusters": f"{rnd.randint(10**5, 10**7):,}",
+                    "% of the lane": f"{rnd.uniform(0, 2):.2f}",
+                    "% Perfect barcode": "100.00",
+                    "% One mismatch barcode": "0.00",
+                    "Yield (Mbases)": f"{rnd.randint(10**2, 10**4):,}",
+                    "% >= Q30bases": f"{rnd.uniform(80, 95):.2f}",
+                    "Mean Quality Score": f"{rnd.uniform(35, 40):.2f}",
+                }
+            )
+            samplesheet.append(
+                {
+                    "Lane": str(lane),
+                    "Sample_ID": f"Sample_{sample_id}",
+                    "Sample_Name": sample_id,
+                    "Sample_Project": name,
+                    "index": barcode.split("+")[0],
+                    "index2": barcode.split("+")[1],
+                }
+            )
+    return {
+        "_id": f"doc_{run_name}",
+        "_rev": "1-synthetic",
+        "name": run_name,
+        "RunInfo": {
+            "Id": run_name,
+            "Instrument": "LH00001",
+            "Reads": [
+                {"Number": "1", "NumCycles": "151", "IsIndexedRead": "N"},
+                {"Number": "2", "NumCycles": "10", "IsIndexedRead": "Y"},
+                {"Number": "3", "NumCycles": "10", "IsIndexedRead": "Y"},
+                {"Number": "4", "NumCycles": "151", "IsIndexedRead": "N"},
+            ],
+        },
+        "RunParameters": {
+            "RecipeName": "25B Sequencing",
+            "Application": "NovaSeqXSeries",
+            "SystemSuiteVersion": "1.2.0",
+        },
+        "DemultiplexConfig": {"Setup": {"Software": {"Version": "bcl2fastq 2.20"}}},
+        "illumina": {
+            "Demultiplex_Stats": {
+                "Barcode_lane_statistics": barcode_rows,
+                "Lanes_stats": [
+                    {
+                        "Lane": str(lane),
+                        "PF Clusters": f"{rnd.randint(10**9, 3 * 10**9):,}",
+                        "% >= Q30bases": f"{rnd.uniform(85, 95):.2f}",
+                    }
+                    for lane in range(1, lanes + 1)
+                ],
+            }
+        },
+        "lims_data": {
+            "run_summary": {
+                str(lane): {
+                    "% Error Rate R1": f"{rnd.uniform(0.1, 0.5):.2f}",
+                    "% Error Rate R2": f"{rnd.uniform(0.1, 0.5):.2f}",
+                }
+                for lane in range(1, lanes + 1)
+            }
+        },
+        "samplesheet_csv": samplesheet,
+    }
+
+
+def element_run(
+    run_name,
+    project_name,
+    sample_ids,
+    lanes,
+    barcodes,
+    other_projects,
+    other_samples,
+    rnd,
+):
+    index_assignment = []
+    for lane in range(1, lanes + 1):
+        for project, sample_id, barcode in lane_samples(
+            sample_ids, barcodes, other_projects, other_samples, rnd
+        ):
+            name = (
+                project_name.replace(".", "_", 1)
+                if project is None
+                else f"X_Other_{project}_24_01"
+            )
+            i1, i2 = barcode.split("+")
+            index_assignment.append(
+                {
+                    "Project": name,
+                    "Lane": str(lane),
+                    "SampleName": sample_id,
+                    "I1": i1,
+                    "I2": i2,
+                    "NumPoloniesAssigned": rnd.randint(10**5, 10**7),
+                    "PercentPoloniesAssigned": rnd.uniform(0, 2),
+                    "PercentQ30": rnd.uniform(80, 95),
+                    "PercentMismatch": rnd.uniform(0, 1),
+                }
+            )
+    return {
+        "_id": f"doc_{run_name}",
+        "_rev": "1-synthetic",
+        "NGI_run_id": run_name,
+        "instrument_generated_files": {
+            "RunParameters.json": {
+                "Cycles": {"R1": 151, "R2": 151, "I1": 10, "I2": 10},
+                "ChemistryVersion": "Cloudbreak",
+                "ThroughputSelection": "High",
+            },
+            "AvitiRunStats.json": {
+                "LaneStats": [
+                    {"Lane": lane, "PFCount": rnd.randint(10**8, 10**9)}
+                    for lane in range(1, lanes + 1)
+                ]
+            },
+        },
+        "Software": {"Version": "2.1.0"},
+        "Element": {"Demultiplex_Stats": {"Index_Assignment": index_assignment}},
+        "lims_data": {
+            "run_summary": {
+                str(lane): {
+                    "% Error Rate R1": f"{rnd.uniform(0.1, 0.5):.2f}",
+                    "% Error Rate R2": f"{rnd.uniform(0.1, 0.5):.2f}",
+                }
+                for lane in range(1, lanes + 1)
+            }
+        },
+    }
+
+
+def ont_run(run_name, fc_id, sample_ids, rnd):
+    snapshots = [
+        {
+            "filtering": [
+                {"barcode_name": f"barcode{i + 1:02d}", "barcode_alias": sample_id}
+            ],
+            "snapshots": [
+                {
+                    "yield_summary": {
+                        "basecalled_pass_read_count": str(rnd.randint(10**5, 10**7)),
+                        "basecalled_pass_bases": str(rnd.randint(10**9, 10**11)),
+                    }
+                }
+            ],
+        }
+        for i, sample_id in enumerate(sample_ids)
+    ]
+    return {
+        "_id": f"doc_{run_name}",
+        "_rev": "1-synthetic",
+        "lims": {
+            "loading": [
+                {
+                    "sample_data": [
+                        {"sample_name": sample_id, "ont_barcode": f"NB{i + 1:02d}"}
+                        for i, sample_id in enumerate(sample_ids)
+                    ]
+                }
+            ]
+        },
+        "acquisitions": [
+            {},
+            {
+                "read_length_histogram": [
+                    {
+                        "plot": {
+                            "histogram_data": [{"n50": str(rnd.randint(10**3, 10**5))}]
+                        }
+                    }
+                ],
+                "acquisition_run_info": {
+                    "yield_summary": {
+                        "read_count": str(rnd.randint(10**6, 10**8)),
+                        "basecalled_pass_read_count": str(rnd.randint(10**6, 10**8)),
+                        "basecalled_pass_bases": str(rnd.randint(10**9, 10**11)),
+                    }
+                },
+                "acquisition_output": [{}, {"plot": [{"snapshots": snapshots}]}],
+            },
+        ],
+        "protocol_run_info": {
+            "flow_cell": {
+                "user_specified_product_code": "FLO-PRO114M",
+                "user_specified_flow_cell_id": fc_id,
+            },
+            "args": ["--min_qscore=9", "--split_files_by_barcode=on"],
+            "software_versions": {"minknow": {"full": "24.02.6"}},
+        },
+    }
+
+
+def project_fixture(
+    platform="illumina",
+    samples=96,
+    preps=1,
+    flowcells=2,
+    lanes=8,
+    barcodes=1,
+    other_projects=5,
+    other_samples=96,
+    other_runs=50,
+    project_id="P10000",
+    seed=1,
+):
+    """Generate a project sequenced on the given number of flowcells, each run shared
+    with other projects, among runs of other projects only.
+    Returns the fixture and the NGI ID of the project.
+
+    :param str platform: 'illumina', 'element' or 'ont'
+    :param int samples: Samples of the project
+    :param int preps: Library preps per sample
+    :param int flowcells: Runs the project was sequenced on
+    :param int lanes: Lanes per run, Illumina and Element only
+    :param int barcodes: Barcode rows per sample and lane, Illumina and Element only
+    :param int other_projects: Other projects on each run of the project
+    :param int other_samples: Samples of each of the other projects
+    :param int other_runs: Runs in the same database without the project
+    :param str project_id: NGI ID of the project
+    :param int seed: Seed of the random values
+    """
+    rnd = random.Random(seed)
+    dbname = PLATFORMS[platform][0]
+    project_name = f"A.Synthetic_{project_id[1:]}_24_01"
+    open_date = datetime(2024, 1, 1)
+
+    def run_name(date, i, own):
+        fc_id = f"{'S' if own else 'U'}{i:04d}"
+        if platform == "illumina":
+            return f"{date:%y%m%d}_22{fc_id}LT3", fc_id
+        elif platform == "element":
+            return f"{date:%Y%m%d}_AV242106_A{fc_id}", fc_id
+        return f"{date:%Y%m%d}_1216_1A_PA{fc_id}_{rnd.getrandbits(32):08x}", fc_id
+
+    sample_ids = [f"{project_id}_{1000 + i}" for i in range(1, samples + 1)]
+    runs = {}
+    view_rows = []
+    for i in range(flowcells):
+        name, fc_id = run_name(open_date + timedelta(days=7 * (i + 1)), i, True)
+        if platform == "illumina":
+            runs[name] = illumina_run(
+                name,
+                project_name,
+                sample_ids,
+                lanes,
+                barcodes,
+                other_projects,
+                other_samples,
+                rnd,
+            )
+        elif platform == "element":
+            runs[name] = element_run(
+                name,
+                project_name,
+                sample_ids,
+                lanes,
+                barcodes,
+                other_projects,
+                other_samples,
+                rnd,
+            )
+        else:
+            runs[name] = ont_run(name, f"PA{fc_id}", sample_ids, rnd)
+        view_rows.append(
+            {
+                "key": name,
+                "id": runs[name]["_id"],
+                "value": [project_id]
+                + [f"P{90000 + o}" for o in range(other_projects)],
+            }
+        )
+    for i in range(other_runs):
+        # Half of the runs of other projects are from before the project was opened
+        name, fc_id = run_name(
+            open_date + timedelta(days=3 * i - 3 * other_runs // 2), i, False
+        )
+        runs[name] = {"_id": f"doc_{name}", "_rev": "1-synthetic"}
+        view_rows.append(
+            {"key": name, "id": runs[name]["_id"], "value": [f"P{80000 + i}"]}
+        )
+
+    project = project_document(
+        project_id,
+        project_name,
+        platform,
+        samples,
+        preps,
+        list(runs)[:flowcells],
+        f"{open_date:%Y-%m-%d}",
+        rnd,
+    )
+    fixture = {
+        "views": {f"{dbname}/names/project_ids_list": view_rows},
+        "docs": {
+            "projects": {project["_id"]: project},
+            dbname: {doc["_id"]: doc for doc in runs.values()},
+        },
+    }
+    return fixture, project_id
@@ -0,0 +1,569 @@
+"""In-process API for generating reports, wrapped by the ngi_reports command.
+
+Nothing here changes the working directory, asks for input or exits the process.
+The directories to write to are given explicitly and failures are raised as the
+exceptions in ngi_reports.utils.errors, so that the reports of several projects can
+be generated concurrently from the threads of one process, e.g.:
+
+    with ThreadPoolExecutor(4) as executor:
+        results = executor.map(
+            lambda project: generate_report(
+                "project_summary", project, os.path.join(out_dir, project), signature="NGI"
+            ),
+            projects,
+        )
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from ngi_reports.log import loggers
+from ngi_reports.utils import config as report_config
+from ngi_reports.utils import (
+    converter,
+    errors,
+    fingerprint,
+    regenerate,
+    snapshot,
+    statusdb,
+    templates,
+    timings,
+)
+from ngi_reports.utils.entities import Project, fetch_run_documents
+
+LOG = loggers.minimal_logger("NGI Reports")
+
+REPORTS_DIR = templates.REPORTS_DIR
+
+REPORT_TYPES = ["project_summary"]
+
+REPORT_MODULES = {
+    "illumina": "ngi_reports.reports.project_summary",
+    "ont": "ngi_reports.reports.ont_project_summary",
+    "element": "ngi_reports.reports.element_project_summary",
+}
+
+
+class ReportResult(object):
+    """The report written for a project
+
+    :param str project: ID of the project
+    :param str project_name: Name of the project
+    :param str platform: Sequencer manufacturer of the project
+    :param str report_dir: Directory the files were written to
+    :param list files: Paths of the markdown, HTML and TXT files written
+    :param str status: 'written', or 'unchanged' or 'html regenerated' if the files
+        of an earlier run were up to date, see reuse_reports
+    """
+
+    def __init__(
+        self, project, project_name, platform, report_dir, files, status="written"
+    ):
+        self.project = project
+        self.project_name = project_name
+        self.platform = platform
+        self.report_dir = report_dir
+        self.files = files
+        self.status = status
+
+    def __repr__(self):
+        return f"ReportResult({self.project!r}, {self.report_dir!r}, {len(self.files)} files)"
+
+
+def load_config(config_file=None):
+    """Load the ngi_reports configuration, by default ~/.ngi_config/ngi_reports.conf"""
+    with timings.stage("config load"):
+        return report_config.load_config(config_file)
+
+
+def check_report_type(report_type):
+    if report_type not in REPORT_TYPES:
+        raise errors.ReportTypeError(
+            f"Report type '{report_type}' is not yet implemented. Aborting."
+        )
+
+
+def use_snapshot(kwargs, log=LOG):
+    """Get the options with the StatusDB data replayed from a snapshot bundle instead
+    of queried from StatusDB, if one was given with 'from_snapshot'"""
+    if kwargs.get("from_snapshot"):
+        log.info(f"Reading StatusDB data from snapshot {kwargs['from_snapshot']}")
+        kwargs = dict(
+            kwargs,
+            statusdb_client=snapshot.SnapshotClient.load(kwargs["from_snapshot"]),
+            cache=False,
+        )
+        if kwargs.get("fc_fetch_mode") == "index":
+            # The flowcell index is of all runs in StatusDB, the snapshot only has some
+            kwargs["fc_fetch_mode"] = "bounded"
+    return kwargs
+
+
+def generate_report(
+    report_type,
+    project,
+    working_dir,
+    config_file=None,
+    config=None,
+    confirm_working_dir=None,
+    log=LOG,
+    **kwargs,
+):
+    """Populate a project from StatusDB and write its report to <working_dir>/reports.
+    With 'reuse', the report is not written again if its inputs are the same as when
+    it was last written there, see reuse_reports.
+
+    :param str report_type: Type of report, see REPORT_TYPES
+    :param str project: ID or name of the project
+    :param str working_dir: Directory to write the report to
+    :param str config_file: ngi_reports configuration to use instead of the default one
+    :param config: Configuration already loaded with load_config, used instead of config_file
+    :param confirm_working_dir: Function called with a question if working_dir is not
+        named after the project, the report is only written if it returns True.
+        By default the directory is not checked
+    :param log: Logger to use
+    :param kwargs: The other options of the ngi_reports command, e.g. signature or workers
+    :returns: ReportResult
+    :raises errors.ReportError: If the report could not be generated
+    """
+    log.info(f"Report type: {report_type}")
+    check_report_type(report_type)
+    if config is None:
+        config = load_config(config_file)
+    kwargs = use_snapshot(dict(kwargs, project=project), log=log)
+
+    proj = Project()
+    if kwargs.get("async_fetch"):
+        # The flowcells are fetched along with the project, only the writing can be skipped
+        proj.populate(log, config._sections["organism_names"], **kwargs)
+    else:
+        proj.populate_project(log, config._sections["organism_names"], **kwargs)
+    inputs = get_fingerprint_inputs(report_type, proj, config, log=log, **kwargs)
+    result = reuse_reports(report_type, proj, inputs, working_dir, log=log, **kwargs)
+    if result:
+        return result
+    if not kwargs.get("async_fetch"):
+        proj.populate_flowcells(log, **kwargs)
+    timings.TIMINGS.record_retainers(proj.retained_objects())
+
+    return write_reports(
+        report_type,
+        proj,
+        config,
+        working_dir,
+        confirm_working_dir=confirm_working_dir,
+        fingerprint_inputs=inputs,
+        log=log,
+        **kwargs,
+    )
+
+
+def generate_batch_reports(
+    report_type, projects, working_dir, config_file=None, config=None, log=LOG, **kwargs
+):
+    """Generate the reports of several projects, each written to <working_dir>/<project>.
+    The projects share the StatusDB connections and every run document is fetched once,
+    however many of the projects were sequenced on it. A project that fails does not
+    stop the others. With 'reuse', the run documents of the projects whose reports
+    are up to date are not fetched, see reuse_reports.
+
+    :returns: The ReportResult of every project that succeeded and the exception
+        raised for every project that failed, both by project
+    """
+    log.info(
+        f"Report type: {report_type}, generating reports for {len(projects)} projects"
+    )
+    check_report_type(report_type)
+    if config is None:
+        config = load_config(config_file)
+    kwargs = use_snapshot(dict(kwargs, run_connections={}), log=log)
+
+    results = {}
+    failed = {}
+    populated = []
+    for project in projects:
+        kwargs["project"] = project
+        proj = Project()
+        try:
+            proj.populate_project(log, config._sections["organism_names"], **kwargs)
+            inputs = get_fingerprint_inputs(
+                report_type, proj, config, log=log, **kwargs
+            )
+            result = reuse_reports(
+                report_type,
+                proj,
+                inputs,
+                os.path.join(working_dir, project),
+                log=log,
+                **kwargs,
+            )
+        except Exception as e:
+            log.error(f"Could not populate project {project}, skipping it. {e!r}")
+            failed[project] = e
+            continue
+        if result:
+            results[project] = result
+        else:
+            populated.append((project, proj, inputs))
+
+    # Fetch the run documents of all projects together
+    fc_docs = fetch_run_documents([proj for project, proj, inputs in populated])
+
+    for project, proj, inputs in populated:
+        kwargs["project"] = project
+        try:
+            proj.populate_flowcells(
+                log, fc_docs=fc_docs.get(proj.fc_connection.dbname, {}), **kwargs
+            )
+            timings.TIMINGS.record_retainers(
+                proj.retained_objects(), prefix=f"{project} "
+            )
+            results[project] = write_reports(
+                report_type,
+                proj,
+                config,
+                os.path.join(working_dir, project),
+                fingerprint_inputs=inputs,
+                log=log,
+                **kwargs,
+            )
+        except Exception as e:
+            log.error(f"Could not generate the reports for project {project}. {e!r}")
+            failed[project] = e
+
+    if failed:
+        log.error(
+            f"No reports were generated for {len(failed)} of {len(projects)} projects: {', '.join(failed)}"
+        )
+    return results, failed
+
+
+def get_report_module(report_type, proj):
+    """Import the module making the given type of report for the platform of a project"""
+    check_report_type(report_type)
+    if proj.sequencer_manufacturer not in REPORT_MODULES:
+        raise errors.DataError(
+            "Unknown sequencer manufacturer detected. Please make sure that the "
+            "sequencing_platform field in statusdb is filled in."
+        )
+    return __import__(
+        REPORT_MODULES[proj.sequencer_manufacturer], fromlist=["ngi_reports.reports"]
+    )
+
+
+def get_fingerprint_inputs(report_type, proj, config, log=LOG, **kwargs):
+    """Get the inputs of the reports of a project populated with
+    Project.populate_project, see fingerprint.get_inputs. Returns None unless 'reuse'
+    is given, or if they could not be looked up. The reports are then written in any
+    case and without fingerprint."""
+    if not kwargs.get("reuse"):
+        return None
+    try:
+        with timings.stage("fingerprint"):
+            return fingerprint.get_inputs(report_type, proj, config, **kwargs)
+    except Exception as e:
+        log.warning(
+            f"Could not fingerprint the inputs of the reports of project {proj.ngi_name}, writing them in any case. {e!r}"
+        )
+        return None
+
+
+def reuse_reports(report_type, proj, inputs, working_dir, log=LOG, **kwargs):
+    """Get the reports written to <working_dir>/reports for a project by an earlier
+    run, if their inputs are still the same. The reports keep the date they were
+    written on. If nothing but the HTML templates changed, only the HTML reports are
+    regenerated from the markdown reports.
+
+    :param dict inputs: Inputs of the reports, see get_fingerprint_inputs
+    :returns: ReportResult, or None if the reports have to be written, as they were
+        not written before, their inputs changed or a file is missing
+    """
+    if inputs is None:
+        return None
+    report = get_report_module(report_type, proj).Report(
+        log, os.path.abspath(working_dir), **kwargs
+    )
+    output_dir = os.path.realpath(report.report_dir)
+    fingerprint_file = fingerprint.fingerprint_path(output_dir, proj, report_type)
+    previous = fingerprint.load_fingerprint(fingerprint_file)
+    if not previous:
+        return None
+    files = [os.path.join(output_dir, fname) for fname in previous.get("files", [])]
+    if not files or not all(os.path.exists(fname) for fname in files):
+        log.info(f"Files of the reports in {output_dir} are missing, writing them")
+        return None
+
+    changed = fingerprint.changed_inputs(previous, inputs)
+    if changed == ["html_templates"] and not inputs["options"]["direct_html"]:
+        for fname in files:
+            if not fname.endswith(".md"):
+                continue
+            entry = regenerate.regenerate_file(
+                report_type, fname, inputs["html_templates"]
+            )
+            if entry["status"] == "failed":
+                log.warning(
+                    f"Could not regenerate the HTML report of {fname}, writing the reports. {entry['error']}"
+                )
+                return None
+            log.info(f"HTML report written to: {entry['html']}")
+        with timings.stage("file writes"):
+            fingerprint.write_fingerprint(fingerprint_file, inputs, files)
+        status = "html regenerated"
+    elif changed:
+        log.info(
+            f"The reports of project {proj.ngi_name} in {output_dir} are out of date "
+            f"({', '.join(changed)} changed), writing them"
+        )
+        return None
+    else:
+        log.info(
+            f"The reports of project {proj.ngi_name} in {output_dir} are up to date, "
+            "not writing them again. Run without --reuse to write them anyway"
+        )
+        status = "unchanged"
+    return ReportResult(
+        proj.ngi_id,
+        proj.ngi_name,
+        proj.sequencer_manufacturer,
+        output_dir,
+        files,
+        status=status,
+    )
+
+
+def write_reports(
+    report_type,
+    proj,
+    config,
+    working_dir,
+    confirm_working_dir=None,
+    fingerprint_inputs=None,
+    log=LOG,
+    **kwargs,
+):
+    """Write the reports of a populated project to <working_dir>/reports
+
+    :param confirm_working_dir: Function called with a question if working_dir is not
+        named after the project, the report is only written if it returns True
+    :param dict fingerprint_inputs: Inputs of the reports, see get_fingerprint_inputs,
+        written next to the reports for reuse_reports. No fingerprint is written if
+        not given
+    :returns: ReportResult
+    """
+    report_mod = get_report_module(report_type, proj)
+
+    working_dir = os.path.abspath(working_dir)
+    # Make the report object
+    report = report_mod.Report(log, working_dir, **kwargs)
+    output_dir = os.path.realpath(report.report_dir)
+
+    # check if the working dir is correct
+    if confirm_working_dir and os.path.basename(working_dir) not in [
+        proj.ngi_id,
+        proj.ngi_name,
+    ]:
+        question = f"The directory {working_dir} does not belong to the chosen project {report.project}. Continue? "
+        if not confirm_working_dir(question):
+            raise errors.WorkingDirError(
+                f"Not writing the reports as the directory {working_dir} does not belong to the chosen project!"
+            )
+    log.info(
+        f"The reports for project {report.project} will be generated in the directory {working_dir}"
+    )
+
+    # Create the directory if we don't already have it
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Load the Jinja2 template
+    try:
+        env = templates.get_environment(REPORTS_DIR)
+        template = env.get_template("project_summary.md")
+    except:
+        log.error("Could not load the Jinja report template")
+        raise
+
+    files = write_report_files(
+        report_type, report, proj, template, env, config, output_dir, log=log, **kwargs
+    )
+    if fingerprint_inputs is not None:
+        with timings.stage("file writes"):
+            fingerprint.write_fingerprint(
+                fingerprint.fingerprint_path(output_dir, proj, report_type),
+                fingerprint_inputs,
+                files,
+            )
+    return ReportResult(
+        proj.ngi_id, proj.ngi_name, proj.sequencer_manufacturer, output_dir, files
+    )
+
+
+def write_report_files(
+    report_type, report, proj, template, env, config, output_dir, log=LOG, **kwargs
+):
+    """Write the markdown, HTML and TXT files of a report to output_dir.
+    Returns the paths of the files written."""
+    files = []
+    # Get parsed markdown and print to file(s)
+    log.info("Converting markdown to HTML...")
+    with timings.stage("template render"):
+        output_mds = report.generate_report_template(
+            proj, template, config.get("ngi_reports", "support_email")
+        )
+    for output_basename, output_md in list(output_mds.items()):
+        try:
+            with timings.stage("file writes"), open(
+                f"{output_basename}.md", "w", encoding="utf-8"
+            ) as fh:
+                print(output_md, file=fh)
+            files.append(f"{output_basename}.md")
+        except IOError as e:
+            log.error(
+                f"Error printing markdown report {output_md} - skipping. {IOError(e)}"
+            )
+            continue
+        if kwargs.get("direct_html"):
+            # Render the tables as HTML, only the rest of the report is converted
+            with timings.stage("template render"):
+                output_md = report.render_template(proj, template, html_tables=True)
+        # Convert markdown to html
+        html_out = markdown_to_html(
+            report_type,
+            jinja2_env=env,
+            markdown_text=output_md,
+            reports_dir=REPORTS_DIR,
+            out_path=f"{output_basename}.html",
+            html_tables=kwargs.get("direct_html", False),
+        )
+        files.append(html_out)
+        log.info(
+            f"{os.path.basename(output_basename)} HTML report written to: {html_out}"
+        )
+
+    # Generate CSV files for project_summary reports
+    if (
+        report_type == "project_summary"
+        or report_type == "ont_project_summary"
+        and not kwargs.get("no_txt")
+    ):
+        try:
+            with timings.stage("file writes"):
+                files.extend(report.create_txt_files(op_dir=output_dir))
+            log.info("Generated TXT files...")
+        except:
+            log.error("Could not generate TXT files...")
+    return files
+
+
+def make_snapshot(working_dir, config_file=None, log=LOG, **kwargs):
+    """Populate the project as for a report and write all StatusDB data that was read
+    to a snapshot bundle, which can be replayed with 'from_snapshot'.
+    Returns the path of the bundle."""
+    config = load_config(config_file)
+
+    # Bypass the document cache so that every document passes through the recorder
+    recorder = snapshot.RecordingClient(
+        statusdb.statusdb_connection(use_cache=False).connection
+    )
+    kwargs = dict(kwargs, statusdb_client=recorder, cache=False)
+
+    proj = Project()
+    proj.populate(log, config._sections["organism_names"], **kwargs)
+
+    snapshot_file = kwargs.get("snapshot_file") or os.path.join(
+        working_dir, f"{proj.ngi_name}_statusdb_snapshot.json.gz"
+    )
+    recorder.write(snapshot_file, project=proj.ngi_id)
+    log.info(
+        f"StatusDB snapshot of project {proj.ngi_name} written to: {snapshot_file}"
+    )
+    return snapshot_file
+
+
+def markdown_to_html(
+    report_type,
+    jinja2_env=None,
+    markdown_text=None,
+    markdown_path=None,
+    reports_dir=None,
+    out_path=None,
+    html_tables=False,
+):
+    """Convert a markdown report to HTML and write it to out_path, by default next
+    to markdown_path. Returns the path of the HTML file.
+
+    With html_tables the tables of the markdown are already HTML, rendered by
+    Report.render_template, and are put in the HTML as they are instead of being
+    parsed as Markdown."""
+    # get markdown text
+    if not markdown_text:
+        with open(markdown_path, "r") as f:
+            markdown_text = f.read()
+
+    with timings.stage("markdown to HTML"):
+        html_out = converter.get_converter(
+            report_type, reports_dir, jinja2_env, html_tables=html_tables
+        ).convert(markdown_text)
+    if not out_path:
+        out_path = os.path.realpath(os.path.splitext(markdown_path)[0] + ".html")
+    with timings.stage("file writes"), open(out_path, "w") as f:
+        f.write(html_out)
+    return out_path
+
+
+def regenerate_html(report_type, paths, manifest_file, workers=1, force=False, log=LOG):
+    """Regenerate the HTML reports of existing markdown reports, each written next
+    to its markdown file. The files whose markdown and templates are unchanged since
+    the last run recorded in the manifest are skipped. A file that fails does not
+    stop the others.
+
+    :param list paths: Markdown files, directories or glob patterns, see
+        regenerate.find_markdown_files
+    :param str manifest_file: Manifest of the last run, updated with this run
+    :param int workers: Number of processes converting the files
+    :param bool force: Regenerate all HTML reports, also the unchanged ones
+    :returns: The manifest entry of every file, by markdown path
+    :raises errors.InvalidOptionsError: If no markdown reports were found
+    """
+    markdown_files = regenerate.find_markdown_files(paths, report_type)
+    if not markdown_files:
+        raise errors.InvalidOptionsError(
+            f"No markdown reports found in: {', '.join(paths)}"
+        )
+    manifest = regenerate.load_manifest(manifest_file)
+    template_version = regenerate.get_template_version(report_type)
+    previous = [
+        None if force else manifest["files"].get(path) for path in markdown_files
+    ]
+    log.info(f"Regenerating the HTML reports of {len(markdown_files)} markdown files")
+
+    args = (repeat(report_type), markdown_files, repeat(template_version), previous)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(
+                executor.map(
+                    regenerate.regenerate_file,
+                    *args,
+                    chunksize=max(1, len(markdown_files) // (workers * 8)),
+                )
+            )
+    else:
+        results = list(map(regenerate.regenerate_file, *args))
+    entries = dict(zip(markdown_files, results))
+
+    for path, entry in entries.items():
+        if entry["status"] == "failed":
+            log.error(
+                f"Could not regenerate the HTML report of {path}. {entry['error']}"
+            )
+    regenerate.write_manifest(
+        manifest_file,
+        regenerate.update_manifest(manifest, report_type, template_version, entries),
+    )
+    last_run = manifest["last_run"]
+    log.info(
+        f"{last_run['regenerated']} HTML reports regenerated, {last_run['unchanged']} unchanged "
+        f"and {last_run['failed']} failed. Manifest written to: {manifest_file}"
+    )
+    return entries
@@ -5,18 +5,15 @@
 from __future__ import print_function
 
 import argparse
-import jinja2
+import cProfile
 import json
 import os
-import markdown
 import sys
 
-from ngi_reports import __version__
-from ngi_reports.log import loggers
-from ngi_reports.utils import config as report_config
-from ngi_reports.utils.entities import Project
+from ngi_reports import __version__, api
+from ngi_reports.utils import errors, regenerate, timings
 
-LOG = loggers.minimal_logger("NGI Reports")
+LOG = api.LOG
 
 ## CONSTANTS
 # Create choices for report type based on available report template
@@ -29,7 +26,8 @@ allowed_report_types = [
             )
         )
     )
-] + ["ign_aggregate_report"]
+    if fl.endswith(".md")
+] + ["ign_aggregate_report", "snapshot"]
 
 
 def proceed_or_not(question):
@@ -46,186 +44,76 @@ def proceed_or_not(question):
             sys.stderr.write("Please respond with 'yes' or 'no' ")
 
 
-def make_reports(report_type, working_dir=os.getcwd(), config_file=None, **kwargs):
-    # Setup
-    LOG.info(f"Report type: {report_type}")
-
-    # Use default config or override it if file is specified
-    config = report_config.load_config(config_file)
-
-    proj = Project()
-    proj.populate(LOG, config._sections["organism_names"], **kwargs)
-
-    # Import the modules for this report type
-    if report_type == "project_summary":
-        if proj.sequencer_manufacturer == "illumina":
-            report_mod = __import__(
-                "ngi_reports.reports.project_summary", fromlist=["ngi_reports.reports"]
-            )
-        elif proj.sequencer_manufacturer == "ont":
-            report_mod = __import__(
-                "ngi_reports.reports.ont_project_summary",
-                fromlist=["ngi_reports.reports"],
-            )
-        elif proj.sequencer_manufacturer == "element":
-            report_mod = __import__(
-                "ngi_reports.reports.element_project_summary",
-                fromlist=["ngi_reports.reports"],
-            )
-        elif proj.sequencer_manufacturer == "unknown":
-            LOG.warning(
-                "Unknown sequencer manufacturer detected. Please make sure that the sequencing_platform field in statusdb is filled in."
-            )
-            sys.exit(1)
-    else:
-        LOG.warning(f"Report type '{report_type}' is not yet implemented. Aborting.")
-        sys.exit(0)
-
-    # Make the report object
-    report = report_mod.Report(LOG, working_dir, **kwargs)
-
-    # Work out all of the directory names
-    output_dir = os.path.realpath(os.path.join(working_dir, report.report_dir))
-    reports_dir = os.path.realpath(
-        os.path.join(os.path.dirname(__file__), os.pardir, "data", "report_templates")
+def make_reports(report_type, working_dir=None, config_file=None, **kwargs):
+    """Generate the report of the project given with 'project', asking before writing
+    it to a directory that is not named after the project"""
+    return api.generate_report(
+        report_type,
+        kwargs.pop("project", None),
+        working_dir or os.getcwd(),
+        config_file=config_file,
+        confirm_working_dir=proceed_or_not,
+        log=LOG,
+        **kwargs,
     )
-    working_base_dir = os.path.split(os.getcwd())[1]
-
-    # check if the current dir is correct
-    if working_base_dir not in [proj.ngi_id, proj.ngi_name]:
-        question = f"The current directory {working_dir} does not belong to the chosen project {report.project}. Continue? "
-        if proceed_or_not(question):
-            LOG.info(
-                f"The reports for project {report.project} will be generated in the current directory {working_dir}"
-            )
-        else:
-            LOG.error(
-                "Exiting the script as the current directory does not belong to the chosen project!"
-            )
-            sys.exit(1)
-    else:
-        LOG.info(
-            f"The reports for project {report.project} will be generated in the current directory {working_dir}"
-        )
 
-    # Create the directory if we don't already have it
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
 
-    # Print the markdown output file
-    # Load the Jinja2 template
-    try:
-        env = jinja2.Environment(loader=jinja2.FileSystemLoader(reports_dir))
-        if report_type == "project_summary":
-            template = env.get_template("project_summary.md")
-        else:
-            LOG.warning(
-                f"Report type '{report_type}' is not yet implemented. Aborting."
-            )
-            sys.exit(0)
-    except:
-        LOG.error("Could not load the Jinja report template")
-        raise
-
-    # Change to the reports directory
-    old_cwd = os.getcwd()
-    os.chdir(report.report_dir)
-
-    # Get parsed markdown and print to file(s)
-    LOG.info("Converting markdown to HTML...")
-    output_mds = report.generate_report_template(
-        proj, template, config.get("ngi_reports", "support_email")
-    )
-    for output_basename, output_md in list(output_mds.items()):
-        try:
-            with open(f"{output_basename}.md", "w", encoding="utf-8") as fh:
-                print(output_md, file=fh)
-        except IOError as e:
-            LOG.error(
-                f"Error printing markdown report {output_md} - skipping. {IOError(e)}"
-            )
-            continue
-        # Convert markdown to html
-        html_out = markdown_to_html(
-            report_type,
-            jinja2_env=env,
-            markdown_text=output_md,
-            reports_dir=reports_dir,
-            out_path=f"{output_basename}.html",
-        )
-        LOG.info(
-            f"{output_basename.rsplit('/', 1)[1]} HTML report written to: {html_out}"
-        )
+def make_batch_reports(
+    report_type, projects, working_dir=None, config_file=None, **kwargs
+):
+    """Generate the reports of several projects, each written to <working_dir>/<project>,
+    see api.generate_batch_reports. Returns the projects no report could be generated for.
+    """
+    kwargs.pop("project", None)
+    results, failed = api.generate_batch_reports(
+        report_type,
+        projects,
+        working_dir or os.getcwd(),
+        config_file=config_file,
+        log=LOG,
+        **kwargs,
+    )
+    return list(failed)
 
-    # Generate CSV files for project_summary reports
-    if (
-        report_type == "project_summary"
-        or report_type == "ont_project_summary"
-        and not kwargs["no_txt"]
-    ):
-        try:
-            report.create_txt_files()
-            LOG.info("Generated TXT files...")
-        except:
-            LOG.error("Could not generate TXT files...")
 
-    # Change back to previous working dir
-    os.chdir(old_cwd)
+def make_snapshot(working_dir=None, config_file=None, **kwargs):
+    """Write the StatusDB data of a project to a snapshot bundle, see api.make_snapshot"""
+    return api.make_snapshot(
+        working_dir or os.getcwd(), config_file=config_file, log=LOG, **kwargs
+    )
 
 
-def markdown_to_html(
+def regenerate_html(
     report_type,
-    jinja2_env=None,
-    markdown_text=None,
-    markdown_path=None,
-    reports_dir=None,
-    out_path=None,
+    markdown_file,
+    working_dir=None,
+    manifest=None,
+    workers=1,
+    force=False,
+    **kwargs,
 ):
-    # get path to template dir
-    if not reports_dir:
-        reports_dir = os.path.realpath(
-            os.path.join(
-                os.path.dirname(__file__), os.pardir, "data", "report_templates"
-            )
-        )
-    # get swedac text to add to report
-    with open(reports_dir + "/swedac.html", "r") as f:
-        swedac_text = f.read()
-    # initialise jinja env
-    if not jinja2_env:
-        jinja2_env = jinja2.Environment(loader=jinja2.FileSystemLoader(reports_dir))
-    # get markdown text
-    if not markdown_text:
-        with open(markdown_path, "r") as f:
-            markdown_text = f.read()
-
-    md_template = markdown.Markdown(
-        extensions=["meta", "tables", "def_list", "fenced_code", "mdx_outline"]
+    """Regenerate the HTML reports of the markdown files, directories and globs given
+    with -md, see api.regenerate_html. Returns the files that could not be converted."""
+    entries = api.regenerate_html(
+        report_type,
+        markdown_file,
+        manifest
+        or os.path.join(working_dir or os.getcwd(), regenerate.DEFAULT_MANIFEST),
+        workers=workers,
+        force=force,
+        log=LOG,
     )
-    markeddown_text = md_template.convert(markdown_text)
+    for entry in entries.values():
+        if entry["status"] == "regenerated":
+            print(f"HTML report written to: {entry['html']}")
+    return [path for path, entry in entries.items() if entry["status"] == "failed"]
 
-    # Markdown meta returns a dict with values as lists
-    html_out = jinja2_env.get_template(report_type + ".html").render(
-        body=markeddown_text,
-        meta={key: "".join(value) for (key, value) in md_template.Meta.items()},
-    )
-    replace_list = {
-        "[swedac]": swedac_text,
-        "[tick]": '<span class="icon_tick">&#10004;</span> ',
-        "[cross]": '<span class="icon_cross">&#10008;</span> ',
-        "[pass]": '<span class="pass">Pass</span>',
-        "[fail]": '<span class="fail">Fail</span>',
-        "[na]": "<code>NA</code>",
-    }
-    for key in replace_list:
-        html_out = html_out.replace(key, replace_list[key])
-    if not out_path:
-        out_path = os.path.realpath(
-            os.path.join(os.getcwd(), markdown_path.replace("md", "html"))
-        )
-    with open(out_path, "w") as f:
-        f.write(html_out)
-    return out_path
+
+def read_project_file(project_file):
+    """Read the projects listed in a file, one per line. Empty lines and lines
+    starting with '#' are skipped."""
+    with open(project_file) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
 
 
 def main():
@@ -257,6 +145,19 @@ def main():
         action="store",
         help="Project name to generate 'project_summary' report",
     )
+    parser.add_argument(
+        "--projects",
+        default=None,
+        nargs="+",
+        help="Generate the reports of all these projects in one run, each written to <working dir>/<project>",
+    )
+    parser.add_argument(
+        "--project_file",
+        "--project-file",
+        dest="project_file",
+        default=None,
+        help="File listing projects to generate reports for as with --projects, one project per line",
+    )
     parser.add_argument(
         "-s",
         "--signature",
@@ -288,6 +189,19 @@ def main():
         action="store_true",
         help="Use this option to not generate TXT files for tables",
     )
+    parser.add_argument(
+        "--reuse",
+        action="store_true",
+        help="Keep the reports in the working directory if their inputs are unchanged since they were written "
+        "with --reuse, and only regenerate the html reports if nothing but the html templates changed. "
+        "The kept reports keep the date they were written on",
+    )
+    parser.add_argument(
+        "--direct_html",
+        action="store_true",
+        help="Render the tables of the HTML report straight to HTML instead of converting them from "
+        "the markdown report, which is much faster for large projects. The markdown report is written as usual",
+    )
     parser.add_argument(
         "--samples",
         default=None,
@@ -309,6 +223,77 @@ def main():
         type=json.loads,
         help='Overwrite or use Phix values for mentioned flowcells/lanes provided as a json string, having each flowcell as a key. Example: --fc_phix \'{"BH3JLWCCXX": {"1": "0.42", "3": "0.46"}}\'',
     )
+    parser.add_argument(
+        "--fc_fetch_mode",
+        default="bounded",
+        choices=["bounded", "full", "index"],
+        help="How to look up the runs of the project in StatusDB. 'bounded' only queries runs started "
+        "after the project open date, 'full' downloads all runs and filters them locally, 'index' looks "
+        "them up in a local index kept up to date from the StatusDB changes feed. Default: bounded",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Number of flowcells to fetch and parse concurrently. Keep it at or below "
+        "pool_size in statusdb.yaml. Default: 1 (all flowcells fetched in one request and parsed in turn). "
+        "With -md, the number of processes converting the markdown files",
+    )
+    parser.add_argument(
+        "--async_fetch",
+        action="store_true",
+        help="Look up and fetch the flowcells of the project from StatusDB while its samples are processed",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        default=None,
+        help="Keep the StatusDB documents in the local cache and use unchanged ones from it instead of downloading "
+        "them again. On by default if 'cache' is set in statusdb.yaml",
+    )
+    parser.add_argument(
+        "--from_snapshot",
+        "--from-snapshot",
+        dest="from_snapshot",
+        default=None,
+        help="Generate the report from a snapshot bundle written by 'ngi_reports snapshot' instead of StatusDB",
+    )
+    parser.add_argument(
+        "--snapshot_file",
+        default=None,
+        help="Path of the bundle written by 'ngi_reports snapshot'. Default: <working dir>/<project>_statusdb_snapshot.json.gz",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print the time spent in every stage of the run and the number and size of the StatusDB requests made",
+    )
+    parser.add_argument(
+        "--timings_file",
+        "--timings-file",
+        dest="timings_file",
+        default=None,
+        help="Write the timings of the run to this JSON file, implies recording the timings as with --timings",
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Trace the memory allocated in every stage of the run with tracemalloc and print it with the "
+        "timings, along with the largest objects kept. Slows the run down",
+    )
+    parser.add_argument(
+        "--memory_budget",
+        "--memory-budget",
+        dest="memory_budget",
+        default=None,
+        type=float,
+        help="Trace the memory as with --memory and exit with an error if the peak traced memory of the run is above this many MB",
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="Profile the whole run with cProfile and write the stats to this file, to be read with pstats",
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -318,7 +303,20 @@ def main():
         "-md",
         "--markdown_file",
         default=None,
-        help="Regenerate the html report from the given markdown file",
+        nargs="+",
+        help="Regenerate the html reports of the given markdown files. Directories are searched for "
+        "markdown reports of the report type and glob patterns are expanded. Reports whose markdown "
+        "and templates are unchanged since the last run are skipped, see --manifest and --force",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help=f"With -md, the manifest of the html reports regenerated. Default: <working dir>/{regenerate.DEFAULT_MANIFEST}",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="With -md, regenerate all html reports, also those that are unchanged since the last run",
     )
     parser.add_argument(
         "-b",
@@ -330,13 +328,68 @@ def main():
 
     kwargs = vars(parser.parse_args())
 
-    if kwargs["markdown_file"]:
-        print(
-            "HTML report written to: "
-            + markdown_to_html(
-                kwargs["report_type"], markdown_path=kwargs["markdown_file"]
+    projects = kwargs.pop("projects") or []
+    project_file = kwargs.pop("project_file")
+    if project_file:
+        projects += read_project_file(project_file)
+
+    show_timings = kwargs.pop("timings")
+    timings_file = kwargs.pop("timings_file")
+    trace_memory = kwargs.pop("memory")
+    memory_budget = kwargs.pop("memory_budget")
+    profile_file = kwargs.pop("profile")
+    if show_timings or timings_file or trace_memory or memory_budget:
+        timings.TIMINGS.enable(trace_memory=trace_memory or bool(memory_budget))
+    if profile_file:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run(projects, kwargs)
+    finally:
+        if profile_file:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            LOG.info(f"Profile written to: {profile_file}")
+        if timings_file:
+            timings.TIMINGS.write_json(timings_file)
+            LOG.info(f"Timings written to: {timings_file}")
+        if show_timings or trace_memory:
+            print(timings.TIMINGS.summary(), file=sys.stderr)
+
+    if memory_budget:
+        peak_memory = timings.TIMINGS.get_peak_memory() / timings.MB
+        if peak_memory > memory_budget:
+            LOG.error(
+                f"Peak traced memory {peak_memory:.2f} MB is above the memory budget of {memory_budget:.2f} MB"
             )
+            sys.exit(1)
+        LOG.info(
+            f"Peak traced memory {peak_memory:.2f} MB is within the memory budget of {memory_budget:.2f} MB"
         )
+
+
+def run(projects, kwargs):
+    """Run the command given on the command line"""
+    try:
+        run_command(projects, kwargs)
+    except errors.ReportError as e:
+        if e.exit_status:
+            LOG.error(e)
+        else:
+            LOG.warning(e)
+        sys.exit(e.exit_status)
+
+
+def run_command(projects, kwargs):
+    if kwargs["report_type"] == "snapshot":
+        make_snapshot(**kwargs)
+    elif projects:
+        # Keep the order given but generate every project once
+        if make_batch_reports(projects=list(dict.fromkeys(projects)), **kwargs):
+            sys.exit(1)
+    elif kwargs["markdown_file"]:
+        if regenerate_html(**kwargs):
+            sys.exit(1)
     else:
         make_reports(**kwargs)
 
@@ -5,12 +5,17 @@ eg. Information retrieval from the filesystem or Charon
 
 from datetime import datetime
 
+from ngi_reports.utils import errors
+
 
 class BaseReport(object):
     """ Base report object class. Provides some common fields and helper
     methods to be used by all report types.
     """
 
+    # Placeholders of the QC statuses in the tables, shown as icons in the HTML report
+    qc_labels = {"PASSED": "[pass]", "FAILED": "[fail]", "NA": "[na]"}
+
     def __init__(self, LOG, working_dir, **kwargs):
         # Incoming handles
         self.LOG = LOG
@@ -24,9 +29,24 @@ class BaseReport(object):
         """Set the signature for the report.
         Exit if not provided."""
         if not self.signature:
-            self.LOG.error(
+            raise errors.InvalidOptionsError(
                 "It is required to provide Signature/Name while generating 'project_summary' report, see -s opition in help"
             )
-            raise SystemExit
         else:
-            self.report_info["signature"] = self.signature
\ No newline at end of file
+            self.report_info["signature"] = self.signature
+
+    def qc_label(self, status):
+        """Get the placeholder shown in the tables for a QC status"""
+        return self.qc_labels.get(status, status)
+
+    def render_template(self, proj, template, html_tables=False):
+        """Render the report template of a project with the information collected
+        by generate_report_template. With html_tables the tables are rendered as
+        HTML instead of Markdown, for converting the report straight to HTML."""
+        return template.render(
+            project=proj,
+            tables=self.tables_info["header_explanation"],
+            rows=self.tables_info["rows"],
+            report_info=self.report_info,
+            html_tables=html_tables,
+        )
@@ -17,6 +17,7 @@ class Report(ngi_reports.reports.project_summary.Report):
         # Helper vars
         seq_methods = OrderedDict()
         dem_methods = OrderedDict()
+        fc_seq_meth = {}
 
         # Get information for the report
         self.report_basename = proj.ngi_name
@@ -32,7 +33,7 @@ class Report(ngi_reports.reports.project_summary.Report):
             sorted(proj.flowcells.items(), key=lambda item: item[1].date)
         )
 
-        for fc in sorted_project_fcs.values():
+        for fc_id, fc in sorted_project_fcs.items():
             run_setup_text = f"{fc.run_setup['R1']}nt(Read1)-{fc.run_setup['I1']}nt(Index1)-{fc.run_setup['I2']}nt(Index2)-{fc.run_setup['R2']}nt(Read2)"
             throughput_versions = {
                 "High": "High",
@@ -46,12 +47,11 @@ class Report(ngi_reports.reports.project_summary.Report):
             # Make sure the sequencing methods are unique
             if tmp_seq_method not in list(seq_methods.keys()):
                 seq_methods[tmp_seq_method] = alphabets[len(list(seq_methods.keys()))]
-            fc.seq_meth = seq_methods[tmp_seq_method]
+            fc_seq_meth[fc_id] = seq_methods[tmp_seq_method]
 
             # Make sure the demux methods are unique
             if tmp_dem_method not in list(dem_methods.keys()):
                 dem_methods[tmp_dem_method] = alphabets[len(list(dem_methods.keys()))]
-            fc.dem_meth = dem_methods[tmp_dem_method]
 
         # Give proper section name for the methods
         self.report_info["sequencing_methods"] = "\n\n".join(
@@ -73,6 +73,7 @@ class Report(ngi_reports.reports.project_summary.Report):
         ###############################################################################
         ##### Create table text and header explanation from collected information #####
         ###############################################################################
+        # The rows of the tables are kept apart from the project, which is not modified
 
         # sample_info table
         unit_magnitude = {"#reads": "", "Kreads": " Thousand", "Mreads": " Million"}
@@ -80,20 +81,25 @@ class Report(ngi_reports.reports.project_summary.Report):
         sample_filter = [
             "ngi_id",
             "customer_name",
-            "initial_qc.initial_qc_status",
+            "initial_qc_status",
             "total_reads",
             "qscore",
         ]
-        for sample_id, sample in list(proj.samples.items()):
-            sample = vars(sample)
-            if sample["initial_qc"]["initial_qc_status"] == "PASSED":
-                sample["initial_qc"]["initial_qc_status"] = "[pass]"
-            elif sample["initial_qc"]["initial_qc_status"] == "FAILED":
-                sample["initial_qc"]["initial_qc_status"] = "[fail]"
-            elif sample["initial_qc"]["initial_qc_status"] == "NA":
-                sample["initial_qc"]["initial_qc_status"] = "[na]"
+        sample_list = [
+            {
+                "ngi_id": sample.ngi_id,
+                "customer_name": sample.customer_name,
+                "initial_qc_status": self.qc_label(
+                    sample.initial_qc["initial_qc_status"]
+                ),
+                "total_reads": sample.total_reads,
+                "qscore": sample.qscore,
+            }
+            for sample in proj.samples.values()
+        ]
+        self.tables_info["rows"]["sample_info"] = sample_list
         self.tables_info["tables"]["sample_info"] = self.create_table_text(
-            proj.samples.values(), filter_keys=sample_filter, header=sample_header
+            sample_list, filter_keys=sample_filter, header=sample_header
         )
         self.tables_info["header_explanation"]["sample_info"] = (
             "* _NGI ID:_ Internal NGI sample identifier\n"
@@ -109,15 +115,16 @@ class Report(ngi_reports.reports.project_summary.Report):
         library_list = []
         for sample_id, sample in list(proj.samples.items()):
             for prep in list(sample.preps.values()):
-                prep = vars(prep)
-                prep["ngi_id"] = sample_id
-                if prep["qc_status"] == "PASSED":
-                    prep["qc_status"] = "[pass]"
-                elif prep["qc_status"] == "FAILED":
-                    prep["qc_status"] = "[fail]"
-                elif prep["qc_status"] == "NA":
-                    prep["qc_status"] = "[na]"
-                library_list.append(prep)
+                library_list.append(
+                    {
+                        "ngi_id": sample_id,
+                        "barcode": prep.barcode,
+                        "label": prep.label,
+                        "avg_size": prep.avg_size,
+                        "qc_status": self.qc_label(prep.qc_status),
+                    }
+                )
+        self.tables_info["rows"]["library_info"] = library_list
         self.tables_info["tables"]["library_info"] = self.create_table_text(
             sorted(library_list, key=lambda d: d["ngi_id"]),
             filter_keys=library_filter,
@@ -153,11 +160,18 @@ class Report(ngi_reports.reports.project_summary.Report):
         lanes_list = []
         for flowcell_id, flowcell in list(proj.flowcells.items()):
             for lane in list(flowcell.lanes.values()):
-                lane = vars(lane)
-                lane["date"] = flowcell.date
-                lane["name"] = flowcell.name
-                lane["seq_meth"] = flowcell.seq_meth
-                lanes_list.append(lane)
+                lanes_list.append(
+                    {
+                        "date": flowcell.date,
+                        "name": flowcell.name,
+                        "id": lane.id,
+                        "total_reads_proj": lane.total_reads_proj,
+                        "weighted_avg_qval_proj": lane.weighted_avg_qval_proj,
+                        "phix": lane.phix,
+                        "seq_meth": fc_seq_meth[flowcell_id],
+                    }
+                )
+        self.tables_info["rows"]["lanes_info"] = lanes_list
 
         self.tables_info["tables"]["lanes_info"] = self.create_table_text(
             sorted(lanes_list, key=lambda d: f"{d['date']}_{d['id']}"),
@@ -185,11 +199,7 @@ class Report(ngi_reports.reports.project_summary.Report):
 
         # Parse the template
         try:
-            md = template.render(
-                project=proj,
-                tables=self.tables_info["header_explanation"],
-                report_info=self.report_info,
-            )
+            md = self.render_template(proj, template)
             return {output_bn: md}
         except:
             self.LOG.error("Could not parse the project_summary template")
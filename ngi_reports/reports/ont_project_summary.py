@@ -15,6 +15,7 @@ class Report(ngi_reports.reports.project_summary.Report):
         self.set_signature()
 
         seq_methods = OrderedDict()
+        fc_seq_meth = {}
 
         # Get information for the report
         self.report_basename = proj.ngi_name
@@ -26,7 +27,7 @@ class Report(ngi_reports.reports.project_summary.Report):
         seq_template = "{}) Samples were sequenced on {}, flowcell type {}, MinKNOW version {}. The quality scale used is Phred and the quality score threshold is {}."
 
         # Collect required information for all flowcells run for the project
-        for fc in proj.flowcells.values():
+        for fc_id, fc in proj.flowcells.items():
             tmp_method = seq_template.format(
                 "SECTION",
                 fc.type,
@@ -38,7 +39,7 @@ class Report(ngi_reports.reports.project_summary.Report):
             # To make sure the sequencing methods are unique
             if tmp_method not in list(seq_methods.keys()):
                 seq_methods[tmp_method] = alphabets[len(list(seq_methods.keys()))]
-            fc.seq_meth = seq_methods[tmp_method]
+            fc_seq_meth[fc_id] = seq_methods[tmp_method]
 
         # Give proper section name for the methods
         self.report_info["sequencing_methods"] = "\n\n".join(
@@ -54,6 +55,7 @@ class Report(ngi_reports.reports.project_summary.Report):
         ###############################################################################
         ##### Create table text and header explanation from collected information #####
         ###############################################################################
+        # The rows of the tables are kept apart from the project, which is not modified
         # sample_info table
         unit_magnitude = {"#reads": "", "Kreads": "Thousand", "Mreads": "Million"}
         sample_header = [
@@ -63,8 +65,18 @@ class Report(ngi_reports.reports.project_summary.Report):
             "Avg. read length passed",
         ]
         sample_filter = ["ngi_id", "customer_name", "total_reads", "read_length"]
+        sample_list = [
+            {
+                "ngi_id": sample.ngi_id,
+                "customer_name": sample.customer_name,
+                "total_reads": sample.total_reads,
+                "read_length": sample.read_length,
+            }
+            for sample in proj.samples.values()
+        ]
+        self.tables_info["rows"]["sample_info"] = sample_list
         self.tables_info["tables"]["sample_info"] = self.create_table_text(
-            proj.samples.values(), filter_keys=sample_filter, header=sample_header
+            sample_list, filter_keys=sample_filter, header=sample_header
         )
         self.tables_info["header_explanation"]["sample_info"] = (
             "* _NGI ID:_ Internal NGI sample identifier\n"
@@ -79,17 +91,19 @@ class Report(ngi_reports.reports.project_summary.Report):
         library_list = []
         for sample, sample_info in list(proj.samples.items()):
             for prep in list(sample_info.preps.values()):
-                prep = vars(prep)
-                prep["ngi_id"] = sample
-                if prep["qc_status"] == "PASSED":
-                    prep["qc_status"] = "[pass]"
-                elif prep["qc_status"] == "FAILED":
-                    prep["qc_status"] = "[fail]"
-                elif prep["qc_status"] == "NA":
-                    prep["qc_status"] = "[na]"
-                if len(proj.samples.items()) == 1 and prep.get("barcode") == "NA":
-                    prep["barcode"] = "no index"
-                library_list.append(prep)
+                barcode = prep.barcode
+                if len(proj.samples.items()) == 1 and barcode == "NA":
+                    barcode = "no index"
+                library_list.append(
+                    {
+                        "ngi_id": sample,
+                        "barcode": barcode,
+                        "prep_id": prep.prep_id,
+                        "avg_size": prep.avg_size,
+                        "qc_status": self.qc_label(prep.qc_status),
+                    }
+                )
+        self.tables_info["rows"]["library_info"] = library_list
         self.tables_info["tables"]["library_info"] = self.create_table_text(
             sorted(library_list, key=lambda d: d["ngi_id"]),
             filter_keys=library_filter,
@@ -113,8 +127,9 @@ class Report(ngi_reports.reports.project_summary.Report):
             lane["name"] = flowcell_info.run_name
             lane["reads"] = flowcell_info.total_reads
             lane["n50"] = flowcell_info.n50
-            lane["seq_meth"] = flowcell_info.seq_meth
+            lane["seq_meth"] = fc_seq_meth[flowcell]
             lanes_list.append(lane)
+        self.tables_info["rows"]["lanes_info"] = lanes_list
         self.tables_info["tables"]["lanes_info"] = self.create_table_text(
             sorted(lanes_list, key=lambda d: d["date"]),
             filter_keys=lanes_filter,
@@ -161,11 +176,7 @@ class Report(ngi_reports.reports.project_summary.Report):
 
         # Parse the template
         try:
-            md = template.render(
-                project=proj,
-                tables=self.tables_info["header_explanation"],
-                report_info=self.report_info,
-            )
+            md = self.render_template(proj, template)
             return {output_basename: md}
         except:
             self.LOG.error("Could not parse the project_summary template")
@@ -10,6 +10,7 @@ import os
 from string import ascii_uppercase as alphabets
 
 import ngi_reports.reports
+from ngi_reports.utils import converter, timings
 
 
 class Report(ngi_reports.reports.BaseReport):
@@ -31,6 +32,7 @@ class Report(ngi_reports.reports.BaseReport):
         ## Helper vars
         seq_methods = OrderedDict()
         dem_methods = OrderedDict()
+        fc_seq_meth = {}
 
         ## Get information for the report
         self.report_basename = proj.ngi_name
@@ -54,7 +56,7 @@ class Report(ngi_reports.reports.BaseReport):
             sorted(proj.flowcells.items(), key=lambda item: item[1].date)
         )
 
-        for fc in sorted_project_fcs.values():
+        for fc_id, fc in sorted_project_fcs.items():
             ## Sort by the order of readss
             run_setup = sorted(fc.run_setup, key=lambda k: k["Number"])
             run_setup_text = ""
@@ -108,12 +110,11 @@ class Report(ngi_reports.reports.BaseReport):
             ## to make sure the sequencing methods are unique
             if tmp_seq_method not in list(seq_methods.keys()):
                 seq_methods[tmp_seq_method] = alphabets[len(list(seq_methods.keys()))]
-            fc.seq_meth = seq_methods[tmp_seq_method]
+            fc_seq_meth[fc_id] = seq_methods[tmp_seq_method]
 
             ## to make sure the demux methods are unique
             if tmp_dem_method not in list(dem_methods.keys()):
                 dem_methods[tmp_dem_method] = alphabets[len(list(dem_methods.keys()))]
-            fc.dem_meth = dem_methods[tmp_dem_method]
 
         ## give proper section name for the methods
         self.report_info["sequencing_methods"] = "\n\n".join(
@@ -135,6 +136,7 @@ class Report(ngi_reports.reports.BaseReport):
         ###############################################################################
         ##### Create table text and header explanation from collected information #####
         ###############################################################################
+        ## The rows of the tables are kept apart from the project, which is not modified
 
         ## sample_info table
         unit_magnitude = {"#reads": "", "Kreads": " Thousand", "Mreads": " Million"}
@@ -142,20 +144,25 @@ class Report(ngi_reports.reports.BaseReport):
         sample_filter = [
             "ngi_id",
             "customer_name",
-            "initial_qc.initial_qc_status",
+            "initial_qc_status",
             "total_reads",
             "qscore",
         ]
-        for s, sample in list(proj.samples.items()):
-            sample = vars(sample)
-            if sample["initial_qc"]["initial_qc_status"] == "PASSED":
-                sample["initial_qc"]["initial_qc_status"] = "[pass]"
-            elif sample["initial_qc"]["initial_qc_status"] == "FAILED":
-                sample["initial_qc"]["initial_qc_status"] = "[fail]"
-            elif sample["initial_qc"]["initial_qc_status"] == "NA":
-                sample["initial_qc"]["initial_qc_status"] = "[na]"
+        sample_list = [
+            {
+                "ngi_id": sample.ngi_id,
+                "customer_name": sample.customer_name,
+                "initial_qc_status": self.qc_label(
+                    sample.initial_qc["initial_qc_status"]
+                ),
+                "total_reads": sample.total_reads,
+                "qscore": sample.qscore,
+            }
+            for sample in proj.samples.values()
+        ]
+        self.tables_info["rows"]["sample_info"] = sample_list
         self.tables_info["tables"]["sample_info"] = self.create_table_text(
-            proj.samples.values(), filter_keys=sample_filter, header=sample_header
+            sample_list, filter_keys=sample_filter, header=sample_header
         )
         self.tables_info["header_explanation"]["sample_info"] = (
             "* _NGI ID:_ Internal NGI sample identifier\n"
@@ -171,15 +178,16 @@ class Report(ngi_reports.reports.BaseReport):
         library_list = []
         for sample_id, sample in list(proj.samples.items()):
             for prep in list(sample.preps.values()):
-                prep = vars(prep)
-                prep["ngi_id"] = sample_id
-                if prep["qc_status"] == "PASSED":
-                    prep["qc_status"] = "[pass]"
-                elif prep["qc_status"] == "FAILED":
-                    prep["qc_status"] = "[fail]"
-                elif prep["qc_status"] == "NA":
-                    prep["qc_status"] = "[na]"
-                library_list.append(prep)
+                library_list.append(
+                    {
+                        "ngi_id": sample_id,
+                        "barcode": prep.barcode,
+                        "label": prep.label,
+                        "avg_size": prep.avg_size,
+                        "qc_status": self.qc_label(prep.qc_status),
+                    }
+                )
+        self.tables_info["rows"]["library_info"] = library_list
         self.tables_info["tables"]["library_info"] = self.create_table_text(
             sorted(library_list, key=lambda d: d["ngi_id"]),
             filter_keys=library_filter,
@@ -215,11 +223,18 @@ class Report(ngi_reports.reports.BaseReport):
         lanes_list = []
         for f, v in list(proj.flowcells.items()):
             for l in list(v.lanes.values()):
-                l = vars(l)
-                l["date"] = v.date
-                l["name"] = v.name
-                l["seq_meth"] = v.seq_meth
-                lanes_list.append(l)
+                lanes_list.append(
+                    {
+                        "date": v.date,
+                        "name": v.name,
+                        "id": l.id,
+                        "total_reads_proj": l.total_reads_proj,
+                        "weighted_avg_qval_proj": l.weighted_avg_qval_proj,
+                        "phix": l.phix,
+                        "seq_meth": fc_seq_meth[f],
+                    }
+                )
+        self.tables_info["rows"]["lanes_info"] = lanes_list
 
         self.tables_info["tables"]["lanes_info"] = self.create_table_text(
             sorted(lanes_list, key=lambda d: f"{d['date']}_{d['id']}"),
@@ -247,11 +262,7 @@ class Report(ngi_reports.reports.BaseReport):
 
         # Parse the template
         try:
-            md = template.render(
-                project=proj,
-                tables=self.tables_info["header_explanation"],
-                report_info=self.report_info,
-            )
+            md = self.render_template(proj, template)
             return {output_bn: md}
         except:
             self.LOG.error("Could not parse the project_summary template")
@@ -261,6 +272,7 @@ class Report(ngi_reports.reports.BaseReport):
     ##### Helper methods to get certain information #####
     #####################################################
 
+    @timings.timed("table text")
     def create_table_text(self, ip, filter_keys=None, header=None, sep="\t"):
         """Create a single text string that will be saved in a file in TABLE format
         from given dict and filtered based upon mentioned header.
@@ -338,14 +350,15 @@ class Report(ngi_reports.reports.BaseReport):
         put in the TXT file
 
         :param str op_dir: Path where the TXT files should be created, current dir is default
+        :returns: The paths of the files written
         """
+        txt_files = []
         for tb_nm, tb_cont in list(self.tables_info["tables"].items()):
-            if "[pass]" or "[fail]" or "[na]" in tb_cont:
-                tb_cont = tb_cont.replace("[pass]", "Pass")
-                tb_cont = tb_cont.replace("[fail]", "Fail")
-                tb_cont = tb_cont.replace("[na]", "NA")
+            tb_cont = converter.txt_placeholders.sub(tb_cont)
             op_fl = f"{self.report_basename}_{tb_nm}.txt"
             if op_dir:
                 op_fl = os.path.join(op_dir, op_fl)
             with open(op_fl, "w") as TXT:
                 TXT.write(tb_cont)
+            txt_files.append(op_fl)
+        return txt_files
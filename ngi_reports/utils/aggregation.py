@@ -0,0 +1,102 @@
+"""Columnar aggregation of the per barcode read counts and Q30 values of the flowcells"""
+
+import numpy as np
+
+# One row per barcode of a sample on a lane of a flowcell
+BARCODE_ROW_DTYPE = np.dtype(
+    [
+        ("sample", object),
+        ("lane", object),
+        ("flowcell", object),
+        ("read_index", object),
+        ("reads", np.int64),
+        ("bases", np.int64),
+        ("qval", np.float64),
+    ]
+)
+
+
+def barcode_rows(rows=()):
+    """Build a structured array of barcode rows
+
+    :param list rows: tuples with the fields of BARCODE_ROW_DTYPE, in that order
+    """
+    return np.array(list(rows), dtype=BARCODE_ROW_DTYPE)
+
+
+def concatenate_rows(row_arrays):
+    """Join the barcode rows of several flowcells into one array"""
+    row_arrays = list(row_arrays)
+    if not row_arrays:
+        return barcode_rows()
+    return np.concatenate(row_arrays)
+
+
+def grouped_sums(keys, *columns):
+    """Sum the given columns over the rows sharing the same key. Returns the keys in
+    order of first appearance and the sums of every column in that same order.
+    Rows are added up in their original order, so the sums equal those of a plain loop.
+
+    :param keys: array with the group key of every row
+    :param columns: arrays of numbers to sum per group
+    """
+    if not len(keys):
+        return keys, [np.zeros(0) for column in columns]
+    groups, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    sums = [
+        np.bincount(inverse, weights=column, minlength=len(groups))[order]
+        for column in columns
+    ]
+    return groups[order], sums
+
+
+def unique_sample_runs(rows):
+    """Keep one row per sample and read index, the last one seen, at the position of
+    the first one seen. This is the order a dict keyed on them ends up in when the
+    rows are assigned one by one.
+
+    :param rows: structured array of barcode rows
+    """
+    if not len(rows):
+        return rows
+    keys = rows["sample"] + "\t" + rows["read_index"]
+    _, first = np.unique(keys, return_index=True)
+    _, last_reversed = np.unique(keys[::-1], return_index=True)
+    last = len(keys) - 1 - last_reversed
+    return rows[last[np.argsort(first, kind="stable")]]
+
+
+def lane_totals(rows):
+    """Total reads, Q30 weighted by reads and reads with a Q30 value of every lane,
+    rows without reads or Q30 value are left out of the weighting
+
+    :param rows: structured array of the barcode rows of one flowcell
+    """
+    reads = rows["reads"].astype(np.float64)
+    with_qval = (rows["reads"] != 0) & (rows["qval"] != 0)
+    lanes, (total_reads, weighted_qval, reads_with_qval) = grouped_sums(
+        rows["lane"],
+        reads,
+        np.where(with_qval, reads * rows["qval"], 0.0),
+        np.where(with_qval, reads, 0.0),
+    )
+    return {
+        lane: (int(total_reads[i]), float(weighted_qval[i]), int(reads_with_qval[i]))
+        for i, lane in enumerate(lanes)
+    }
+
+
+def sample_totals(rows):
+    """Sum of Q30 times bases, total bases and total reads of every sample
+
+    :param rows: structured array of barcode rows, one per sample and read index
+    """
+    bases = rows["bases"].astype(np.float64)
+    samples, (qvalsbp, total_bases, total_reads) = grouped_sums(
+        rows["sample"], rows["qval"] * bases, bases, rows["reads"].astype(np.float64)
+    )
+    return {
+        sample: (float(qvalsbp[i]), int(total_bases[i]), int(total_reads[i]))
+        for i, sample in enumerate(samples)
+    }
@@ -0,0 +1,294 @@
+"""Backends serving the StatusDB requests of the connection classes in statusdb.py.
+The default backend is the IBM Cloudant client, see statusdb.get_shared_client.
+FileBackend serves the same requests from a local fixture file, so that reports
+can be generated, tested and benchmarked without StatusDB."""
+
+import copy
+import gzip
+import json
+import os
+import threading
+import time
+
+from ibm_cloud_sdk_core import DetailedResponse
+
+from ngi_reports.utils import timings
+
+_file_backends = {}
+_file_backends_lock = threading.Lock()
+
+
+def view_name(db, ddoc, view):
+    return f"{db}/{ddoc}/{view}"
+
+
+def get_file_backend(path, latency=0):
+    """Get the FileBackend for the given fixture file, loaded once per process
+
+    :param str path: Path of the fixture file
+    :param float latency: Seconds to wait before answering every request
+    """
+    path = os.path.realpath(os.path.expanduser(path))
+    with _file_backends_lock:
+        if (path, latency) not in _file_backends:
+            _file_backends[(path, latency)] = FileBackend.load(path, latency=latency)
+        return _file_backends[(path, latency)]
+
+
+class StatusDBBackend(object):
+    """Interface of the StatusDB backends, the part of the CloudantV1 client used by
+    the connection classes. All methods return ibm_cloud_sdk_core DetailedResponse
+    objects. Backends may also implement 'post_view_as_stream',
+    'post_all_docs_as_stream', 'post_changes' and 'get_database_information',
+    the connections fall back on the methods below when they are missing.
+    """
+
+    def get_server_information(self):
+        raise NotImplementedError
+
+    def post_view(self, db, ddoc, view, **kwargs):
+        raise NotImplementedError
+
+    def post_all_docs(self, db, keys=None, include_docs=False, **kwargs):
+        raise NotImplementedError
+
+    def get_document(self, db, doc_id, **kwargs):
+        raise NotImplementedError
+
+
+class StreamedResponse(object):
+    """Stand-in for the streamed HTTP response returned by the '*_as_stream' methods
+    of the Cloudant client. As by CouchDB, every row is only written out once the
+    ones before it have been read. Unlike a response read from the network, the
+    JSON of the row being read is held whole.
+
+    :param rows: Iterable of the rows of the response
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def iter_content(self, chunk_size=1):
+        yield b'{"rows": ['
+        for i, row in enumerate(self.rows):
+            text = ("," if i else "") + json.dumps(row)
+            for start in range(0, len(text), chunk_size):
+                yield text[start : start + chunk_size].encode("utf-8")
+        yield b"]}"
+
+    def close(self):
+        self.rows = []
+
+
+class FileBackend(StatusDBBackend):
+    """Serves view rows and documents from a fixture with the layout of a snapshot bundle:
+
+        {"views": {"<db>/<ddoc>/<view>": [{"key": ..., "id": ..., "value": ...}]},
+         "docs": {"<db>": {"<doc id>": {...}}}}
+
+    The 'project/project_name' and 'project/project_id' views of the projects
+    database are built from the project documents if the fixture does not list them.
+    The changes feed of every database starts with a change for each of its
+    documents, later changes are made with put_document and delete_document.
+
+    :param dict fixture: The contents of the fixture
+    :param float latency: Seconds to wait before answering every request
+    """
+
+    def __init__(self, fixture, latency=0):
+        self.latency = latency
+        self.docs = {db: dict(docs) for db, docs in fixture.get("docs", {}).items()}
+        views = dict(fixture.get("views", {}))
+        for field in ["project_name", "project_id"]:
+            name = view_name("projects", "project", field)
+            if name not in views and self.docs.get("projects"):
+                views[name] = [
+                    {"key": doc.get(field), "id": doc_id, "value": None}
+                    for doc_id, doc in self.docs["projects"].items()
+                ]
+        self.views = {name: self._sort_rows(rows) for name, rows in views.items()}
+        self.changes = {
+            db: [{"seq": seq, "id": doc_id} for seq, doc_id in enumerate(docs, 1)]
+            for db, docs in self.docs.items()
+        }
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Load a fixture from a JSON file, gzipped if the name ends with '.gz'"""
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            return cls(json.load(fh), **kwargs)
+
+    @staticmethod
+    def _sort_rows(rows):
+        return sorted(
+            rows, key=lambda row: (row["key"] is not None, str(row["key"]), row["id"])
+        )
+
+    def _update_seq(self, db):
+        changes = self.changes.get(db)
+        return changes[-1]["seq"] if changes else 0
+
+    def _add_change(self, db, doc_id, deleted=False):
+        change = {"seq": self._update_seq(db) + 1, "id": doc_id}
+        if deleted:
+            change["deleted"] = True
+        self.changes.setdefault(db, []).append(change)
+
+    def put_document(self, db, doc, view_rows=None):
+        """Store a document, replacing the one with the same ID, as a new change of
+        the database
+
+        :param dict doc: The document, with its '_id'
+        :param dict view_rows: The rows the document emits, by view name as in the
+            fixture. They replace the rows it emitted in these views before
+        """
+        self.docs.setdefault(db, {})[doc["_id"]] = doc
+        for name, rows in (view_rows or {}).items():
+            self.views[name] = self._sort_rows(
+                [row for row in self.views.get(name, []) if row["id"] != doc["_id"]]
+                + [dict(row, id=doc["_id"]) for row in rows]
+            )
+        self._add_change(db, doc["_id"])
+
+    def delete_document(self, db, doc_id):
+        """Delete a document and its view rows as a new change of the database"""
+        self.docs.get(db, {}).pop(doc_id, None)
+        for name, rows in self.views.items():
+            if name.startswith(f"{db}/"):
+                self.views[name] = [row for row in rows if row["id"] != doc_id]
+        self._add_change(db, doc_id, deleted=True)
+
+    def _request(self):
+        # Fixture data is not counted as received bytes, unless it is streamed
+        timings.TIMINGS.add_request()
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _doc(self, db, doc_id):
+        doc = self.docs.get(db, {}).get(doc_id)
+        # Hand out copies as the callers are free to modify the documents
+        return copy.deepcopy(doc) if doc else None
+
+    def get_server_information(self):
+        self._request()
+        return DetailedResponse(response={"couchdb": "Welcome", "backend": "file"})
+
+    def _view_rows(
+        self,
+        db,
+        ddoc,
+        view,
+        key=None,
+        keys=None,
+        start_key=None,
+        end_key=None,
+        include_docs=False,
+        **kwargs,
+    ):
+        """Rows of a view request, with the documents of the fixture themselves"""
+        rows = self.views.get(view_name(db, ddoc, view), [])
+        if keys is not None:
+            rows = [row for k in keys for row in rows if row["key"] == k]
+        elif key is not None:
+            rows = [row for row in rows if row["key"] == key]
+        else:
+            # Keys of the served views are strings or null, null sorts first
+            if start_key is not None:
+                rows = [
+                    row
+                    for row in rows
+                    if row["key"] is not None and row["key"] >= start_key
+                ]
+            if end_key is not None:
+                rows = [
+                    row for row in rows if row["key"] is None or row["key"] <= end_key
+                ]
+        for row in rows:
+            row = dict(row)
+            if include_docs:
+                row["doc"] = self.docs.get(db, {}).get(row["id"]) or None
+            yield row
+
+    def _all_docs_rows(self, db, keys=None, include_docs=False, **kwargs):
+        """Rows of an '_all_docs' request, with the documents of the fixture themselves"""
+        for doc_id in keys if keys is not None else sorted(self.docs.get(db, {})):
+            doc = self.docs.get(db, {}).get(doc_id)
+            if not doc:
+                yield {"key": doc_id, "error": "not_found"}
+                continue
+            row = {"key": doc_id, "id": doc_id, "value": {"rev": doc.get("_rev")}}
+            if include_docs:
+                row["doc"] = doc
+            yield row
+
+    def post_view(self, db, ddoc, view, **kwargs):
+        self._request()
+        # Hand out copies as the callers are free to modify the documents
+        result = copy.deepcopy(list(self._view_rows(db, ddoc, view, **kwargs)))
+        return DetailedResponse(response={"total_rows": len(result), "rows": result})
+
+    def post_all_docs(self, db, keys=None, include_docs=False, **kwargs):
+        self._request()
+        result = copy.deepcopy(
+            list(self._all_docs_rows(db, keys, include_docs, **kwargs))
+        )
+        return DetailedResponse(response={"total_rows": len(result), "rows": result})
+
+    def post_view_as_stream(self, db, ddoc, view, **kwargs):
+        self._request()
+        return DetailedResponse(
+            response=StreamedResponse(self._view_rows(db, ddoc, view, **kwargs))
+        )
+
+    def post_all_docs_as_stream(self, db, keys=None, include_docs=False, **kwargs):
+        self._request()
+        return DetailedResponse(
+            response=StreamedResponse(
+                self._all_docs_rows(db, keys, include_docs, **kwargs)
+            )
+        )
+
+    def get_database_information(self, db, **kwargs):
+        self._request()
+        return DetailedResponse(
+            response={
+                "db_name": db,
+                "doc_count": len(self.docs.get(db, {})),
+                "update_seq": self._update_seq(db),
+            }
+        )
+
+    def post_changes(self, db, since=0, filter=None, view=None, **kwargs):
+        """The latest change of every document changed after the given sequence. With
+        the '_view' filter only the documents with rows in the view and the deleted
+        documents are listed."""
+        self._request()
+        latest = {}
+        for change in self.changes.get(db, []):
+            if change["seq"] > int(since or 0):
+                latest.pop(change["id"], None)
+                latest[change["id"]] = change
+        results = list(latest.values())
+        if filter == "_view":
+            view_ids = {
+                row["id"] for row in self.views.get(view_name(db, *view.split("/")), [])
+            }
+            results = [
+                change
+                for change in results
+                if change.get("deleted") or change["id"] in view_ids
+            ]
+        return DetailedResponse(
+            response={
+                "results": copy.deepcopy(results),
+                "last_seq": self._update_seq(db),
+            }
+        )
+
+    def get_document(self, db, doc_id, **kwargs):
+        self._request()
+        doc = self._doc(db, doc_id)
+        if not doc:
+            raise KeyError(f"No document '{doc_id}' in {db}")
+        return DetailedResponse(response=doc)
@@ -0,0 +1,123 @@
+"""Local on-disk cache of StatusDB documents"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Default location and size limit of the cache, can be overridden with
+# 'cache_dir' and 'cache_size_mb' in the statusdb.yaml config
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("HOME"), ".ngi_reports", "cache")
+DEFAULT_CACHE_SIZE_MB = 2048
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_document_cache(cache_dir=None, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+    """Get the DocumentCache for the given directory, shared within the process
+
+    :param str cache_dir: Directory to keep the cached documents in
+    :param int max_size_mb: Max total size of the cached documents in MB
+    """
+    cache_dir = os.path.realpath(os.path.expanduser(cache_dir or DEFAULT_CACHE_DIR))
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = DocumentCache(
+                cache_dir, int(max_size_mb * 1024 * 1024)
+            )
+        return _caches[cache_dir]
+
+
+class DocumentCache(object):
+    """Cache of StatusDB documents, stored as one gzipped JSON file per document.
+    A cached document is only served if its '_rev' matches the current revision
+    in the database. The least recently used documents are removed once the
+    total size goes above the limit.
+
+    :param str cache_dir: Directory to keep the cached documents in
+    :param int max_size: Max total size of the cached documents in bytes
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, db, doc_id):
+        doc_hash = hashlib.sha1(doc_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, db, f"{doc_hash}.json.gz")
+
+    def _cached_files(self):
+        """List (last access time, size, path) for all cached documents"""
+        files = []
+        for root, dirs, fnames in os.walk(self.cache_dir):
+            for fname in fnames:
+                if not fname.endswith(".json.gz"):
+                    continue
+                path = os.path.join(root, fname)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def get(self, db, doc_id, rev):
+        """Get the cached document if it is at the given revision, None otherwise"""
+        path = self._path(db, doc_id)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                doc = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if doc.get("_rev") != rev:
+            return None
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return doc
+
+    def put(self, db, doc):
+        """Store the document, replacing any older revision of it"""
+        path = self._path(db, doc["_id"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial document
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(
+                raw, "wt", encoding="utf-8"
+            ) as fh:
+                json.dump(doc, fh)
+            new_size = os.path.getsize(tmp_path)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._cached_files())
+            else:
+                self._size += new_size - old_size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """Remove the least recently used documents until the cache is within its size limit"""
+        files = sorted(self._cached_files())
+        self._size = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
@@ -4,6 +4,8 @@ import configparser
 import os
 from string import Template
 
+from ngi_reports.utils.errors import ConfigError
+
 def load_config(config_file=None):
     """Loads a configuration file.
 
@@ -19,7 +21,7 @@ def load_config(config_file=None):
             config.readfp(f)
         return config
     except IOError:
-        raise IOError(("There was a problem loading the configuration file. "
+        raise ConfigError(("There was a problem loading the configuration file. "
                 "Please make sure that ~/.ngi_config/ngi_reports.conf exists "
                 "or env variable 'NGI_REPORTS_CONFIG' is set with path to conf "
                 "file and set with read permissions"))
@@ -0,0 +1,99 @@
+"""Conversion of the markdown reports to HTML. The Markdown parser, the HTML page
+template and the texts of the placeholders are loaded once per process and reused
+for every report converted, which matters when converting many reports in batch
+mode or with -md."""
+
+import os
+import re
+import threading
+
+import markdown
+
+from ngi_reports.utils import templates
+
+MARKDOWN_EXTENSIONS = ["meta", "tables", "def_list", "fenced_code", "mdx_outline"]
+
+# Placeholders of the reports shown as icons in the HTML, '[swedac]' is replaced
+# with the contents of swedac.html
+HTML_PLACEHOLDERS = {
+    "[tick]": '<span class="icon_tick">&#10004;</span> ',
+    "[cross]": '<span class="icon_cross">&#10008;</span> ',
+    "[pass]": '<span class="pass">Pass</span>',
+    "[fail]": '<span class="fail">Fail</span>',
+    "[na]": "<code>NA</code>",
+}
+
+# Placeholders of the QC statuses in the TXT tables
+TXT_PLACEHOLDERS = {"[pass]": "Pass", "[fail]": "Fail", "[na]": "NA"}
+
+_converters = {}
+_converters_lock = threading.Lock()
+
+
+class Placeholders(object):
+    """Substitutes all placeholders of a text in a single pass
+
+    :param dict replacements: The text to put in place of every placeholder
+    """
+
+    def __init__(self, replacements):
+        self.replacements = replacements
+        self.pattern = re.compile("|".join(map(re.escape, replacements)))
+
+    def sub(self, text):
+        return self.pattern.sub(lambda match: self.replacements[match.group(0)], text)
+
+
+txt_placeholders = Placeholders(TXT_PLACEHOLDERS)
+
+
+def get_converter(report_type, reports_dir=None, jinja2_env=None, html_tables=False):
+    """Get the HTMLConverter for the given report type and templates, shared within
+    the process. See HTMLConverter for the parameters."""
+    reports_dir = os.path.realpath(reports_dir or templates.REPORTS_DIR)
+    if jinja2_env is None:
+        jinja2_env = templates.get_environment(reports_dir)
+    key = (report_type, reports_dir, jinja2_env, html_tables)
+    with _converters_lock:
+        if key not in _converters:
+            _converters[key] = HTMLConverter(
+                report_type, reports_dir, jinja2_env, html_tables=html_tables
+            )
+        return _converters[key]
+
+
+class HTMLConverter(object):
+    """Converts markdown reports to HTML pages with one Markdown parser, which is
+    reset between the reports. The parser keeps the state of the report being
+    converted, so reports are converted one at a time.
+
+    :param str report_type: Type of report, the page template is <report_type>.html
+    :param str reports_dir: Directory of the page template and swedac.html
+    :param jinja2_env: Jinja2 environment to load the page template from
+    :param bool html_tables: The tables of the reports are already HTML, as rendered
+        by Report.render_template with html_tables
+    """
+
+    def __init__(self, report_type, reports_dir, jinja2_env, html_tables=False):
+        extensions = list(MARKDOWN_EXTENSIONS)
+        if html_tables:
+            extensions.append(templates.HTMLTablesExtension())
+        self.markdown = markdown.Markdown(extensions=extensions)
+        self.page_template = jinja2_env.get_template(report_type + ".html")
+        # get swedac text to add to report
+        with open(os.path.join(reports_dir, "swedac.html"), "r") as f:
+            swedac_text = f.read()
+        self.placeholders = Placeholders(
+            dict(HTML_PLACEHOLDERS, **{"[swedac]": swedac_text})
+        )
+        self._lock = threading.Lock()
+
+    def convert(self, markdown_text):
+        """Convert the text of a markdown report to an HTML page"""
+        with self._lock:
+            self.markdown.reset()
+            markeddown_text = self.markdown.convert(markdown_text)
+            # Markdown meta returns a dict with values as lists
+            meta = {key: "".join(value) for (key, value) in self.markdown.Meta.items()}
+        html_out = self.page_template.render(body=markeddown_text, meta=meta)
+        return self.placeholders.sub(html_out)
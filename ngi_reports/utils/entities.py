@@ -1,12 +1,14 @@
 """Define various entities and populate them"""
 
+import asyncio
 import re
-import sys
 import numpy as np
-from collections import defaultdict, OrderedDict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 
-from ngi_reports.utils import statusdb
+from ngi_reports.utils import aggregation, errors, statusdb, timings
 
 
 def get_units_and_divisor(reads):
@@ -23,14 +25,170 @@ def get_units_and_divisor(reads):
     return (unit, divisor)
 
 
+# Parts of the run documents that are kept whole
+RUN_DOCUMENT_KEYS = [
+    "_id",
+    "_rev",
+    "RunInfo",
+    "RunParameters",
+    "DemultiplexConfig",
+    "Software",
+    "lims",
+    "protocol_run_info",
+]
+
+
+def row_in_projects(row, project_names):
+    """Whether a per barcode statistics row of a run belongs to one of the projects"""
+    project = row.get("Project", "")
+    return re.sub("_+", ".", project, 1) in project_names or project in project_names
+
+
+def samplesheet_row_in_projects(row, project_ids):
+    """Whether a samplesheet row of a run belongs to one of the projects"""
+    return str(row.get("Sample_Name", "")).split("_")[0] in project_ids
+
+
+def project_fc_fields(project_names, project_ids):
+    """The parts of a run document read by extract_project_fc_details, so that only
+    these are built while the document is parsed, see statusdb.build_value
+
+    :param set project_names: NGI names of the projects
+    :param set project_ids: NGI IDs of the projects
+    """
+    in_project = partial(row_in_projects, project_names=project_names)
+    return dict(
+        {key: True for key in RUN_DOCUMENT_KEYS},
+        illumina={
+            "Demultiplex_Stats": {
+                "Barcode_lane_statistics": in_project,
+                "Lanes_stats": True,
+            }
+        },
+        Element={"Demultiplex_Stats": {"Index_Assignment": in_project}},
+        instrument_generated_files={
+            "RunParameters.json": True,
+            "AvitiRunStats.json": {"LaneStats": True},
+        },
+        lims_data={"run_summary": True},
+        samplesheet_csv=partial(samplesheet_row_in_projects, project_ids=project_ids),
+        acquisitions=True,
+    )
+
+
+def extract_project_fc_details(fc_details, project_names, project_ids):
+    """Keep only the parts of a run document used to report on the given projects.
+    Per barcode statistics and samplesheet rows of other projects are dropped, so
+    the size of the result depends on the projects' share of the run.
+
+    :param dict fc_details: Run document from x_flowcells, element_runs or nanopore_runs
+    :param set project_names: NGI names of the projects
+    :param set project_ids: NGI IDs of the projects
+    """
+
+    def in_project(row):
+        return row_in_projects(row, project_names)
+
+    extracted = {key: fc_details[key] for key in RUN_DOCUMENT_KEYS if key in fc_details}
+    if "illumina" in fc_details:
+        demux_stats = fc_details["illumina"].get("Demultiplex_Stats", {})
+        extracted["illumina"] = {
+            "Demultiplex_Stats": {
+                "Barcode_lane_statistics": [
+                    row
+                    for row in demux_stats.get("Barcode_lane_statistics", [])
+                    if in_project(row)
+                ],
+                "Lanes_stats": demux_stats.get("Lanes_stats", {}),
+            }
+        }
+    if "Element" in fc_details:
+        extracted["Element"] = {
+            "Demultiplex_Stats": {
+                "Index_Assignment": [
+                    row
+                    for row in fc_details["Element"]
+                    .get("Demultiplex_Stats", {})
+                    .get("Index_Assignment", [])
+                    if in_project(row)
+                ]
+            }
+        }
+    if "instrument_generated_files" in fc_details:
+        instrument_files = fc_details["instrument_generated_files"]
+        extracted["instrument_generated_files"] = {
+            "RunParameters.json": instrument_files.get("RunParameters.json", {}),
+            "AvitiRunStats.json": {
+                "LaneStats": instrument_files.get("AvitiRunStats.json", {}).get(
+                    "LaneStats", {}
+                )
+            },
+        }
+    if "lims_data" in fc_details:
+        extracted["lims_data"] = {
+            "run_summary": fc_details["lims_data"].get("run_summary", {})
+        }
+    if "samplesheet_csv" in fc_details:
+        extracted["samplesheet_csv"] = [
+            row
+            for row in fc_details["samplesheet_csv"] or []
+            if samplesheet_row_in_projects(row, project_ids)
+        ]
+    if "acquisitions" in fc_details:
+        # Only the final acquisition is reported on
+        extracted["acquisitions"] = fc_details["acquisitions"][-1:]
+    return extracted
+
+
+def fetch_run_documents(projects):
+    """Fetch the run documents of the flowcells of several projects populated with
+    Project.populate_project, with one request per run database. Runs shared by the
+    projects are only fetched once and keep the rows of all of the projects.
+    Returns the documents by run database and run name.
+
+    :param list projects: Project objects
+    """
+    run_names = OrderedDict()
+    connections = {}
+    for proj in projects:
+        connections[proj.fc_connection.dbname] = proj.fc_connection
+        db_run_names = run_names.setdefault(proj.fc_connection.dbname, OrderedDict())
+        for fc in proj.flowcell_info.values():
+            db_run_names[fc["run_name"]] = None
+    project_names = {proj.ngi_name for proj in projects}
+    project_ids = {proj.ngi_id for proj in projects}
+    extract = partial(
+        extract_project_fc_details,
+        project_names=project_names,
+        project_ids=project_ids,
+    )
+    fields = project_fc_fields(project_names, project_ids)
+    return {
+        dbname: connections[dbname].get_entries(list(db_run_names), extract, fields)
+        for dbname, db_run_names in run_names.items()
+    }
+
+
 class Sample:
-    """Sample class"""
+    """Sample class. Only the values shown in the reports are kept, not the sample
+    document they are read from."""
+
+    __slots__ = (
+        "ngi_id",
+        "status",
+        "customer_name",
+        "initial_qc",
+        "preps",
+        "qscore",
+        "total_reads",
+        "read_length",
+        "flowcells",
+    )
 
     def __init__(self, sample_id, sample_info, status):
         self.ngi_id = sample_id
         self.status = status
-        self.sample_info = sample_info
-        self.customer_name = self.sample_info.get("customer_name", "NA")
+        self.customer_name = sample_info.get("customer_name", "NA")
 
         self.initial_qc = {
             "initial_qc_status": "",
@@ -47,22 +205,23 @@ class Sample:
         self.read_length = 0.0
         self.flowcells = []
 
-    def populate_sample(self, log, library_construction, **kwargs):
+    def populate_sample(self, log, sample_info, library_construction, **kwargs):
+        """Populate the sample from its entry in the 'samples' of the project document"""
         # Initial QC
-        if self.sample_info.get("initial_qc"):
+        if sample_info.get("initial_qc"):
             for item in self.initial_qc:
-                self.initial_qc[item] = self.sample_info["initial_qc"].get(item)
+                self.initial_qc[item] = sample_info["initial_qc"].get(item)
                 if (
                     item == "initial_qc_status"
-                    and self.sample_info["initial_qc"]["initial_qc_status"] == "UNKNOWN"
+                    and sample_info["initial_qc"]["initial_qc_status"] == "UNKNOWN"
                 ):
                     self.initial_qc[item] = "NA"
 
         # Library prep
         # Go through each prep for each sample in the Projects database
-        for prep_id, prep_info in self.sample_info.get("library_prep", {}).items():
-            prepObj = Prep(prep_id, prep_info)
-            prepObj.populate_prep(log, library_construction)
+        for prep_id, prep_info in sample_info.get("library_prep", {}).items():
+            prepObj = Prep(prep_id)
+            prepObj.populate_prep(log, prep_info, library_construction)
             if prepObj.barcode == "NA":
                 log.warning(
                     f"Barcode missing for sample {self.ngi_id} in prep {prep_id}. "
@@ -84,9 +243,18 @@ class Sample:
 class Prep:
     """Prep class"""
 
-    def __init__(self, prep_id, prep_info):
+    __slots__ = (
+        "prep_id",
+        "label",
+        "avg_size",
+        "barcode",
+        "qc_status",
+        "seq_fc",
+        "sequenced_fc",
+    )
+
+    def __init__(self, prep_id):
         self.prep_id = prep_id
-        self.prep_info = prep_info
 
         self.label = "Lib. " + self.prep_id
 
@@ -94,17 +262,21 @@ class Prep:
         self.barcode = "NA"
         self.qc_status = "NA"
         self.seq_fc = []
+        self.sequenced_fc = []
 
-    def populate_prep(self, log, library_construction):
+    def populate_prep(self, log, prep_info, library_construction):
+        """Populate the prep from its entry in the 'library_prep' of a sample"""
         if "by user" in library_construction.lower():
             self.label = "NA"
-        self.barcode = self.prep_info.get("reagent_label", "NA")
-        self.qc_status = self.prep_info.get("prep_status", "NA")
-        if self.prep_info.get("sample_run_metrics"):
-            self.seq_fc = self.prep_info.get("sample_run_metrics").keys()
+        self.barcode = prep_info.get("reagent_label", "NA")
+        self.qc_status = prep_info.get("prep_status", "NA")
+        if prep_info.get("sample_run_metrics"):
+            self.seq_fc = list(prep_info.get("sample_run_metrics").keys())
+        # Used instead of seq_fc by Project.replace_barcodes
+        self.sequenced_fc = prep_info.get("sequenced_fc") or []
         if "pcr-free" not in library_construction.lower():
-            if self.prep_info.get("library_validation"):
-                lib_valids = self.prep_info["library_validation"]
+            if prep_info.get("library_validation"):
+                lib_valids = prep_info["library_validation"]
                 keys = sorted(
                     [k for k in lib_valids.keys() if re.match("^[\d\-]*$", k)],
                     key=lambda k: datetime.strptime(
@@ -124,19 +296,93 @@ class Prep:
                 log.warning("No library validation step found")
 
 
+class RunIndex:
+    """Lookups into a run document, built in one pass over it: the barcode rows of
+    every project, and the demultiplexing statistics and LIMS run summary of every lane.
+    Use from_illumina or from_element to build it from a run document.
+    """
+
+    def __init__(self):
+        self.barcode_rows = []
+        self.rows_by_project = {}
+        self.rows_by_raw_project = {}
+        self.lane_demux = {}
+        self.lane_lims = {}
+
+    def add_barcode_rows(self, barcode_rows):
+        for i, row in enumerate(barcode_rows):
+            raw_project = row.get("Project", "")
+            project = re.sub("_+", ".", raw_project, 1)
+            self.rows_by_project.setdefault(project, []).append(i)
+            if raw_project != project:
+                self.rows_by_raw_project.setdefault(raw_project, []).append(i)
+        self.barcode_rows = barcode_rows
+
+    @classmethod
+    @timings.timed("run index")
+    def from_illumina(cls, fc_details):
+        run_index = cls()
+        demux_stats = fc_details.get("illumina", {}).get("Demultiplex_Stats", {})
+        run_index.add_barcode_rows(demux_stats.get("Barcode_lane_statistics", []))
+        for lane_stats in demux_stats.get("Lanes_stats", {}):
+            run_index.lane_demux.setdefault(lane_stats["Lane"], lane_stats)
+        run_index.lane_lims = fc_details.get("lims_data", {}).get("run_summary", {})
+        return run_index
+
+    @classmethod
+    @timings.timed("run index")
+    def from_element(cls, fc_details):
+        run_index = cls()
+        run_index.add_barcode_rows(
+            fc_details.get("Element", {})
+            .get("Demultiplex_Stats", {})
+            .get("Index_Assignment", [])
+        )
+        for lane_stats in (
+            fc_details.get("instrument_generated_files", {})
+            .get("AvitiRunStats.json", {})
+            .get("LaneStats", {})
+        ):
+            run_index.lane_demux[str(lane_stats.get("Lane"))] = lane_stats
+        run_index.lane_lims = fc_details.get("lims_data", {}).get("run_summary", {})
+        return run_index
+
+    def project_rows(self, project_name, match_raw_name=False):
+        """Barcode rows of a project in document order. Project names of the rows are
+        matched after replacing the first run of underscores with a dot.
+
+        :param str project_name: NGI name of the project
+        :param bool match_raw_name: also match the project names of the rows as they are
+        """
+        indices = self.rows_by_project.get(project_name, [])
+        if match_raw_name:
+            indices = sorted(indices + self.rows_by_raw_project.get(project_name, []))
+        return [self.barcode_rows[i] for i in indices]
+
+    def lane_lims_summary(self, lane):
+        return self.lane_lims.get(lane, self.lane_lims.get("A", {}))
+
+
 class Flowcell:
     """Flowcell class"""
 
-    def __init__(self, fc, ngi_name, db_connection):
+    def __init__(self, fc, ngi_name, db_connection, fc_details=None):
         self.fc = fc
         self.project_name = ngi_name
         self.db_connection = db_connection
         self.name = self.fc.get("name", "")
         self.run_name = self.fc.get("run_name", "")
         self.date = self.fc.get("date", "")
-        self.fc_details = self.db_connection.get_entry(self.run_name)
+        # Fetch the document unless it was already retrieved in bulk
+        if fc_details is None:
+            fc_details = self.db_connection.get_entry(self.run_name)
+        self.fc_details = fc_details
         self.lanes = OrderedDict()
-        self.fc_sample_qvalues = defaultdict(dict)
+        self.barcode_rows = aggregation.barcode_rows()
+
+    def summarize(self, project_id):
+        """Get a FlowcellSummary of the parsed flowcell, which does not keep the run document"""
+        return FlowcellSummary(self, project_id)
 
     def populate_illumina_flowcell(self, log, **kwargs):
         fc_instrument = self.fc_details.get("RunInfo", {}).get("Instrument", "")
@@ -197,8 +443,9 @@ class Flowcell:
             }
 
         else:
-            log.warning("Unknown sequencing instrument detected: {fc_instrument}")
-            sys.exit(1)
+            raise errors.DataError(
+                f"Unknown sequencing instrument detected: {fc_instrument}"
+            )
 
         try:
             self.casava = (
@@ -210,18 +457,20 @@ class Flowcell:
         except KeyError:
             self.casava = None
 
-        self.barcode_lane_statistics = (
-            self.fc_details.get("illumina", {})
-            .get("Demultiplex_Stats", {})
-            .get("Barcode_lane_statistics", [])
-        )
-        for barcode_stat in self.barcode_lane_statistics:
-            if (
-                re.sub("_+", ".", barcode_stat["Project"], 1) != self.project_name
-                and barcode_stat["Project"] != self.project_name
-            ):
-                continue
-
+        self.run_index = RunIndex.from_illumina(self.fc_details)
+        self.barcode_lane_statistics = self.run_index.barcode_rows
+        try:
+            num_cycles = [
+                int(x["NumCycles"]) for x in self.run_setup if x["IsIndexedRead"] == "N"
+            ]
+        except (TypeError, ValueError) as e:
+            log.warning(f"Could not get the number of cycles of FC {self.name}: {e}")
+            num_cycles = None
+        samples = set(kwargs.get("samples") or [])
+        rows = []
+        for barcode_stat in self.run_index.project_rows(
+            self.project_name, match_raw_name=True
+        ):
             lane = barcode_stat.get("Lane")
             sample = barcode_stat.get("Sample")
             barcode = barcode_stat.get("Barcode sequence")
@@ -233,67 +482,48 @@ class Flowcell:
                 )
                 continue
 
-            if kwargs.get("samples", []) and sample not in kwargs.get("samples", []):
+            if samples and sample not in samples:
                 continue
 
             try:
                 read_index = f"{lane}_{self.name}_{barcode}"
-                num_cycles = [
-                    x["NumCycles"] for x in self.run_setup if x["IsIndexedRead"] == "N"
-                ]
-                num_cycles = [int(x) for x in num_cycles]
                 qval = float(barcode_stat.get("% >= Q30bases"))
                 pf_reads = int(barcode_stat.get("PF Clusters").replace(",", ""))
                 base = pf_reads * sum(num_cycles)
-                self.fc_sample_qvalues[sample][read_index] = {
-                    "qval": qval,
-                    "reads": pf_reads,
-                    "bases": base,
-                }
-
             except (TypeError, ValueError, AttributeError) as e:
                 log.warning(
                     f"Something went wrong while fetching Q30 for sample {sample} with "
                     f"barcode {barcode} in FC {self.name} at lane {lane}. Error was: \n{e}"
                 )
-                pass
+                continue
+            rows.append((sample, lane, self.name, read_index, pf_reads, base, qval))
 
             # Collect lanes of interest
-            fc_lane_summary_lims = self.fc_details.get("lims_data", {}).get(
-                "run_summary", {}
-            )
-            fc_lane_summary_demux = (
-                self.fc_details.get("illumina", {})
-                .get("Demultiplex_Stats", {})
-                .get("Lanes_stats", {})
-            )
             if lane not in self.lanes:
                 laneObj = Lane(lane)
                 laneObj.populate_illumina_lane(
-                    fc_lane_summary_lims,
-                    fc_lane_summary_demux,
+                    self.run_index,
                     num_cycles,
                     self.name,
                     **kwargs,
                 )
-                laneObj.increase_total_reads_and_q30(pf_reads, qval)
-
-                # Check if the above created lane object has all needed info
-                for k, v in vars(laneObj).items():
-                    if not v:
-                        log.warning(
-                            f"Could not fetch {k} for FC {self.name} at lane {lane}"
-                        )
-
                 self.lanes[lane] = laneObj
-            # Add total reads and Q30 to lane data
-            else:
-                laneObj = self.lanes[lane]
-                laneObj.increase_total_reads_and_q30(pf_reads, qval)
+        with timings.stage("aggregation"):
+            self.barcode_rows = aggregation.barcode_rows(rows)
+            lane_totals = aggregation.lane_totals(self.barcode_rows)
 
-        # Add units and round off value
+        # Add lane totals, units and round off value
         for lane in self.lanes:
             laneObj = self.lanes[lane]
+            laneObj.set_total_reads_and_q30(*lane_totals[lane])
+
+            # Check if the lane object has all needed info
+            for k, v in laneObj.as_dict().items():
+                if not v:
+                    log.warning(
+                        f"Could not fetch {k} for FC {self.name} at lane {lane}"
+                    )
+
             laneObj.reads_unit, lane_divisor = get_units_and_divisor(
                 laneObj.total_reads_proj
             )
@@ -318,15 +548,16 @@ class Flowcell:
                 "Version", {}
             )
         }
-        self.barcode_lane_statistics = (
-            self.fc_details.get("Element", {})
-            .get("Demultiplex_Stats", {})
-            .get("Index_Assignment", [])
-        )
-        for barcode_stat in self.barcode_lane_statistics:
-            if re.sub("_+", ".", barcode_stat["Project"], 1) != self.project_name:
-                continue
-
+        self.run_index = RunIndex.from_element(self.fc_details)
+        self.barcode_lane_statistics = self.run_index.barcode_rows
+        try:
+            num_cycles = [int(self.run_setup.get("R1")), int(self.run_setup.get("R2"))]
+        except (TypeError, ValueError) as e:
+            log.warning(f"Could not get the number of cycles of FC {self.name}: {e}")
+            num_cycles = None
+        samples = set(kwargs.get("samples") or [])
+        rows = []
+        for barcode_stat in self.run_index.project_rows(self.project_name):
             lane = barcode_stat.get("Lane")
             sample = barcode_stat.get("SampleName")
             barcode = f"{barcode_stat.get('I1')}+{barcode_stat.get('I2')}"
@@ -338,59 +569,40 @@ class Flowcell:
                 )
                 continue
 
-            if kwargs.get("samples", []) and sample not in kwargs.get("samples", []):
+            if samples and sample not in samples:
                 continue
 
             try:
                 read_index = f"{lane}_{self.name}_{barcode}"
-                num_cycles = [
-                    int(self.run_setup.get("R1")),
-                    int(self.run_setup.get("R2")),
-                ]
                 qval = float(barcode_stat.get("PercentQ30"))
                 pf_reads = int(barcode_stat.get("NumPoloniesAssigned"))
                 base = pf_reads * sum(num_cycles)
-                self.fc_sample_qvalues[sample][read_index] = {
-                    "qval": qval,
-                    "reads": pf_reads,
-                    "bases": base,
-                }
-
             except (TypeError, ValueError, AttributeError) as e:
                 log.warning(
                     f"Something went wrong while fetching Q30 for sample {sample} with "
                     f"barcode {barcode} in FC {self.name} at lane {lane}. Error was: \n{e}"
                 )
-                pass
+                continue
+            rows.append((sample, lane, self.name, read_index, pf_reads, base, qval))
 
             # Collect lanes of interest
-            fc_lane_summary_lims = self.fc_details.get("lims_data", {}).get(
-                "run_summary", {}
-            )
-            fc_lane_summary_demux = (
-                self.fc_details.get("instrument_generated_files", {})
-                .get("AvitiRunStats.json", {})
-                .get("LaneStats", {})
-            )
             if lane not in self.lanes:
                 laneObj = Lane(lane)
                 laneObj.populate_element_lane(
-                    fc_lane_summary_lims,
-                    fc_lane_summary_demux,
+                    self.run_index,
                     num_cycles,
                     self.name,
                     **kwargs,
                 )
-                laneObj.increase_total_reads_and_q30(pf_reads, qval)
                 self.lanes[lane] = laneObj
-            # Add total reads and Q30 to lane data
-            else:
-                laneObj = self.lanes[lane]
-                laneObj.increase_total_reads_and_q30(pf_reads, qval)
+        with timings.stage("aggregation"):
+            self.barcode_rows = aggregation.barcode_rows(rows)
+            lane_totals = aggregation.lane_totals(self.barcode_rows)
 
-        # Add units and round off value
+        # Add lane totals, units and round off value
         for lane in self.lanes:
             laneObj = self.lanes[lane]
+            laneObj.set_total_reads_and_q30(*lane_totals[lane])
             laneObj.reads_unit, lane_divisor = get_units_and_divisor(
                 laneObj.total_reads_proj
             )
@@ -502,9 +714,70 @@ class Flowcell:
             )
 
 
+class FlowcellSummary:
+    """The parts of a parsed Flowcell used by the reports and by Project.replace_barcodes,
+    kept instead of the Flowcell so that its run document can be freed.
+    Use Flowcell.summarize to make it.
+    """
+
+    # Attributes copied from the Flowcell, those not set for its platform are left unset
+    fields = (
+        "fc",
+        "name",
+        "run_name",
+        "date",
+        "type",
+        "chemistry",
+        "seq_software",
+        "run_setup",
+        "casava",
+        "fc_type",
+        "lanes",
+        "barcode_rows",
+        "fc_id",
+        "qual_threshold",
+        "n50",
+        "total_reads",
+        "fc_sample_barcodes",
+        "samples_run",
+        "sample_reads",
+        "average_read_length_passed",
+    )
+    __slots__ = fields + ("sample_sheet_samples", "project_barcodes")
+
+    def __init__(self, fcObj, project_id):
+        for field in self.fields:
+            if hasattr(fcObj, field):
+                setattr(self, field, getattr(fcObj, field))
+        if hasattr(fcObj, "sample_sheet_data"):
+            # Samplesheet samples and barcodes of the project, for replace_barcodes
+            self.sample_sheet_samples = [
+                row.get("Sample_Name")
+                for row in fcObj.sample_sheet_data or []
+                if row.get("Sample_Name").split("_")[0] == project_id
+            ]
+            self.project_barcodes = [
+                (row.get("Sample"), "-".join(row.get("Barcode sequence").split("+")))
+                for row in fcObj.barcode_lane_statistics
+                if str(row.get("Sample", "")).split("_")[0] == project_id
+            ]
+
+
 class Lane:
     """Lane class"""
 
+    __slots__ = (
+        "id",
+        "avg_qval",
+        "cluster",
+        "phix",
+        "weighted_avg_qval_proj",
+        "total_reads_proj",
+        "total_reads_with_qval_proj",
+        "reads_unit",
+        "polonies",
+    )
+
     def __init__(self, lane):
         self.id = lane
         self.avg_qval = ""
@@ -517,18 +790,13 @@ class Lane:
 
     def populate_illumina_lane(
         self,
-        fc_lane_summary_lims,
-        fc_lane_summary_demux,
+        run_index,
         num_cycles,
         FC_name,
         **kwargs,
     ):
-        lane_sum_lims = fc_lane_summary_lims.get(
-            self.id, fc_lane_summary_lims.get("A", {})
-        )
-        lane_sum_demux = [
-            d for d in fc_lane_summary_demux if d["Lane"] == str(self.id)
-        ][0]
+        lane_sum_lims = run_index.lane_lims_summary(self.id)
+        lane_sum_demux = run_index.lane_demux[str(self.id)]
         pf_clusters = float(lane_sum_demux.get("PF Clusters", "0").replace(",", ""))
         mil_pf_clusters = round(pf_clusters / 1000000, 2)
         self.cluster = "{:.2f}".format(mil_pf_clusters)
@@ -550,19 +818,13 @@ class Lane:
 
     def populate_element_lane(
         self,
-        fc_lane_summary_lims,
-        fc_lane_summary_demux,
+        run_index,
         num_cycles,
         FC_name,
         **kwargs,
     ):
-        lane_sum_lims = fc_lane_summary_lims.get(
-            self.id, fc_lane_summary_lims.get("A", {})
-        )
-        lane_sum_demux = {}
-        for d in fc_lane_summary_demux:
-            if str(d.get("Lane")) == (self.id):
-                lane_sum_demux = d
+        lane_sum_lims = run_index.lane_lims_summary(self.id)
+        lane_sum_demux = run_index.lane_demux.get(self.id, {})
         pf_polonies = float(lane_sum_demux.get("PFCount", "0"))
         mil_pf_polonies = round(pf_polonies / 1000000, 2)
         self.polonies = "{:.2f}".format(mil_pf_polonies)
@@ -579,12 +841,22 @@ class Lane:
         if kwargs.get("fc_phix", {}).get(FC_name, {}):
             self.phix = kwargs.get("fc_phix").get(FC_name).get(self.id)
 
-    def increase_total_reads_and_q30(self, pf_reads, qval):
-        # Calculate weighted Q30 value and add it to lane data
-        self.total_reads_proj += pf_reads
-        if pf_reads and qval:
-            self.weighted_avg_qval_proj += pf_reads * qval
-            self.total_reads_with_qval_proj += pf_reads
+    def as_dict(self):
+        """The values set on the lane by name"""
+        return {
+            field: getattr(self, field)
+            for field in self.__slots__
+            if hasattr(self, field)
+        }
+
+    def set_total_reads_and_q30(
+        self, total_reads, weighted_qval_sum, total_reads_with_qval
+    ):
+        # Add the project's reads and Q30 weighted by reads to lane data
+        self.total_reads_proj = total_reads
+        if total_reads_with_qval:
+            self.weighted_avg_qval_proj = weighted_qval_sum
+            self.total_reads_with_qval_proj = total_reads_with_qval
 
 
 class Project:
@@ -594,6 +866,8 @@ class Project:
         self.aborted_samples = OrderedDict()
         self.samples = OrderedDict()
         self.flowcells = {}
+        self.flowcell_info = {}
+        self.fc_connection = None
         self.accredited = {
             "library_preparation": "N/A",
             "data_processing": "N/A",
@@ -624,20 +898,105 @@ class Project:
         self.ngi_id = ""
         self.reference = {"genome": None, "organism": None}
         self.report_date = ""
+        self.revision = None
         self.sequencing_setup = ""
         self.skip_fastq = False
         self.user_ID = ""
         self.unit_type = ""
 
+    def retained_objects(self):
+        """The data held by the project and its flowcells by name, for the memory report"""
+        objects = {}
+        for name, value in vars(self).items():
+            if name != "flowcells" and not isinstance(
+                value, statusdb.statusdb_connection
+            ):
+                objects[f"Project.{name}"] = value
+        for fc_name, fcObj in self.flowcells.items():
+            for name in fcObj.__slots__:
+                if hasattr(fcObj, name):
+                    objects[f"Flowcell {fc_name}.{name}"] = getattr(fcObj, name)
+        return objects
+
     def populate(self, log, organism_names, **kwargs):
+        """Populate the project, its samples and its flowcells from StatusDB"""
+        if kwargs.get("async_fetch"):
+            asyncio.run(self.populate_async(log, organism_names, **kwargs))
+            return
+        self.populate_project(log, organism_names, **kwargs)
+        self.populate_flowcells(log, **kwargs)
+
+    async def populate_async(self, log, organism_names, **kwargs):
+        """Populate the project like populate, but look up and fetch its flowcells
+        while the samples are processed"""
+        proj = await asyncio.to_thread(
+            self.populate_details, log, organism_names, **kwargs
+        )
+        sample_task = asyncio.to_thread(
+            self.populate_samples, log, proj.get("samples", {}), **kwargs
+        )
+        _, fc_docs = await asyncio.gather(
+            sample_task, self.fetch_flowcells_async(log, **kwargs)
+        )
+        self.populate_flowcells(log, fc_docs=fc_docs, **kwargs)
+
+    async def fetch_flowcells_async(self, log, **kwargs):
+        """Look up the flowcells of the project and fetch their run documents"""
+        await asyncio.to_thread(self.lookup_flowcells, log, **kwargs)
+        return await statusdb.AsyncConnection(self.fc_connection).get_entries(
+            [fc["run_name"] for fc in self.flowcell_info.values()],
+            self.extract_fc_details,
+            self.get_fc_fields(),
+        )
+
+    def extract_fc_details(self, fc_details):
+        """Keep only the parts of a run document concerning this project"""
+        return extract_project_fc_details(fc_details, {self.ngi_name}, {self.ngi_id})
+
+    def get_fc_fields(self):
+        """The parts of the run documents read by extract_fc_details"""
+        return project_fc_fields({self.ngi_name}, {self.ngi_id})
+
+    def get_run_connection(self, connection_class, log, **kwargs):
+        """Connection to the run database of the project. Connections are shared between
+        the projects of a batch through the 'run_connections' dictionary in kwargs."""
+        run_connections = kwargs.get("run_connections")
+        if run_connections is not None and connection_class in run_connections:
+            return run_connections[connection_class]
+        connection = connection_class(
+            fetch_mode=kwargs.get("fc_fetch_mode", "bounded"),
+            log=log,
+            use_cache=kwargs.get("cache"),
+            client=kwargs.get("statusdb_client"),
+        )
+        if run_connections is not None:
+            run_connections[connection_class] = connection
+        return connection
+
+    def populate_project(self, log, organism_names, **kwargs):
+        """Populate the project and its samples from StatusDB and look up the
+        flowcells it was sequenced on"""
+        proj = self.populate_details(log, organism_names, **kwargs)
+        self.populate_samples(log, proj.get("samples", {}), **kwargs)
+        self.lookup_flowcells(log, **kwargs)
+
+    @timings.timed("project fetch")
+    def populate_details(self, log, organism_names, **kwargs):
+        """Fetch the project document from StatusDB and populate the project details.
+        Returns the project document."""
         project = kwargs.get("project", "")
         if not project:
-            log.error("A project must be provided, so not proceeding.")
-            sys.exit("A project was not provided, stopping execution...")
+            raise errors.InvalidOptionsError(
+                "A project must be provided, so not proceeding."
+            )
         self.skip_fastq = kwargs.get("skip_fastq")
         self.cluster = kwargs.get("cluster")
 
-        pcon = statusdb.ProjectSummaryConnection()
+        pcon = statusdb.ProjectSummaryConnection(
+            log=log,
+            use_cache=kwargs.get("cache"),
+            client=kwargs.get("statusdb_client"),
+        )
         assert pcon, f"Could not connect to {project} database in StatusDB"
 
         if re.match(r"^P\d+$", project):
@@ -649,23 +1008,25 @@ class Project:
 
         proj = pcon.get_entry(project, use_id_view=id_view)
         if not proj:
-            log.error(
+            raise errors.ProjectNotFoundError(
                 f'No such project name/id "{project}", check if provided information is right'
             )
-            sys.exit("Project not found in statusdb, stopping execution...")
         self.ngi_name = proj.get("project_name")
+        self.revision = proj.get("_rev")
         if not id_view:
             self.ngi_id = proj.get("project_id")
 
         if proj.get("source") != "lims":
-            log.error(f"The source for data for project {project} is not LIMS.")
-            raise BaseException
+            raise errors.DataError(
+                f"The source for data for project {project} is not LIMS."
+            )
 
         proj_details = proj.get("details", {})
 
         if "aborted" in proj_details:
-            log.warning(f"Project {project} was aborted, so not proceeding.")
-            sys.exit(f"Project {project} was aborted, stopping execution...")
+            raise errors.ProjectAbortedError(
+                f"Project {project} was aborted, so not proceeding."
+            )
 
         for date in self.dates:
             self.dates[date] = proj_details.get(date, None)
@@ -742,7 +1103,15 @@ class Project:
             self.accredited[key] = proj_details.get(f"accredited_({key})")
 
         self.sequencing_setup = proj_details.get("sequencing_setup")
-        for sample_id, sample_info in sorted(proj.get("samples", {}).items()):
+        return proj
+
+    @timings.timed("sample processing")
+    def populate_samples(self, log, proj_samples, **kwargs):
+        """Populate the samples of the project
+
+        :param dict proj_samples: the 'samples' of the project document
+        """
+        for sample_id, sample_info in sorted(proj_samples.items()):
             if kwargs.get("samples", []) and sample_id not in kwargs.get("samples", []):
                 log.info(
                     f"Will not include sample {sample_id} as it is not in given list"
@@ -774,57 +1143,121 @@ class Project:
                 if not kwargs.get("yield_from_fc"):
                     continue
             sampleObj = Sample(sample_id, sample_info, status="Sequenced")
-            sampleObj.populate_sample(log, self.library_construction, **kwargs)
+            sampleObj.populate_sample(
+                log, sample_info, self.library_construction, **kwargs
+            )
             self.samples[sample_id] = sampleObj
 
-        # Get Flowcell data
+    @timings.timed("flowcell lookup")
+    def lookup_flowcells(self, log, **kwargs):
+        """Look up the flowcells the project was sequenced on"""
         if self.sequencer_manufacturer == "illumina":
-            xcon = statusdb.X_FlowcellRunMetricsConnection()
+            xcon = self.get_run_connection(
+                statusdb.X_FlowcellRunMetricsConnection, log, **kwargs
+            )
             assert xcon, "Could not connect to x_flowcells database in StatusDB"
+            fccon = xcon
             flowcell_info = xcon.get_project_flowcell(
                 self.ngi_id, self.dates["open_date"]
             )
         elif self.sequencer_manufacturer == "ont":
-            ontcon = statusdb.NanoporeRunConnection()
+            ontcon = self.get_run_connection(
+                statusdb.NanoporeRunConnection, log, **kwargs
+            )
             assert (
                 ontcon
             ), "Could not connect to nanopore_runs (names) database in StatusDB"
+            fccon = ontcon
             flowcell_info = ontcon.get_project_flowcell(
                 self.ngi_id, self.dates["open_date"]
             )
 
         elif self.sequencer_manufacturer == "element":
-            elementcon = statusdb.ElementRunConnection()
+            elementcon = self.get_run_connection(
+                statusdb.ElementRunConnection, log, **kwargs
+            )
             assert elementcon, "Could not connect to element_runs database in StatusDB"
+            fccon = elementcon
             flowcell_info = elementcon.get_project_flowcell(self.ngi_id)
         else:
-            log.error(
-                f"Unkown sequencer manufacturer: {self.sequencer_manufacturer}. Exiting."
+            raise errors.DataError(
+                f"Unkown sequencer manufacturer: {self.sequencer_manufacturer}"
             )
-            sys.exit(1)
 
-        sample_qval = defaultdict(dict)
+        self.fc_connection = fccon
+        self.flowcell_info = {
+            fc_name: fc
+            for fc_name, fc in flowcell_info.items()
+            if fc["name"] not in (kwargs.get("exclude_fc") or [])
+        }
 
-        for fc in flowcell_info.values():
-            if fc["name"] in kwargs.get("exclude_fc"):
-                continue
-            if fc["db"] == "x_flowcells":
-                fcObj = Flowcell(fc, self.ngi_name, xcon)
-                fcObj.populate_illumina_flowcell(log, **kwargs)
-                for sample in fcObj.fc_sample_qvalues.keys():
-                    if sample_qval[sample]:
-                        for sample_run in fcObj.fc_sample_qvalues[sample].keys():
-                            sample_qval[sample][sample_run] = fcObj.fc_sample_qvalues[
-                                sample
-                            ][sample_run]
-                    else:
-                        sample_qval[sample] = fcObj.fc_sample_qvalues[sample]
+    def get_run_revisions(self):
+        """Current revisions of the run documents of the flowcells found by
+        populate_project, by run name. The documents themselves are not fetched."""
+        return self.fc_connection.get_revisions(
+            [fc["run_name"] for fc in self.flowcell_info.values()]
+        )
 
-            elif fc["db"] == "nanopore_runs":
-                fcObj = Flowcell(fc, self.ngi_name, ontcon)
-                val = fcObj.populate_ont_flowcell(log)
-                if val == "no LIMS information":
-                    continue
+    def populate_flowcells(self, log, fc_docs=None, **kwargs):
+        """Populate the flowcells found by populate_project and add their yield and Q30 to the samples
+
+        :param dict fc_docs: Run documents by run name, fetched from StatusDB if not given
+        """
+        fccon = self.fc_connection
+        flowcell_info = self.flowcell_info
+        fc_barcode_rows = []
+
+        # Only the parts of the run documents concerning this project are kept
+        extract = self.extract_fc_details
+        fields = self.get_fc_fields()
+        workers = kwargs.get("workers") or 1
+        if workers > 1 and fc_docs is None:
+            # Fetch and parse the flowcells concurrently, results keep the order of flowcell_info
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                fc_objs = list(
+                    executor.map(
+                        lambda fc: self.populate_flowcell(
+                            log,
+                            fc,
+                            fccon.get_entries([fc["run_name"]], extract, fields).get(
+                                fc["run_name"]
+                            ),
+                            fccon,
+                            **kwargs,
+                        ),
+                        flowcell_info.values(),
+                    )
+                )
+        else:
+            parsed = {}
+            if fc_docs is None:
+                # Fetch the documents of all flowcells in one request and parse each one
+                # as soon as it is read, so that only one is held in memory at a time
+                fcs = {fc["run_name"]: fc for fc in flowcell_info.values()}
+                for run_name, fc_details in timings.timed_iter(
+                    "flowcell fetch", fccon.iter_entries(list(fcs), extract, fields)
+                ):
+                    parsed[run_name] = self.populate_flowcell(
+                        log, fcs[run_name], fc_details, fccon, **kwargs
+                    )
+                    del fc_details
+                fc_docs = {}
+            fc_objs = [
+                (
+                    parsed[fc["run_name"]]
+                    if fc["run_name"] in parsed
+                    else self.populate_flowcell(
+                        log, fc, fc_docs.get(fc["run_name"]), fccon, **kwargs
+                    )
+                )
+                for fc in flowcell_info.values()
+            ]
+
+        # Merge the flowcell data in a fixed order so the output is the same in both modes
+        for fcObj in fc_objs:
+            if fcObj is None:
+                continue
+            if fcObj.fc["db"] == "nanopore_runs":
                 for fc_sample in fcObj.fc_sample_barcodes:
                     if fc_sample in self.samples.keys():
                         for prep in self.samples[fc_sample].preps:
@@ -842,34 +1275,27 @@ class Project:
                             log.error(f"Could not find reads for sample {fc_sample}")
                     # TODO:
                     # Might need to think about how to handle multiple preps per sample, similar to Illimina (sample_qval dict)
-
-            elif fc["db"] == "element_runs":
-                fcObj = Flowcell(fc, self.ngi_name, elementcon)
-                fcObj.populate_element_flowcell(log, **kwargs)
-                for sample in fcObj.fc_sample_qvalues.keys():
-                    if sample_qval[sample]:
-                        for sample_run in fcObj.fc_sample_qvalues[sample].keys():
-                            sample_qval[sample][sample_run] = fcObj.fc_sample_qvalues[
-                                sample
-                            ][sample_run]
-                    else:
-                        sample_qval[sample] = fcObj.fc_sample_qvalues[sample]
-
             else:
-                log.error(f"Unkown database: {fc['db']}. Exiting.")
-                sys.exit(1)
+                fc_barcode_rows.append(fcObj.barcode_rows)
 
             self.flowcells[fcObj.name] = fcObj
 
+        # Later flowcells overwrite the values of a sample run seen before
+        with timings.stage("aggregation"):
+            sample_qval = aggregation.sample_totals(
+                aggregation.unique_sample_runs(
+                    aggregation.concatenate_rows(fc_barcode_rows)
+                )
+            )
+
         if kwargs.get("barcode_from_fc"):
             if self.sequencer_manufacturer == "illumina":
                 if self.library_construction_method in ["SmartSeq 3", "10X Chromium"]:
-                    log.warning(
+                    raise errors.InvalidOptionsError(
                         f"--barcode_from_fc option is not applicable for {self.library_construction_method} "
                         "projects. Please run ngi_reports without this option and amend the report "
                         "manually in necessary."
                     )
-                    sys.exit(1)
                 else:
                     self.replace_barcodes(log)
             else:
@@ -895,12 +1321,7 @@ class Project:
         if sample_qval:
             for sample in sorted(sample_qval.keys()):
                 try:
-                    qinfo = sample_qval[sample]
-                    total_qvalsbp, total_bases, total_reads = (0, 0, 0)
-                    for k in qinfo:
-                        total_qvalsbp += qinfo[k]["qval"] * qinfo[k]["bases"]
-                        total_bases += qinfo[k]["bases"]
-                        total_reads += qinfo[k]["reads"]
+                    total_qvalsbp, total_bases, total_reads = sample_qval[sample]
                     avg_qval = (
                         float(total_qvalsbp) / total_bases
                         if total_bases
@@ -938,6 +1359,25 @@ class Project:
                     / len(self.samples[sample].flowcells)
                 )
 
+    def populate_flowcell(self, log, fc, fc_details, db_connection, **kwargs):
+        """Create the Flowcell object for a run of the project and parse its document.
+        Returns the FlowcellSummary of the flowcell, or None if the flowcell should be
+        left out of the report.
+        """
+        with timings.stage("flowcell parse", fc["run_name"]):
+            fcObj = Flowcell(fc, self.ngi_name, db_connection, fc_details)
+            if fc["db"] == "x_flowcells":
+                fcObj.populate_illumina_flowcell(log, **kwargs)
+            elif fc["db"] == "nanopore_runs":
+                val = fcObj.populate_ont_flowcell(log)
+                if val == "no LIMS information":
+                    return None
+            elif fc["db"] == "element_runs":
+                fcObj.populate_element_flowcell(log, **kwargs)
+            else:
+                raise errors.DataError(f"Unkown database: {fc['db']}")
+            return fcObj.summarize(self.ngi_id)
+
     def replace_barcodes(self, log):
         # TODO: Add more sanity checks to this function and exit if it's not applicable, e.g. for single cell
         log.info(
@@ -945,88 +1385,53 @@ class Project:
             "for the report will be taken from the flowcell instead of LIMS"
         )
 
+        # Preps of the project by the flowcells they were sequenced on
+        preps_by_fc = self.get_preps_by_flowcell(log) if self.flowcells else {}
+
         for fcObj in self.flowcells.values():
-            preps_samples_on_fc = []
-            additional_samples = []
+            preps_on_fc = preps_by_fc.get(fcObj.name, {})
+            additional_samples = set()
 
             # Get all samples from flow cell that belong to the project
-            fc_samples = []
-            for fc_sample in fcObj.sample_sheet_data:
-                if fc_sample.get("Sample_Name").split("_")[0] == self.ngi_id:
-                    fc_samples.append(fc_sample.get("Sample_Name"))
-
-            # Go through all samples in project to identify their prep_ID (only if they are on the flowcell)
-            for sample_ID in self.samples:
-                sampleObj = self.samples.get(sample_ID)
-                for prep_ID in sampleObj.preps:
-                    prepObj = sampleObj.preps.get(prep_ID)
-                    if prepObj.barcode != "NA" and prepObj.qc_status != "NA":
-                        prepObj.seq_fc = []
-                        if (
-                            not sampleObj.sample_info.get("library_prep")
-                            .get(prep_ID)
-                            .get("sequenced_fc")
-                        ):
-                            log.error(
-                                "Sequenced flowcell not defined for the project. "
-                                'Run ngi_pipelines without the "-b" flag and amend the report manually.'
-                            )
-                            sys.exit("Stopping execution...")
-                        for fc in (
-                            sampleObj.sample_info.get("library_prep")
-                            .get(prep_ID)
-                            .get("sequenced_fc")
-                        ):
-                            prepObj.seq_fc.append(fc.split("_")[-1])
-                    if fcObj.name in prepObj.seq_fc:
-                        preps_samples_on_fc.append([sample_ID, prep_ID])
-                    else:
-                        continue
+            fc_samples = set(fcObj.sample_sheet_samples)
 
             # Get samples that are on the fc but are not recorded in LIMS (i.e. added bc from undet reads)
-            if len(set(self.samples)) != len(set(fc_samples)):
-                additional_samples = list(set(fc_samples) - set(self.samples))
-                additional_samples.sort()
+            if len(self.samples) != len(fc_samples):
+                additional_samples = fc_samples.difference(self.samples)
                 log.info(
                     f"The flowcell {fcObj.run_name} contains {len(additional_samples)} sample(s) "
-                    f"({', '.join(additional_samples)}) that has/have not been defined in LIMS. "
+                    f"({', '.join(sorted(additional_samples))}) that has/have not been defined in LIMS. "
                     "They will be added to the report."
                 )
 
                 undet_iteration = 1
                 # Create additional sample and prep Objects
-                for additional_sample in additional_samples:
+                for additional_sample in sorted(additional_samples):
                     additional_sample_info = {
                         "customer_name": "unknown" + str(undet_iteration)
                     }  # Additional samples will be named "unknown[number]" in the report
                     sample_obj = Sample(
                         additional_sample, additional_sample_info, status="Sequenced"
                     )
-                    sample_obj.preps["NA"] = Prep(prep_id="NA", prep_info={"NA": "NA"})
+                    sample_obj.preps["NA"] = Prep(prep_id="NA")
                     sample_obj.preps["NA"].label = "NA"
                     sample_obj.initial_qc = {
                         "initial_qc_status": "NA",
                     }
                     self.samples[additional_sample] = sample_obj
-                    preps_samples_on_fc.append([additional_sample, "NA"])
                     undet_iteration += 1
 
-            for sample_stat in fcObj.barcode_lane_statistics:
-                new_barcode = "-".join(sample_stat.get("Barcode sequence").split("+"))
-                lib_prep = []
+            # Every sample gets the barcode of its last row on the flowcell
+            for sample, new_barcode in dict(fcObj.project_barcodes).items():
                 # Adding the now required library prep, set to NA for all non-LIMS samples
-                if sample_stat.get("Sample") in additional_samples:
-                    lib_prep.append("NA")
+                if sample in additional_samples:
+                    lib_prep = ["NA"]
                 else:  # Adding library prep for LIMS samples, we identified them earlier
-                    for sub_prep_sample in preps_samples_on_fc:
-                        if sub_prep_sample[0] == sample_stat.get("Sample"):
-                            lib_prep.append(sub_prep_sample[1])
+                    lib_prep = preps_on_fc.get(sample, [])
 
                 for prep_o_samples in lib_prep:
                     # Changing the barcode happens here!
-                    self.samples.get(sample_stat.get("Sample")).preps.get(
-                        prep_o_samples
-                    ).barcode = new_barcode
+                    self.samples[sample].preps[prep_o_samples].barcode = new_barcode
         log.info(
             "The barcode_from_fc option was used and the barcodes have been replaced. "
             "Please make sure to double check that the barcodes in the report are "
@@ -1034,6 +1439,27 @@ class Project:
             " deviations or exclusions from the accredited method(s)' section of the report."
         )
 
+    def get_preps_by_flowcell(self, log):
+        """Get the preps of the project by the names of the flowcells they were
+        sequenced on, as {flowcell name: {sample: [prep IDs]}}. The flowcells of
+        preps with a barcode and a QC status are set from 'sequenced_fc' in LIMS.
+        """
+        preps_by_fc = {}
+        for sample_ID, sampleObj in self.samples.items():
+            for prep_ID, prepObj in sampleObj.preps.items():
+                if prepObj.barcode != "NA" and prepObj.qc_status != "NA":
+                    if not prepObj.sequenced_fc:
+                        raise errors.DataError(
+                            "Sequenced flowcell not defined for the project. "
+                            'Run ngi_pipelines without the "-b" flag and amend the report manually.'
+                        )
+                    prepObj.seq_fc = [fc.split("_")[-1] for fc in prepObj.sequenced_fc]
+                for fc_name in dict.fromkeys(prepObj.seq_fc):
+                    preps_by_fc.setdefault(fc_name, {}).setdefault(
+                        sample_ID, []
+                    ).append(prep_ID)
+        return preps_by_fc
+
     def get_library_method(
         self,
         project_name,
@@ -0,0 +1,44 @@
+"""Exceptions raised while generating reports. The library code raises them instead
+of exiting, the ngi_reports command logs them and exits with their exit_status."""
+
+
+class ReportError(Exception):
+    """Base class of the errors that stop a report from being generated"""
+
+    # Exit status of the ngi_reports command when the error is raised
+    exit_status = 1
+
+
+class ConfigError(ReportError, IOError):
+    """A configuration file is missing or cannot be read"""
+
+
+class InvalidOptionsError(ReportError):
+    """The options given cannot be used for the report, e.g. no project or signature"""
+
+
+class StatusDBError(ReportError):
+    """StatusDB cannot be reached"""
+
+
+class ProjectNotFoundError(ReportError):
+    """The project is not in StatusDB"""
+
+
+class ProjectAbortedError(ReportError):
+    """The project was aborted, no report is made for it"""
+
+
+class DataError(ReportError):
+    """The StatusDB data of the project cannot be reported, e.g. runs of an unknown
+    instrument or preps without sequenced flowcells"""
+
+
+class WorkingDirError(ReportError):
+    """Writing the report to the working directory was not confirmed"""
+
+
+class ReportTypeError(ReportError):
+    """The report type is not implemented"""
+
+    exit_status = 0
@@ -0,0 +1,105 @@
+"""Fingerprints of the inputs of the reports of a project: the revisions of its
+project and run documents in StatusDB, the options and configuration that change
+the reports and the versions of the templates. With --reuse the fingerprint is
+written next to the reports, and the next run with --reuse only writes the reports
+again if it has changed, or only their HTML if nothing but the HTML templates
+changed."""
+
+import json
+import os
+from datetime import datetime
+
+from ngi_reports.utils import regenerate, templates
+
+# Options of the ngi_reports command that change the contents of the reports
+REPORT_OPTIONS = [
+    "signature",
+    "samples",
+    "samples_extra",
+    "exclude_fc",
+    "fc_phix",
+    "yield_from_fc",
+    "skip_fastq",
+    "barcode_from_fc",
+    "no_txt",
+    "direct_html",
+]
+
+
+def fingerprint_path(output_dir, proj, report_type):
+    """Path of the fingerprint of the reports of a project"""
+    return os.path.join(output_dir, f"{proj.ngi_name}_{report_type}_fingerprint.json")
+
+
+def get_markdown_template_version(report_type):
+    """Version of the templates the markdown reports of the report type are made with,
+    i.e. all templates except those of the HTML page, see
+    regenerate.get_template_version"""
+    html_templates = [f"{report_type}.html", "swedac.html"]
+    names = []
+    for root, dirs, files in os.walk(templates.REPORTS_DIR):
+        names.extend(
+            os.path.relpath(os.path.join(root, fname), templates.REPORTS_DIR)
+            for fname in files
+        )
+    return templates.template_version(
+        sorted(name for name in names if name not in html_templates)
+    )
+
+
+def get_inputs(report_type, proj, config, **kwargs):
+    """Get the inputs of the reports of a project populated with
+    Project.populate_project, with the revisions of its run documents looked up
+    without fetching them
+
+    :param config: ngi_reports configuration, see api.load_config
+    :param kwargs: The options of the ngi_reports command
+    """
+    inputs = {
+        "report_type": report_type,
+        "project_revision": proj.revision,
+        "run_revisions": proj.get_run_revisions(),
+        "options": {option: kwargs.get(option) for option in REPORT_OPTIONS},
+        "config": {
+            "support_email": config.get("ngi_reports", "support_email"),
+            "organism": proj.reference["organism"],
+        },
+        "markdown_templates": get_markdown_template_version(report_type),
+        "html_templates": regenerate.get_template_version(report_type),
+    }
+    # Compare the inputs as they are read back from the fingerprint, e.g. with lists for tuples
+    return json.loads(json.dumps(inputs))
+
+
+def load_fingerprint(path):
+    """Read a fingerprint written by write_fingerprint, None if there is none or it
+    cannot be read"""
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def changed_inputs(fingerprint, inputs):
+    """Names of the inputs that differ from those of a fingerprint"""
+    previous = fingerprint.get("inputs", {})
+    return [name for name in inputs if previous.get(name) != inputs[name]]
+
+
+def write_fingerprint(path, inputs, files):
+    """Write the fingerprint of the reports written from the given inputs
+
+    :param list files: Paths of the files written, kept relative to the fingerprint
+    """
+    return regenerate.write_manifest(
+        path,
+        {
+            "inputs": inputs,
+            "files": [
+                os.path.relpath(fname, os.path.dirname(os.path.abspath(path)))
+                for fname in files
+            ],
+            "written": datetime.now().isoformat(),
+        },
+    )
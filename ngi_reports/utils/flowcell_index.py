@@ -0,0 +1,197 @@
+"""Local SQLite index of the runs every project was sequenced on, built from the
+'names/project_ids_list' view of the run databases and kept up to date from
+their changes feeds"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# Default location of the index, can be overridden with 'flowcell_index' in the statusdb.yaml config
+DEFAULT_INDEX_PATH = os.path.join(
+    os.environ.get("HOME"), ".ngi_reports", "flowcell_index.sqlite"
+)
+
+# New runs are looked for among the runs started this many days before the latest indexed run
+REFRESH_OVERLAP_DAYS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_projects (
+    db TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    run_name TEXT NOT NULL,
+    run_date TEXT NOT NULL,
+    project_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS run_projects_project ON run_projects (db, project_id, run_date);
+CREATE INDEX IF NOT EXISTS run_projects_doc ON run_projects (db, doc_id);
+CREATE TABLE IF NOT EXISTS update_seqs (
+    db TEXT PRIMARY KEY,
+    seq TEXT NOT NULL
+);
+"""
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_flowcell_index(index_path=None):
+    """Get the FlowcellIndex stored at the given path, shared within the process
+
+    :param str index_path: Path of the SQLite file
+    """
+    index_path = os.path.realpath(os.path.expanduser(index_path or DEFAULT_INDEX_PATH))
+    with _indexes_lock:
+        if index_path not in _indexes:
+            _indexes[index_path] = FlowcellIndex(index_path)
+        return _indexes[index_path]
+
+
+class FlowcellIndex(object):
+    """Maps project IDs to the names and dates of the runs they were sequenced on,
+    for all run databases. A database is indexed in full the first time it is used,
+    later only the runs changed since the last stored update sequence are fetched.
+
+    :param str index_path: Path of the SQLite file
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._refreshed = set()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        con = sqlite3.connect(self.index_path, timeout=60)
+        con.executescript(SCHEMA)
+        return con
+
+    def refresh(self, run_connection):
+        """Bring the index of the database of the given run connection up to date,
+        only done once per database and process
+
+        :param GenericRunConnection run_connection: connection to the run database
+        """
+        dbname = run_connection.dbname
+        with self._lock:
+            if dbname in self._refreshed:
+                return
+            con = self._connect()
+            try:
+                with con:
+                    row = con.execute(
+                        "SELECT seq FROM update_seqs WHERE db = ?", (dbname,)
+                    ).fetchone()
+                    if row is None:
+                        self._rebuild(con, run_connection)
+                    else:
+                        self._update(con, run_connection, row[0])
+            finally:
+                con.close()
+            self._refreshed.add(dbname)
+
+    def _rebuild(self, con, run_connection):
+        """Index all runs of the database"""
+        dbname = run_connection.dbname
+        # Get the sequence first so that changes made during the download are fetched next time
+        seq = run_connection.get_update_seq()
+        rows = run_connection.get_project_ids_rows()
+        con.execute("DELETE FROM run_projects WHERE db = ?", (dbname,))
+        self._insert_rows(con, run_connection, rows)
+        self._set_seq(con, dbname, seq)
+
+    def _update(self, con, run_connection, since):
+        """Index the runs changed since the given update sequence"""
+        dbname = run_connection.dbname
+        changes, last_seq = run_connection.get_changes(since)
+        changed_ids = {doc_id for doc_id, deleted in changes}
+        known_runs = {}
+        for doc_id in changed_ids:
+            for (run_name,) in con.execute(
+                "SELECT DISTINCT run_name FROM run_projects WHERE db = ? AND doc_id = ?",
+                (dbname, doc_id),
+            ):
+                known_runs[doc_id] = run_name
+        updated_ids = {doc_id for doc_id, deleted in changes if not deleted}
+
+        rows = []
+        if updated_ids & set(known_runs):
+            rows += run_connection.get_project_ids_rows(
+                keys=sorted(
+                    {known_runs[doc_id] for doc_id in updated_ids & set(known_runs)}
+                )
+            )
+        new_ids = updated_ids - set(known_runs)
+        if new_ids:
+            (latest_date,) = con.execute(
+                "SELECT MAX(run_date) FROM run_projects WHERE db = ?", (dbname,)
+            ).fetchone()
+            start_date = None
+            if latest_date:
+                start_date = datetime.strptime(latest_date, "%Y-%m-%d") - timedelta(
+                    days=REFRESH_OVERLAP_DAYS
+                )
+            rows += run_connection.get_project_ids_rows(start_date=start_date)
+            if new_ids - {row["id"] for row in rows}:
+                # A new run dated before the latest indexed ones, index everything again
+                return self._rebuild(con, run_connection)
+
+        for doc_id in changed_ids:
+            con.execute(
+                "DELETE FROM run_projects WHERE db = ? AND doc_id = ?", (dbname, doc_id)
+            )
+        self._insert_rows(
+            con, run_connection, [row for row in rows if row["id"] in updated_ids]
+        )
+        self._set_seq(con, dbname, last_seq)
+
+    def _insert_rows(self, con, run_connection, rows):
+        records = []
+        for row in rows:
+            try:
+                run_date = datetime.strptime(
+                    row["key"].split("_")[0], run_connection.run_date_format
+                ).strftime("%Y-%m-%d")
+            except ValueError:
+                # Not a run name, it could never be matched to a project
+                continue
+            project_ids = row.get("value") or []
+            if isinstance(project_ids, str):
+                project_ids = [project_ids]
+            for project_id in set(project_ids):
+                records.append(
+                    (run_connection.dbname, row["id"], row["key"], run_date, project_id)
+                )
+        con.executemany(
+            "INSERT INTO run_projects (db, doc_id, run_name, run_date, project_id) "
+            "VALUES (?, ?, ?, ?, ?)",
+            records,
+        )
+
+    def _set_seq(self, con, dbname, seq):
+        con.execute(
+            "INSERT OR REPLACE INTO update_seqs (db, seq) VALUES (?, ?)",
+            (dbname, str(seq)),
+        )
+
+    def project_runs(self, dbname, project_id, start_date):
+        """Get the names of the runs of a project started on or after the given date,
+        latest runs first and runs of the same date by name
+
+        :param str dbname: Name of the run database
+        :param str project_id: NGI project ID
+        :param datetime start_date: Date the project was opened
+        """
+        con = self._connect()
+        try:
+            return [
+                run_name
+                for (run_name,) in con.execute(
+                    "SELECT run_name FROM run_projects "
+                    "WHERE db = ? AND project_id = ? AND run_date >= ? "
+                    "GROUP BY run_date, run_name ORDER BY run_date DESC, run_name",
+                    (dbname, project_id, start_date.strftime("%Y-%m-%d")),
+                )
+            ]
+        finally:
+            con.close()
@@ -0,0 +1,124 @@
+"""Regeneration of the HTML reports of existing markdown reports, e.g. after the HTML
+template or swedac.html changed. Every run records in a manifest the digest of each
+markdown file and the version of the templates its HTML was made with, and the
+next run skips the files for which neither has changed."""
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from ngi_reports import __version__
+from ngi_reports.utils import converter, templates, timings
+
+# Default name of the manifest, written to the working directory
+DEFAULT_MANIFEST = "html_manifest.json"
+
+
+def find_markdown_files(paths, report_type):
+    """Get the markdown reports to regenerate, each one once and in the order given
+
+    :param list paths: Markdown files, directories to search for markdown reports of
+        the report type, e.g. <project>_project_summary.md, or glob patterns
+    :param str report_type: Type of the reports
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(
+                    os.path.join(root, fname)
+                    for fname in sorted(files)
+                    if fname.endswith(f"{report_type}.md")
+                )
+        elif glob.has_magic(path):
+            found.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            found.append(path)
+    return list(dict.fromkeys(os.path.realpath(path) for path in found))
+
+
+def get_template_version(report_type):
+    """Version of the templates the HTML reports of the report type are made with"""
+    return templates.template_version([f"{report_type}.html", "swedac.html"])
+
+
+def load_manifest(path):
+    """Read a manifest written by write_manifest, empty if there is none yet"""
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def write_manifest(path, manifest):
+    # Write to a temporary file first so that an interrupted run keeps the old manifest
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as fh:
+            json.dump(manifest, fh, indent=4)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def regenerate_file(report_type, markdown_path, template_version, previous=None):
+    """Write the HTML report of a markdown report next to it, unless the markdown
+    and the templates are the same as when it was last written. Run in the worker
+    processes, so errors are returned in the manifest entry instead of raised.
+
+    :param str template_version: Version of the templates, see get_template_version
+    :param dict previous: Manifest entry of the file from the last run, None to
+        regenerate the HTML report in any case
+    :returns: The manifest entry of the file
+    """
+    html_path = os.path.splitext(markdown_path)[0] + ".html"
+    entry = {"html": html_path, "template_version": template_version}
+    try:
+        with open(markdown_path, "r") as f:
+            markdown_text = f.read()
+        entry["markdown_sha1"] = hashlib.sha1(markdown_text.encode("utf-8")).hexdigest()
+        if (
+            previous
+            and previous.get("status") != "failed"
+            and previous.get("markdown_sha1") == entry["markdown_sha1"]
+            and previous.get("template_version") == template_version
+            and os.path.exists(html_path)
+        ):
+            return dict(entry, status="unchanged", updated=previous.get("updated"))
+        with timings.stage("markdown to HTML"):
+            html_out = converter.get_converter(report_type).convert(markdown_text)
+        with timings.stage("file writes"), open(html_path, "w") as f:
+            f.write(html_out)
+    except Exception as e:
+        return dict(entry, status="failed", error=repr(e))
+    return dict(entry, status="regenerated", updated=datetime.now().isoformat())
+
+
+def update_manifest(manifest, report_type, template_version, entries):
+    """Add the entries of the files regenerated in a run to a manifest, keeping those
+    of the files that were not part of the run"""
+    statuses = [entry["status"] for entry in entries.values()]
+    manifest.update(
+        {
+            "ngi_reports_version": __version__,
+            "report_type": report_type,
+            "template_version": template_version,
+            "last_run": {
+                "date": datetime.now().isoformat(),
+                "regenerated": statuses.count("regenerated"),
+                "unchanged": statuses.count("unchanged"),
+                "failed": statuses.count("failed"),
+            },
+        }
+    )
+    manifest.setdefault("files", {}).update(entries)
+    return manifest
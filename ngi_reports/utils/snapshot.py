@@ -0,0 +1,94 @@
+"""Record the StatusDB data read while populating a project into a snapshot bundle,
+and replay it later in place of the StatusDB client"""
+
+import gzip
+import json
+import threading
+from datetime import datetime
+
+from ngi_reports.utils import backends
+from ngi_reports.utils.backends import view_name
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class RecordingClient(object):
+    """Wraps a Cloudant client and keeps a copy of every view row and document it
+    returns, so that they can be written to a snapshot bundle.
+
+    :param client: The CloudantV1 client to pass the requests on to
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.views = {}
+        self.docs = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.endswith("_as_stream"):
+            # Streamed responses are not recorded, have the connections use the plain requests
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def _add_doc(self, db, doc):
+        if doc and doc.get("_id"):
+            self.docs.setdefault(db, {})[doc["_id"]] = doc
+
+    def post_view(self, db, ddoc, view, **kwargs):
+        response = self.client.post_view(db=db, ddoc=ddoc, view=view, **kwargs)
+        with self._lock:
+            rows = self.views.setdefault(view_name(db, ddoc, view), {})
+            for row in response.get_result()["rows"]:
+                rows[(json.dumps(row["key"]), row["id"])] = {
+                    "key": row["key"],
+                    "id": row["id"],
+                    "value": row.get("value"),
+                }
+                self._add_doc(db, row.get("doc"))
+        return response
+
+    def post_all_docs(self, db, **kwargs):
+        response = self.client.post_all_docs(db=db, **kwargs)
+        with self._lock:
+            for row in response.get_result()["rows"]:
+                self._add_doc(db, row.get("doc"))
+        return response
+
+    def get_document(self, db, doc_id, **kwargs):
+        response = self.client.get_document(db=db, doc_id=doc_id, **kwargs)
+        with self._lock:
+            self._add_doc(db, response.get_result())
+        return response
+
+    def write(self, path, project=None):
+        """Write everything recorded so far to a gzipped JSON bundle"""
+        with self._lock:
+            bundle = {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "created": datetime.now().isoformat(),
+                "project": project,
+                "views": {
+                    name: list(rows.values()) for name, rows in self.views.items()
+                },
+                "docs": self.docs,
+            }
+            with gzip.open(path, "wt", encoding="utf-8") as fh:
+                json.dump(bundle, fh)
+        return path
+
+
+class SnapshotClient(backends.FileBackend):
+    """Serves the view rows and documents of a snapshot bundle with the same
+    methods and results as the parts of the Cloudant client used by ngi_reports.
+
+    :param dict bundle: The contents of a snapshot bundle
+    :param float latency: Seconds to wait before answering every request
+    """
+
+    def __init__(self, bundle, latency=0):
+        if bundle.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot format version {bundle.get('format_version')}"
+            )
+        super(SnapshotClient, self).__init__(bundle, latency=latency)
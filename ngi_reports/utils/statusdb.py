@@ -1,59 +1,363 @@
 #!/usr/bin/env python
 
+import asyncio
 import os
+import threading
+import ijson
 import yaml
 from datetime import datetime
 from ibmcloudant import CouchDbSessionAuthenticator, cloudant_v1
 
+from ngi_reports.utils import backends, cache, errors, flowcell_index, timings
+
+# Number of pooled HTTP connections kept alive per StatusDB server, can be
+# overridden with 'pool_size' in the statusdb.yaml config
+DEFAULT_POOL_SIZE = 10
+
+# Process-wide clients shared by all connection classes, keyed on server and user
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+# Size of the chunks streamed responses are read in
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ResponseReader(object):
+    """File-like reader of a streamed HTTP response, counting the bytes received
+
+    :param response: streamed HTTP response, as returned by the '*_as_stream' client methods
+    """
+
+    def __init__(self, response):
+        self.chunks = response.iter_content(STREAM_CHUNK_SIZE)
+
+    def read(self, size=-1):
+        if not size:
+            # ijson reads nothing first to tell bytes from text
+            return b""
+        chunk = next(self.chunks, b"")
+        timings.TIMINGS.add_bytes(len(chunk))
+        return chunk
+
+
+# ijson events starting an object or an array
+CONTAINER_EVENTS = ("start_map", "start_array")
+
+
+def skip_value(events, event):
+    """Skip the rest of the JSON value starting with the given ijson event"""
+    if event not in CONTAINER_EVENTS:
+        return
+    depth = 1
+    for event, value in events:
+        if event in CONTAINER_EVENTS:
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if not depth:
+                return
+
+
+def build_whole_value(events, event, value):
+    """Build the whole JSON value starting with the given ijson event from the events
+    that follow it"""
+    if event == "start_map":
+        obj = {}
+        for event, key in events:
+            if event == "end_map":
+                return obj
+            event, value = next(events)
+            if event in CONTAINER_EVENTS:
+                value = build_whole_value(events, event, value)
+            obj[key] = value
+    elif event == "start_array":
+        items = []
+        for event, value in events:
+            if event == "end_array":
+                return items
+            if event in CONTAINER_EVENTS:
+                value = build_whole_value(events, event, value)
+            items.append(value)
+    return value
+
+
+def build_value(events, event, value, fields=True):
+    """Build the JSON value starting with the given ijson event from the events that
+    follow it, keeping only the parts selected by fields:
+
+    - True keeps the whole value
+    - a dictionary keeps the listed keys of an object, each selected by its own fields
+    - a function keeps the items of an array it returns True for
+
+    A dictionary applies to every item of an array, fields have no effect on other values.
+    """
+    if fields is True:
+        return build_whole_value(events, event, value)
+    if event == "start_map":
+        obj = {}
+        for event, key in events:
+            if event == "end_map":
+                return obj
+            event, value = next(events)
+            if callable(fields):
+                obj[key] = build_whole_value(events, event, value)
+            elif key in fields:
+                obj[key] = build_value(events, event, value, fields[key])
+            else:
+                skip_value(events, event)
+    elif event == "start_array":
+        items = []
+        for event, value in events:
+            if event == "end_array":
+                return items
+            if callable(fields):
+                item = build_whole_value(events, event, value)
+                if fields(item):
+                    items.append(item)
+            else:
+                items.append(build_value(events, event, value, fields))
+    return value
+
+
+def iter_stream_rows(response, fields=None):
+    """Parse the rows of a streamed view or '_all_docs' response incrementally. Neither
+    the response nor a whole document is held in memory: every row is built while it
+    is read and, with fields, only the selected parts of its document are built.
+
+    :param response: streamed HTTP response, as returned by the '*_as_stream' client methods
+    :param fields: Parts of the documents to keep, see build_value. All by default
+    """
+    row_fields = {
+        "id": True,
+        "key": True,
+        "value": True,
+        "error": True,
+        "doc": True if fields is None else fields,
+    }
+    events = ijson.basic_parse(ResponseReader(response), use_float=True)
+    try:
+        next(events)
+        for event, key in events:
+            if event == "end_map":
+                break
+            event, value = next(events)
+            if key != "rows" or event != "start_array":
+                # Summary fields such as total_rows
+                skip_value(events, event)
+                continue
+            for event, value in events:
+                if event == "end_array":
+                    break
+                yield build_value(events, event, value, row_fields)
+    finally:
+        response.close()
+
+
+@timings.timed("config load")
+def load_statusdb_config(config=None):
+    """Load the statusdb section of the config, by default from '~/.ngi_config/statusdb.yaml'
+    or the file given in the ENV variable 'STATUS_DB_CONFIG'. Falls back on the given
+    config dictionary if no config file could be read.
+
+    :param dict config: a dictionary with essential info to make a connection
+    """
+    default_config = os.path.join(
+        os.environ.get("HOME"), ".ngi_config", "statusdb.yaml"
+    )
+    # if there is no first default config, try to get it from environ
+    if not os.path.exists(default_config):
+        default_config = os.path.join(os.environ.get("STATUS_DB_CONFIG"))
+    try:
+        with open(default_config) as f:
+            conf = yaml.safe_load(f)
+            config = conf["statusdb"]
+    except IOError:
+        if not config:
+            raise errors.ConfigError(
+                "Could not find any config info in '~/.ngi_config/statusdb.yaml' or ENV variable 'STATUS_DB_CONFIG'"
+            )
+    return config
+
+
+def get_shared_client(user, pwrd, url, pool_size=DEFAULT_POOL_SIZE):
+    """Get the Cloudant client shared by every connection to the given server.
+    The client is created, authenticated and probed only once per process,
+    subsequent calls reuse its session and pool of keep-alive connections.
+
+    :param str user: StatusDB username
+    :param str pwrd: StatusDB password
+    :param str url: StatusDB url without protocol
+    :param int pool_size: Max number of pooled connections kept alive to the server
+    """
+    with _shared_clients_lock:
+        client = _shared_clients.get((url, user))
+        if client:
+            return client
+
+        authenticator = CouchDbSessionAuthenticator(user, pwrd)
+        client = cloudant_v1.CloudantV1(authenticator=authenticator)
+        client.set_service_url(f"https://{url}")
+        # Keep a larger pool alive. The adapters the SDK mounted are resized in place,
+        # so that they keep their SSL and retry settings and the prefixes they serve
+        http_client = client.get_http_client()
+        for adapter in set(http_client.adapters.values()):
+            adapter.init_poolmanager(pool_size, pool_size, block=adapter._pool_block)
+        # Count the requests made and the bytes received for --timings
+        http_client.hooks["response"].append(timings.TIMINGS.count_response)
+
+        # Test connection
+        try:
+            client.get_server_information().get_result()
+        except Exception as e:
+            raise errors.StatusDBError(
+                f"Connection failed for URL https://{user}:********@{url}. Error: {e}"
+            )
+        _shared_clients[(url, user)] = client
+        return client
+
+
+def get_backend(config):
+    """Get the backend serving the requests to StatusDB: the shared Cloudant client,
+    or a FileBackend if the config has 'backend: file' and the path of a 'fixture'
+
+    :param dict config: the statusdb section of the config
+    """
+    if config.get("backend", "cloudant") == "file":
+        return backends.get_file_backend(
+            config["fixture"], latency=float(config.get("latency", 0))
+        )
+    return get_shared_client(
+        config.get("username"),
+        config.get("password"),
+        config.get("url"),
+        pool_size=int(config.get("pool_size", DEFAULT_POOL_SIZE)),
+    )
+
 
 class statusdb_connection(object):
     """Main class to make connection to the statusdb, by default looks for config
-    file in home, if not try with provided config
+    file in home, if not try with provided config. All instances connecting to the
+    same server share one pooled client, see get_shared_client
 
     :param dict config: a dictionary with essential info to make a connection
     :param logger log: a logger instance to log information when necessary
+    :param bool use_cache: serve unchanged documents from the local document cache,
+        by default only if 'cache' is set in the config
+    :param client: backend to use instead of the one in the config, e.g. a SnapshotClient.
+        No config is read if it is given
     """
 
-    def __init__(self, config=None, log=None):
+    def __init__(self, config=None, log=None, use_cache=None, client=None):
         self.log = log
-        default_config = os.path.join(
-            os.environ.get("HOME"), ".ngi_config", "statusdb.yaml"
-        )
-        # if there is no first default config, try to get it from environ
-        if not os.path.exists(default_config):
-            default_config = os.path.join(os.environ.get("STATUS_DB_CONFIG"))
-        try:
-            with open(default_config) as f:
-                conf = yaml.safe_load(f)
-                config = conf["statusdb"]
-        except IOError:
-            if not config:
-                raise SystemExit(
-                    "Could not find any config info in '~/.ngi_config/statusdb.yaml' or ENV variable 'STATUS_DB_CONFIG'"
-                )
+        if client is None:
+            config = load_statusdb_config(config)
+        else:
+            config = config or {}
 
         self.user = config.get("username")
         self.pwrd = config.get("password")
         self.url = config.get("url")
         self.display_url_string = f"https://{self.user}:********@{self.url}"
 
-        # Initialize IBM Cloudant client
-        authenticator = CouchDbSessionAuthenticator(self.user, self.pwrd)
-        self.connection = cloudant_v1.CloudantV1(authenticator=authenticator)
-        self.connection.set_service_url(f"https://{self.url}")
+        if client is None:
+            # Get the IBM Cloudant client shared with the other connections or the configured backend
+            client = get_backend(config)
+        self.connection = client
+        self.index_path = config.get("flowcell_index")
 
-        # Test connection
-        try:
-            self.connection.get_server_information().get_result()
-        except Exception as e:
-            raise SystemExit(
-                f"Connection failed for URL {self.display_url_string}. Error: {e}"
+        if use_cache is None:
+            use_cache = config.get("cache", False)
+        self.cache = None
+        if use_cache:
+            self.cache = cache.get_document_cache(
+                config.get("cache_dir"),
+                float(config.get("cache_size_mb", cache.DEFAULT_CACHE_SIZE_MB)),
             )
 
+    def iter_rows(self, request, fields=None, **kwargs):
+        """Iterate over the rows of a 'post_view' or 'post_all_docs' request to the
+        database of this connection. Requests including documents are streamed and
+        parsed incrementally when the client supports it.
+
+        :param str request: name of the client method, 'post_view' or 'post_all_docs'
+        :param fields: Parts of the streamed documents to keep, see build_value
+        """
+        stream_request = getattr(self.connection, f"{request}_as_stream", None)
+        if kwargs.get("include_docs") and stream_request:
+            return iter_stream_rows(
+                stream_request(db=self.dbname, **kwargs).get_result(), fields
+            )
+        return iter(
+            getattr(self.connection, request)(db=self.dbname, **kwargs).get_result()[
+                "rows"
+            ]
+        )
+
+    def get_docs(self, doc_ids, extract=None):
+        """Get the documents with the given IDs from the database of this connection.
+        Only the current revisions are looked up first, documents that did not change
+        since they were cached are then served from the local cache.
+
+        :param list doc_ids: IDs of the documents to get
+        :param extract: function applied to every document as soon as it is read, the
+            result is returned instead of the full document
+        """
+        return dict(self.iter_docs(doc_ids, extract))
+
+    def get_revs(self, doc_ids):
+        """Get the current revisions of the documents with the given IDs without
+        downloading the documents, as (ID, revision) pairs. Deleted and missing
+        documents are left out."""
+        return [
+            (row["id"], row["value"]["rev"])
+            for row in self.connection.post_all_docs(
+                db=self.dbname, keys=list(doc_ids)
+            ).get_result()["rows"]
+            if row.get("value") and not row["value"].get("deleted")
+        ]
+
+    def iter_docs(self, doc_ids, extract=None, fields=None):
+        """Iterate over the (ID, document) pairs of the documents with the given IDs,
+        each read from the cache or the response only when it is reached. See get_docs.
+
+        :param fields: Parts of the documents extract reads, the rest is not kept while
+            they are parsed unless the documents are cached, see build_value
+        """
+        doc_ids = list(doc_ids)
+        if not self.cache:
+            for row in self.iter_rows(
+                "post_all_docs", fields, keys=doc_ids, include_docs=True
+            ):
+                if row.get("doc"):
+                    yield row["id"], extract(row["doc"]) if extract else row["doc"]
+            return
+
+        missing = []
+        for doc_id, rev in self.get_revs(doc_ids):
+            doc = self.cache.get(self.dbname, doc_id, rev)
+            if doc is None:
+                missing.append(doc_id)
+            else:
+                yield doc_id, extract(doc) if extract else doc
+        if missing:
+            for row in self.iter_rows("post_all_docs", keys=missing, include_docs=True):
+                if not row.get("doc"):
+                    continue
+                try:
+                    # The full document is cached, whatever part of it is extracted
+                    self.cache.put(self.dbname, row["doc"])
+                except OSError as e:
+                    if self.log:
+                        self.log.warning(f"Could not cache document {row['id']}: {e}")
+                yield row["id"], extract(row["doc"]) if extract else row["doc"]
+
 
 class ProjectSummaryConnection(statusdb_connection):
-    def __init__(self, dbname="projects"):
-        super(ProjectSummaryConnection, self).__init__()
+    def __init__(self, dbname="projects", log=None, use_cache=None, client=None):
+        super(ProjectSummaryConnection, self).__init__(
+            log=log, use_cache=use_cache, client=client
+        )
         self.dbname = dbname
 
     def get_entry(self, name, use_id_view=False):
@@ -62,14 +366,18 @@ class ProjectSummaryConnection(statusdb_connection):
         :param name: unique name identifier (primary key, not the uuid)
         """
         try:
-            doc = self.connection.post_view(
+            row = self.connection.post_view(
                 db=self.dbname,
                 ddoc="project",
                 view="project_name" if not use_id_view else "project_id",
                 key=name,
                 reduce=False,
-                include_docs=True,
-            ).get_result()["rows"][0]["doc"]
+                include_docs=not self.cache,
+            ).get_result()["rows"][0]
+            if self.cache:
+                doc = self.get_docs([row["id"]]).get(row["id"])
+            else:
+                doc = row["doc"]
             if not doc:
                 if self.log:
                     self.log.warn(f"No entry '{name}' in {self.dbname}")
@@ -82,19 +390,135 @@ class ProjectSummaryConnection(statusdb_connection):
 
 
 class GenericRunConnection(statusdb_connection):
-    def __init__(self, dbname=None):
-        super(GenericRunConnection, self).__init__()
+    """Base class for the run databases, which are indexed by the 'names/project_ids_list'
+    view with run names as keys and the IDs of the projects on the run as values.
+
+    :param str dbname: Name of the run database
+    :param str fetch_mode: 'bounded' to only query the runs started after the project
+        was opened, 'full' to download the whole view and filter it locally, 'index' to
+        look the runs up in the local flowcell index
+    :param logger log: a logger instance to log information when necessary
+    """
+
+    # Format of the date prefix of the run names in the database
+    run_date_format = "%y%m%d"
+
+    def __init__(
+        self, dbname=None, fetch_mode="bounded", log=None, use_cache=None, client=None
+    ):
+        super(GenericRunConnection, self).__init__(
+            log=log, use_cache=use_cache, client=client
+        )
+        self.dbname = dbname
+        self.fetch_mode = fetch_mode
+        self._proj_list = None
+        # Start date and runs of the widest date bounded query made so far
+        self._runs_since = None
+
+    @property
+    def proj_list(self):
+        """All runs in the project_ids_list view, downloaded on first use"""
+        if self._proj_list is None:
+            self._proj_list = self.get_project_ids_list()
+        return self._proj_list
+
+    def get_project_ids_rows(self, start_date=None, keys=None):
+        """Get the rows of the project_ids_list view, with the run names as keys and the
+        IDs of the projects sequenced on the runs as values
+
+        :param datetime start_date: Only get the runs started on or after this date, all runs if not given
+        :param list keys: Only get the runs with these names
+        """
+        query = {}
+        if keys is not None:
+            query = {"keys": list(keys)}
+        elif start_date:
+            # Run names start with the run date, so the keys sort by date
+            query = {
+                "start_key": start_date.strftime(self.run_date_format),
+                "end_key": "\ufff0",
+            }
+        return [
+            row
+            for row in self.connection.post_view(
+                db=self.dbname,
+                ddoc="names",
+                view="project_ids_list",
+                reduce=False,
+                **query,
+            ).get_result()["rows"]
+            if row["key"]
+        ]
+
+    def get_project_ids_list(self, start_date=None):
+        """Get the run names and the project IDs sequenced on them from the project_ids_list view
+
+        :param datetime start_date: Only get the runs started on or after this date, all runs if not given
+        """
+        return {
+            row["key"]: row["value"]
+            for row in self.get_project_ids_rows(start_date=start_date)
+        }
+
+    def get_update_seq(self):
+        """Get the current update sequence of the database"""
+        return (
+            self.connection.get_database_information(db=self.dbname)
+            .get_result()
+            .get("update_seq")
+        )
+
+    def get_changes(self, since):
+        """Get the documents indexed in the project_ids_list view that changed since the
+        given update sequence. Returns (document ID, deleted) for every changed document
+        and the update sequence the changes go up to.
+
+        :param str since: update sequence to get the changes after
+        """
+        result = self.connection.post_changes(
+            db=self.dbname,
+            since=since,
+            filter="_view",
+            view="names/project_ids_list",
+        ).get_result()
+        return [
+            (change["id"], change.get("deleted", False))
+            for change in result.get("results", [])
+        ], result.get("last_seq")
+
+    def get_runs_since(self, start_date):
+        """Get the runs started on or after the given date. The widest date bounded
+        query made with this connection is kept, so lookups for projects opened after
+        it are answered without querying the database again.
+
+        :param datetime start_date: Only get the runs started on or after this date
+        """
+        if self._runs_since is None or start_date < self._runs_since[0]:
+            self._runs_since = (
+                start_date,
+                self.get_project_ids_list(start_date=start_date),
+            )
+        start_key = start_date.strftime(self.run_date_format)
+        return {
+            run: projects
+            for run, projects in self._runs_since[1].items()
+            if run >= start_key
+        }
 
     def get_entry(self, name):
         try:
-            doc = self.connection.post_view(
+            row = self.connection.post_view(
                 db=self.dbname,
                 ddoc="names",
                 view="project_ids_list",
                 key=name,
                 reduce=False,
-                include_docs=True,
-            ).get_result()["rows"][0]["doc"]
+                include_docs=not self.cache,
+            ).get_result()["rows"][0]
+            if self.cache:
+                doc = self.get_docs([row["id"]]).get(row["id"])
+            else:
+                doc = row["doc"]
             if not doc:
                 if self.log:
                     self.log.warn(f"No entry '{name}' in {self.dbname}")
@@ -105,6 +529,95 @@ class GenericRunConnection(statusdb_connection):
                 self.log.error(f"Error retrieving document '{name}': {e}")
             return None
 
+    @timings.timed("flowcell fetch")
+    def get_entries(self, names, extract=None, fields=None):
+        """Retrieve the entries for all the given run names in one multi-key request.
+        Returns a dictionary with the run names as keys, names without entry are left out.
+        The documents are parsed one at a time, so with an extract function only the
+        extracted parts of the documents are held in memory.
+
+        :param list names: run names (keys of the project_ids_list view)
+        :param extract: function applied to every document as soon as it is read, the
+            result is returned instead of the full document
+        :param fields: Parts of the documents extract reads. Only these are built while
+            a streamed document is parsed, see build_value
+        """
+        return dict(self.iter_entries(names, extract, fields))
+
+    def iter_entries(self, names, extract=None, fields=None):
+        """Iterate over the (run name, document) pairs of the given run names, every
+        document read from the response or the cache only when it is reached, so that
+        only one of them is held in memory at a time. See get_entries.
+        """
+        found = set()
+        if not names:
+            return
+        try:
+            if self.cache:
+                rows = list(
+                    self.iter_rows(
+                        "post_view",
+                        ddoc="names",
+                        view="project_ids_list",
+                        keys=list(names),
+                        reduce=False,
+                    )
+                )
+                run_names = {}
+                for row in rows:
+                    run_names.setdefault(row["id"], []).append(row["key"])
+                for doc_id, doc in self.iter_docs(run_names, extract, fields):
+                    if not doc:
+                        continue
+                    for name in run_names[doc_id]:
+                        if name not in found:
+                            found.add(name)
+                            yield name, doc
+            else:
+                for row in self.iter_rows(
+                    "post_view",
+                    fields,
+                    ddoc="names",
+                    view="project_ids_list",
+                    keys=list(names),
+                    reduce=False,
+                    include_docs=True,
+                ):
+                    if row.get("doc") and row["key"] not in found:
+                        found.add(row["key"])
+                        yield row["key"], extract(row["doc"]) if extract else row["doc"]
+        except Exception as e:
+            if self.log:
+                self.log.error(f"Error retrieving documents from {self.dbname}: {e}")
+            return
+        for name in names:
+            if name not in found and self.log:
+                self.log.warn(f"No entry '{name}' in {self.dbname}")
+
+    def get_revisions(self, names):
+        """Get the current revisions of the documents of the given run names without
+        downloading the documents. Returns a dictionary with the run names as keys,
+        names without entry are left out.
+
+        :param list names: run names (keys of the project_ids_list view)
+        """
+        if not names:
+            return {}
+        run_names = {}
+        for row in self.iter_rows(
+            "post_view",
+            ddoc="names",
+            view="project_ids_list",
+            keys=list(names),
+            reduce=False,
+        ):
+            run_names.setdefault(row["id"], []).append(row["key"])
+        return {
+            name: rev
+            for doc_id, rev in self.get_revs(run_names)
+            for name in run_names[doc_id]
+        }
+
     def get_project_flowcell(
         self, project_id, open_date="2015-01-01", date_format="%Y-%m-%d"
     ):
@@ -119,15 +632,37 @@ class GenericRunConnection(statusdb_connection):
         except TypeError:
             open_date = datetime.strptime("2015-01-01", "%Y-%m-%d")
 
+        proj_list = None
+        if self.fetch_mode == "index":
+            try:
+                index = flowcell_index.get_flowcell_index(self.index_path)
+                index.refresh(self)
+                proj_list = {
+                    run: [project_id]
+                    for run in index.project_runs(self.dbname, project_id, open_date)
+                }
+            except Exception as e:
+                if self.log:
+                    self.log.warning(
+                        f"Lookup in the flowcell index of {self.dbname} failed, falling back to a date bounded query. Error: {e}"
+                    )
+
+        if proj_list is None and self.fetch_mode == "full":
+            proj_list = self.proj_list
+        elif proj_list is None:
+            try:
+                proj_list = self.get_runs_since(open_date)
+            except Exception as e:
+                if self.log:
+                    self.log.warning(
+                        f"Date bounded query of {self.dbname} failed, falling back to fetching all runs. Error: {e}"
+                    )
+                proj_list = self.proj_list
+
         project_flowcells = {}
-        time_format = (
-            "%Y%m%d"
-            if type(self) in (NanoporeRunConnection, ElementRunConnection)
-            else "%y%m%d"
-        )
         date_sorted_fcs = sorted(
-            list(self.proj_list.keys()),
-            key=lambda k: datetime.strptime(k.split("_")[0], time_format),
+            list(proj_list.keys()),
+            key=lambda k: datetime.strptime(k.split("_")[0], self.run_date_format),
             reverse=True,
         )
         for fc in date_sorted_fcs:
@@ -140,12 +675,9 @@ class GenericRunConnection(statusdb_connection):
             else:
                 # 220404_000000000-K797K
                 fc_date, fc_name = fc.split("_")
-            if datetime.strptime(fc_date, time_format) < open_date:
+            if datetime.strptime(fc_date, self.run_date_format) < open_date:
                 break
-            if (
-                project_id in self.proj_list[fc]
-                and fc_name not in project_flowcells.keys()
-            ):
+            if project_id in proj_list[fc] and fc_name not in project_flowcells.keys():
                 project_flowcells[fc_name] = {
                     "name": fc_name,
                     "run_name": fc,
@@ -156,39 +688,80 @@ class GenericRunConnection(statusdb_connection):
 
 
 class X_FlowcellRunMetricsConnection(GenericRunConnection):
-    def __init__(self, dbname="x_flowcells"):
-        super(X_FlowcellRunMetricsConnection, self).__init__()
-        self.dbname = dbname
-        self.proj_list = {
-            row["key"]: row["value"]
-            for row in self.connection.post_view(
-                db=self.dbname, ddoc="names", view="project_ids_list", reduce=False
-            ).get_result()["rows"]
-            if row["key"]
-        }
+    run_date_format = "%y%m%d"
+
+    def __init__(
+        self,
+        dbname="x_flowcells",
+        fetch_mode="bounded",
+        log=None,
+        use_cache=None,
+        client=None,
+    ):
+        super(X_FlowcellRunMetricsConnection, self).__init__(
+            dbname,
+            fetch_mode=fetch_mode,
+            log=log,
+            use_cache=use_cache,
+            client=client,
+        )
 
 
 class ElementRunConnection(GenericRunConnection):
-    def __init__(self, dbname="element_runs"):
-        super(ElementRunConnection, self).__init__()
-        self.dbname = dbname
-        self.proj_list = {
-            k["key"]: k["value"]
-            for k in self.connection.post_view(
-                db=self.dbname, ddoc="names", view="project_ids_list", reduce=False
-            ).get_result()["rows"]
-            if k["key"]
-        }
+    run_date_format = "%Y%m%d"
+
+    def __init__(
+        self,
+        dbname="element_runs",
+        fetch_mode="bounded",
+        log=None,
+        use_cache=None,
+        client=None,
+    ):
+        super(ElementRunConnection, self).__init__(
+            dbname,
+            fetch_mode=fetch_mode,
+            log=log,
+            use_cache=use_cache,
+            client=client,
+        )
 
 
 class NanoporeRunConnection(GenericRunConnection):
-    def __init__(self, dbname="nanopore_runs"):
-        super(NanoporeRunConnection, self).__init__()
-        self.dbname = dbname
-        self.proj_list = {
-            row["key"]: row["value"]
-            for row in self.connection.post_view(
-                db=self.dbname, ddoc="names", view="project_ids_list", reduce=False
-            ).get_result()["rows"]
-            if row["key"]
-        }
+    run_date_format = "%Y%m%d"
+
+    def __init__(
+        self,
+        dbname="nanopore_runs",
+        fetch_mode="bounded",
+        log=None,
+        use_cache=None,
+        client=None,
+    ):
+        super(NanoporeRunConnection, self).__init__(
+            dbname,
+            fetch_mode=fetch_mode,
+            log=log,
+            use_cache=use_cache,
+            client=client,
+        )
+
+
+class AsyncConnection(object):
+    """Awaitable version of a StatusDB connection. Every method call of the wrapped
+    connection runs in a worker thread, so that requests can overlap with each
+    other and with processing in the event loop.
+
+    :param statusdb_connection connection: The connection to wrap
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name):
+        method = getattr(self.connection, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
@@ -0,0 +1,152 @@
+"""Jinja2 environment of the report templates, shared within the process. The
+compiled templates are kept in a bytecode cache on disk, so that they are only
+compiled again when they change rather than on every run."""
+
+import hashlib
+import os
+import re
+import threading
+
+import jinja2
+import markdown
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+
+from ngi_reports import __version__
+
+REPORTS_DIR = os.path.realpath(
+    os.path.join(
+        os.path.dirname(__file__), os.pardir, os.pardir, "data", "report_templates"
+    )
+)
+
+# Default location of the compiled templates, next to the StatusDB document cache
+DEFAULT_TEMPLATE_CACHE_DIR = os.path.join(
+    os.environ.get("HOME"), ".ngi_reports", "template_cache"
+)
+
+# Text that Markdown may convert in a table cell: backslash escapes, code spans,
+# emphasis, raw HTML, links and entities. Underscores within words are left as
+# they are, so that sample names do not match.
+INLINE_MARKDOWN_RE = re.compile(r"[\\`*<]|\]\s?[(\[]|&#?\w+;|(?<!\w)_|_(?!\w)")
+
+# The cell of a one cell Markdown table converted to HTML
+CELL_RE = re.compile(r"<td>(.*)</td>", re.DOTALL)
+
+_environments = {}
+_environments_lock = threading.Lock()
+
+_cell_markdown = None
+_cell_markdown_lock = threading.Lock()
+
+
+def markdown_cell(text):
+    """Convert a table cell to HTML with the Markdown tables extension"""
+    global _cell_markdown
+    with _cell_markdown_lock:
+        if _cell_markdown is None:
+            _cell_markdown = markdown.Markdown(extensions=["tables"])
+        _cell_markdown.reset()
+        html = _cell_markdown.convert(f"| |\n|-|\n| {text} |")
+    return CELL_RE.search(html).group(1)
+
+
+def escape_html(text):
+    """Escape text for HTML as Markdown does, which leaves the quotes as they are"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def html_text(value):
+    """Convert a table cell to HTML as the Markdown tables extension does. Plain text
+    is only escaped, only cells with inline Markdown or entities are converted with
+    Markdown itself."""
+    text = str(value).strip()
+    if INLINE_MARKDOWN_RE.search(text):
+        return markdown_cell(text)
+    return escape_html(text)
+
+
+def html_code(value):
+    """Convert a table cell written in a code span to HTML as Markdown does. The text
+    is escaped as it is, unless backticks in it or an empty text change the span."""
+    text = str(value).strip()
+    if not text or "`" in text:
+        return markdown_cell(f"`{text}`")
+    return f"<code>{escape_html(text)}</code>"
+
+
+class HTMLTablesPreprocessor(Preprocessor):
+    """Stash the tables rendered as HTML by the templates with html_tables as raw
+    HTML blocks, so that they are put in the HTML report as they are instead of
+    going through the HTML parser of Markdown"""
+
+    TABLE_RE = re.compile(r"^<table>\n.*?^</table>$", re.MULTILINE | re.DOTALL)
+
+    def run(self, lines):
+        text = self.TABLE_RE.sub(
+            lambda match: self.md.htmlStash.store(match.group(0)), "\n".join(lines)
+        )
+        return text.split("\n")
+
+
+class HTMLTablesExtension(Extension):
+    """Markdown extension for converting the reports rendered with html_tables"""
+
+    def extendMarkdown(self, md):
+        # After the whitespace is normalized (30) and before the raw HTML is parsed
+        # (20). 27 is taken by the meta extension, a priority of its own keeps the
+        # order from depending on which of the two is registered first
+        md.preprocessors.register(HTMLTablesPreprocessor(md), "html_tables", 25)
+
+
+def get_bytecode_cache(cache_dir):
+    """Get a bytecode cache in the given directory, or None if it cannot be created"""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return None
+    return jinja2.FileSystemBytecodeCache(cache_dir)
+
+
+def get_environment(reports_dir=None, cache_dir=None):
+    """Get the Jinja2 environment loading the templates in the given directory, shared
+    within the process so that every template is loaded once however many reports
+    are rendered with it
+
+    :param str reports_dir: Directory of the templates, by default those of the package
+    :param str cache_dir: Directory to keep the compiled templates in, or False to
+        not keep them on disk
+    """
+    reports_dir = os.path.realpath(reports_dir or REPORTS_DIR)
+    if cache_dir is None:
+        cache_dir = DEFAULT_TEMPLATE_CACHE_DIR
+    with _environments_lock:
+        if (reports_dir, cache_dir) not in _environments:
+            env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(reports_dir),
+                bytecode_cache=(
+                    get_bytecode_cache(os.path.expanduser(cache_dir))
+                    if cache_dir
+                    else None
+                ),
+            )
+            env.filters["html_text"] = html_text
+            env.filters["html_code"] = html_code
+            _environments[(reports_dir, cache_dir)] = env
+        return _environments[(reports_dir, cache_dir)]
+
+
+def template_version(names, reports_dir=None):
+    """Version of the given templates, a digest of their contents and of the
+    ngi_reports version, which changes whenever the output made with them may change
+
+    :param list names: Paths of the templates relative to reports_dir
+    :param str reports_dir: Directory of the templates, by default those of the package
+    """
+    reports_dir = reports_dir or REPORTS_DIR
+    digest = hashlib.sha1(__version__.encode("utf-8"))
+    for name in names:
+        digest.update(name.encode("utf-8"))
+        with open(os.path.join(reports_dir, name), "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()
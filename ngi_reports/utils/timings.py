@@ -0,0 +1,322 @@
+"""Wall time of the stages of a report run and the number and size of the StatusDB
+requests made, recorded when enabled with --timings or --timings_file. With --memory
+the memory allocated in every stage is traced with tracemalloc as well."""
+
+import functools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MB = 1024**2
+
+# Number of largest objects and allocation sites listed in the memory report
+TOP_RETAINERS = 10
+
+
+def deep_size(obj, seen=None):
+    """Size in bytes of an object and everything reachable from it through containers
+    and instance attributes, including slots. Objects are only counted once.
+
+    :param obj: The object to measure
+    :param set seen: IDs of the objects already counted, shared between calls to
+        count every object only once
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, type(sys), type(deep_size))):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get("__slots__", ())
+                for slot in [slots] if isinstance(slots, str) else slots:
+                    if slot != "__dict__" and hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return size
+
+
+class Timings(object):
+    """Accumulates the wall time of named stages over all the times they are run.
+    Stages may be nested and may run in several threads at once, so the times of
+    different stages can overlap and do not add up to the total wall time.
+    Nothing is recorded until enable is called.
+
+    When memory is traced the peak and the retained (still allocated at the end)
+    memory of every stage are recorded, both relative to the memory in use when the
+    stage started. The peaks are exact for stages running one at a time, with
+    --workers or --async_fetch stages running in parallel are attributed each
+    other's allocations.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.start_time = None
+        self.stages = OrderedDict()
+        self.requests = 0
+        self.bytes_received = 0
+        self.peak_memory = 0
+        self.retainers = {}
+        self.allocation_sites = []
+        self._memory_frames = []
+        self._lock = threading.Lock()
+
+    def enable(self, trace_memory=False):
+        self.enabled = True
+        self.start_time = time.perf_counter()
+        if trace_memory:
+            self.trace_memory = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, detail=None):
+        """Time the enclosed block as a run of the given stage
+
+        :param str name: Name of the stage
+        :param str detail: What the stage was run on, e.g. a flowcell. The time of
+            every detail is kept in the JSON dump
+        """
+        if not self.enabled:
+            yield
+            return
+        if self.trace_memory:
+            frame = self._start_memory_frame()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.trace_memory:
+                peak, retained = self._end_memory_frame(frame)
+            with self._lock:
+                stage = self.stages.setdefault(
+                    name,
+                    {
+                        "calls": 0,
+                        "total_s": 0.0,
+                        "max_s": 0.0,
+                        "details": {},
+                        "peak_bytes": 0,
+                        "retained_bytes": 0,
+                        "memory_details": {},
+                    },
+                )
+                stage["calls"] += 1
+                stage["total_s"] += elapsed
+                stage["max_s"] = max(stage["max_s"], elapsed)
+                if detail is not None:
+                    stage["details"][detail] = (
+                        stage["details"].get(detail, 0.0) + elapsed
+                    )
+                if self.trace_memory:
+                    stage["peak_bytes"] = max(stage["peak_bytes"], peak)
+                    stage["retained_bytes"] += retained
+                    if detail is not None:
+                        stage["memory_details"][detail] = {
+                            "peak_mb": round(peak / MB, 2),
+                            "retained_mb": round(retained / MB, 2),
+                        }
+
+    def _start_memory_frame(self):
+        """Start tracking the peak memory of a stage. tracemalloc only keeps a single
+        peak, so it is reset for every stage and the peak seen so far is handed on to
+        the enclosing stage."""
+        with self._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak_memory = max(self.peak_memory, peak)
+            if self._memory_frames:
+                self._memory_frames[-1]["peak"] = max(
+                    self._memory_frames[-1]["peak"], peak
+                )
+            frame = {"start": current, "peak": 0}
+            self._memory_frames.append(frame)
+            tracemalloc.reset_peak()
+        return frame
+
+    def _end_memory_frame(self, frame):
+        """Stop tracking the memory of a stage, returns its peak and retained bytes"""
+        with self._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame["peak"])
+            self.peak_memory = max(self.peak_memory, peak)
+            self._memory_frames.remove(frame)
+            if self._memory_frames:
+                self._memory_frames[-1]["peak"] = max(
+                    self._memory_frames[-1]["peak"], peak
+                )
+        return peak - frame["start"], current - frame["start"]
+
+    def get_peak_memory(self):
+        """Peak traced memory of the run so far in bytes"""
+        return max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+
+    def record_retainers(self, objects, prefix=""):
+        """Record the size of the largest of the given objects and the allocation
+        sites holding the most memory right now
+
+        :param dict objects: Objects by name, e.g. the attributes of a populated project
+        :param str prefix: Added to the names, e.g. the project in batch mode
+        """
+        if not self.trace_memory:
+            return
+        sizes = {f"{prefix}{name}": deep_size(obj) for name, obj in objects.items()}
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        )
+        with self._lock:
+            self.retainers.update(sizes)
+            self.retainers = dict(
+                sorted(self.retainers.items(), key=lambda item: -item[1])[
+                    :TOP_RETAINERS
+                ]
+            )
+            self.allocation_sites = [
+                (str(stat.traceback), stat.size, stat.count)
+                for stat in snapshot.statistics("lineno")[:TOP_RETAINERS]
+            ]
+
+    def add_request(self, nbytes=0):
+        if self.enabled:
+            with self._lock:
+                self.requests += 1
+                self.bytes_received += nbytes
+
+    def add_bytes(self, nbytes):
+        if self.enabled:
+            with self._lock:
+                self.bytes_received += nbytes
+
+    def count_response(self, response, stream=False, **kwargs):
+        """Response hook for the requests session of the Cloudant client. The body of
+        streamed responses is counted by statusdb.iter_stream_rows as it is read."""
+        if self.enabled:
+            self.add_request(0 if stream else len(response.content))
+
+    def as_dict(self):
+        peak_memory = self.get_peak_memory() if self.trace_memory else None
+        with self._lock:
+            timings = {
+                "total_s": round(time.perf_counter() - self.start_time, 4),
+                "stages": {
+                    name: {
+                        "calls": stage["calls"],
+                        "total_s": round(stage["total_s"], 4),
+                        "max_s": round(stage["max_s"], 4),
+                        "details": {
+                            detail: round(elapsed, 4)
+                            for detail, elapsed in stage["details"].items()
+                        },
+                    }
+                    for name, stage in self.stages.items()
+                },
+                "statusdb_requests": self.requests,
+                "statusdb_bytes_received": self.bytes_received,
+            }
+            if self.trace_memory:
+                for name, stage in self.stages.items():
+                    timings["stages"][name].update(
+                        {
+                            "peak_mb": round(stage["peak_bytes"] / MB, 2),
+                            "retained_mb": round(stage["retained_bytes"] / MB, 2),
+                            "memory_details": stage["memory_details"],
+                        }
+                    )
+                timings["memory"] = {
+                    "peak_mb": round(peak_memory / MB, 2),
+                    "largest_objects_mb": {
+                        name: round(size / MB, 2)
+                        for name, size in self.retainers.items()
+                    },
+                    "largest_allocation_sites": [
+                        {"site": site, "mb": round(size / MB, 2), "blocks": count}
+                        for site, size, count in self.allocation_sites
+                    ],
+                }
+            return timings
+
+    def summary(self):
+        """Table of the time spent in every stage and the StatusDB requests made"""
+        timings = self.as_dict()
+        header = f"{'Stage':<24}{'Calls':>8}{'Total (s)':>12}{'Max (s)':>12}"
+        if self.trace_memory:
+            header += f"{'Peak (MB)':>12}{'Retained (MB)':>16}"
+        lines = [header]
+        for name, stage in timings["stages"].items():
+            line = f"{name:<24}{stage['calls']:>8}{stage['total_s']:>12.3f}{stage['max_s']:>12.3f}"
+            if self.trace_memory:
+                line += f"{stage['peak_mb']:>12.2f}{stage['retained_mb']:>16.2f}"
+            lines.append(line)
+        lines.append(f"{'Total wall time':<24}{'':>8}{timings['total_s']:>12.3f}")
+        lines.append(
+            f"StatusDB requests: {timings['statusdb_requests']}, "
+            f"received: {timings['statusdb_bytes_received'] / MB:.2f} MB"
+        )
+        if self.trace_memory:
+            memory = timings["memory"]
+            lines.append(f"Peak traced memory: {memory['peak_mb']:.2f} MB")
+            if memory["largest_objects_mb"]:
+                lines.append("Largest objects (MB):")
+                for name, size in memory["largest_objects_mb"].items():
+                    lines.append(f"    {size:>10.2f}  {name}")
+            if memory["largest_allocation_sites"]:
+                lines.append("Largest allocation sites after populating (MB):")
+                for site in memory["largest_allocation_sites"]:
+                    lines.append(f"    {site['mb']:>10.2f}  {site['site']}")
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        with open(path, "w") as fh:
+            json.dump(self.as_dict(), fh, indent=4)
+        return path
+
+
+# Recorder shared by the whole process
+TIMINGS = Timings()
+stage = TIMINGS.stage
+
+
+def timed(name):
+    """Decorator timing every call of a function as a run of the given stage"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TIMINGS.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_iter(name, iterable):
+    """Time getting every item of an iterable as a run of the given stage, leaving
+    out the time spent on the items by the caller"""
+    iterator = iter(iterable)
+    while True:
+        with TIMINGS.stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
@@ -0,0 +1,42 @@
+"""Fixtures shared by the tests. Projects are populated from synthetic StatusDB data,
+see benchmarks/synthetic.py, served by a FileBackend instead of StatusDB."""
+
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+
+from ngi_reports.utils import backends
+from ngi_reports.utils.entities import Project
+
+ORGANISM_NAMES = {"GRCh38": "Homo sapiens"}
+
+
+@pytest.fixture
+def log():
+    return logging.getLogger("ngi_reports_test")
+
+
+@pytest.fixture
+def populate(log):
+    """Populate a project from a fixture with the given options of the ngi_reports
+    command, served with the given latency in seconds"""
+
+    def populate(fixture, project_id, latency=0, **kwargs):
+        proj = Project()
+        proj.populate(
+            log,
+            ORGANISM_NAMES,
+            **dict(
+                {"exclude_fc": []},
+                project=project_id,
+                statusdb_client=backends.FileBackend(fixture, latency=latency),
+                **kwargs,
+            ),
+        )
+        return proj
+
+    return populate
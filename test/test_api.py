@@ -0,0 +1,70 @@
+"""Reports generated with ngi_reports.api, called with only the documented arguments"""
+
+import configparser
+import os
+
+import pytest
+import synthetic
+
+from ngi_reports import api
+from ngi_reports.utils import backends, templates
+
+PROJECT = "P10000"
+
+
+@pytest.fixture
+def config():
+    config = configparser.ConfigParser()
+    config.read_dict(
+        {
+            "ngi_reports": {"support_email": "support@example.com"},
+            "organism_names": {"GRCh38": "Homo sapiens"},
+        }
+    )
+    return config
+
+
+@pytest.fixture(params=["illumina", "element", "ont"])
+def fixture(request):
+    fixture, project_id = synthetic.project_fixture(
+        platform=request.param,
+        samples=3,
+        flowcells=2,
+        lanes=2,
+        other_projects=1,
+        other_samples=2,
+        other_runs=2,
+        project_id=PROJECT,
+    )
+    return fixture
+
+
+def test_generate_report(fixture, config, tmp_path):
+    result = api.generate_report(
+        "project_summary",
+        PROJECT,
+        str(tmp_path),
+        config=config,
+        statusdb_client=backends.FileBackend(fixture),
+        signature="NGI",
+    )
+    assert result.status == "written"
+    assert result.files
+    for fname in result.files:
+        assert os.path.dirname(fname) == str(tmp_path / "reports")
+        assert os.path.exists(fname)
+
+
+def test_markdown_to_html_next_to_markdown(tmp_path):
+    md_dir = tmp_path / "md_reports"
+    md_dir.mkdir()
+    markdown_path = md_dir / "P10000_project_summary.md"
+    markdown_path.write_text("# Project summary\n")
+    html_path = api.markdown_to_html(
+        "project_summary",
+        jinja2_env=templates.get_environment(api.REPORTS_DIR),
+        markdown_path=str(markdown_path),
+        reports_dir=api.REPORTS_DIR,
+    )
+    assert html_path == str(md_dir / "P10000_project_summary.html")
+    assert os.path.exists(html_path)
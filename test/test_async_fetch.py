@@ -0,0 +1,81 @@
+"""Flowcells looked up and fetched while the samples are processed with --async_fetch,
+see Project.populate_async"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+import synthetic
+
+from ngi_reports.utils import entities, statusdb
+from ngi_reports.utils.entities import Project
+
+PROJECT = "P10000"
+# Seconds added to every request, so that the requests take longer than the processing
+LATENCY = 0.02
+
+
+@pytest.fixture(params=["illumina", "element", "ont"])
+def fixture(request):
+    fixture, project_id = synthetic.project_fixture(
+        platform=request.param,
+        samples=8,
+        preps=2,
+        flowcells=3,
+        lanes=2,
+        other_projects=2,
+        other_samples=4,
+        other_runs=4,
+        project_id=PROJECT,
+    )
+    return fixture
+
+
+def state(value):
+    """The values of an entity and of the entities it holds, for comparison"""
+    if isinstance(value, (dict, OrderedDict)):
+        return {key: state(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [state(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, statusdb.statusdb_connection):
+        return type(value).__name__
+    if type(value).__module__ != entities.__name__:
+        return value
+    names = list(getattr(value, "__dict__", {}))
+    names += [
+        name for cls in type(value).__mro__ for name in getattr(cls, "__slots__", ())
+    ]
+    return {name: state(getattr(value, name)) for name in names if hasattr(value, name)}
+
+
+def test_same_entities(fixture, populate):
+    proj = populate(fixture, PROJECT, latency=LATENCY)
+    async_proj = populate(fixture, PROJECT, latency=LATENCY, async_fetch=True)
+    assert async_proj.flowcells
+    assert state(async_proj) == state(proj)
+
+
+def test_lookup_overlaps_samples(fixture, populate, monkeypatch):
+    lookup_started = threading.Event()
+    overlapped = []
+    populate_samples = Project.populate_samples
+    lookup_flowcells = Project.lookup_flowcells
+
+    def waiting_populate_samples(self, *args, **kwargs):
+        # Only returns early if the flowcells are looked up at the same time
+        overlapped.append(lookup_started.wait(timeout=10))
+        return populate_samples(self, *args, **kwargs)
+
+    def signalling_lookup_flowcells(self, *args, **kwargs):
+        lookup_started.set()
+        return lookup_flowcells(self, *args, **kwargs)
+
+    monkeypatch.setattr(Project, "populate_samples", waiting_populate_samples)
+    monkeypatch.setattr(Project, "lookup_flowcells", signalling_lookup_flowcells)
+    proj = populate(fixture, PROJECT, latency=LATENCY, async_fetch=True)
+    assert overlapped == [True]
+    assert proj.samples
+    assert proj.flowcells
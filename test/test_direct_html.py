@@ -0,0 +1,80 @@
+"""The HTML reports made with --direct_html are the same as those converted from
+the markdown reports"""
+
+import pytest
+import synthetic
+
+from ngi_reports import api
+from ngi_reports.utils import converter, templates
+
+PROJECT = "P10000"
+
+# User IDs with text that Markdown converts or escapes in the tables
+CUSTOMER_NAMES = [
+    "plain_name",
+    "a&amp;b",
+    "T&C",
+    "*emphasis* and **strong**",
+    "`code`",
+    "raw <b>html</b>",
+    "<d>",
+    "_underscores_ in__name",
+    "[link](http://example.com)",
+    "back\\*slash",
+    "x > y < z",
+    "quotes ' \"",
+]
+
+
+@pytest.fixture(params=["illumina", "element", "ont"])
+def fixture(request):
+    """Project with a sample of every User ID, two of which are aborted or not
+    sequenced so that they are listed in the aborted samples table"""
+    fixture, project_id = synthetic.project_fixture(
+        platform=request.param,
+        samples=len(CUSTOMER_NAMES),
+        preps=2,
+        flowcells=2,
+        lanes=2,
+        other_projects=1,
+        other_samples=2,
+        other_runs=2,
+        project_id=PROJECT,
+    )
+    samples = fixture["docs"]["projects"][f"doc_{PROJECT}"]["samples"]
+    for sample, customer_name in zip(samples.values(), CUSTOMER_NAMES):
+        sample["customer_name"] = customer_name
+        sample["details"].pop("status_(manual)", None)
+    samples[f"{PROJECT}_1002"]["details"]["status_(manual)"] = "Aborted"
+    del samples[f"{PROJECT}_1004"]["details"]["total_reads_(m)"]
+    return fixture
+
+
+@pytest.mark.parametrize("text", CUSTOMER_NAMES + ["", "NA", "P10000_1001"])
+def test_html_text(text):
+    assert templates.html_text(text) == templates.markdown_cell(text)
+    assert templates.html_code(text) == templates.markdown_cell(f"`{text}`")
+
+
+def test_same_html(fixture, populate, log, tmp_path):
+    proj = populate(fixture, PROJECT)
+    env = templates.get_environment(cache_dir=False)
+    template = env.get_template("project_summary.md")
+    report = api.get_report_module("project_summary", proj).Report(
+        log, str(tmp_path), signature="Signature", project=PROJECT
+    )
+    (markdown_text,) = report.generate_report_template(
+        proj, template, "support@example.com"
+    ).values()
+    html_tables_text = report.render_template(proj, template, html_tables=True)
+    assert "<table>" in html_tables_text
+
+    html = converter.get_converter("project_summary", jinja2_env=env).convert(
+        markdown_text
+    )
+    direct_html = converter.get_converter(
+        "project_summary", jinja2_env=env, html_tables=True
+    ).convert(html_tables_text)
+    assert direct_html == html
+    # The User IDs are written in code spans in the sample table
+    assert "<code>T&amp;C</code>" in html
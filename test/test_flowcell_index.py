@@ -0,0 +1,129 @@
+"""Flowcells of a project looked up in the local flowcell index, kept up to date from
+the changes feed of the run database, see flowcell_index.FlowcellIndex"""
+
+import logging
+from datetime import datetime
+
+import pytest
+import synthetic
+
+from ngi_reports.utils import backends, flowcell_index, statusdb
+from ngi_reports.utils.flowcell_index import FlowcellIndex
+
+PROJECT = "P10000"
+OPEN_DATE = datetime(2024, 1, 1)
+DBNAME = "x_flowcells"
+VIEW = f"{DBNAME}/names/project_ids_list"
+
+
+@pytest.fixture
+def backend():
+    """Project sequenced on three runs in January 2024, among runs of other projects
+    from December 2023 to January 2024"""
+    fixture, project_id = synthetic.project_fixture(
+        platform="illumina",
+        samples=2,
+        flowcells=3,
+        lanes=1,
+        other_projects=1,
+        other_samples=1,
+        other_runs=10,
+        project_id=PROJECT,
+    )
+    return backends.FileBackend(fixture)
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    """Names of the databases indexed in full"""
+    rebuilt = []
+    rebuild = FlowcellIndex._rebuild
+
+    def counting_rebuild(self, con, run_connection):
+        rebuilt.append(run_connection.dbname)
+        return rebuild(self, con, run_connection)
+
+    monkeypatch.setattr(FlowcellIndex, "_rebuild", counting_rebuild)
+    return rebuilt
+
+
+def project_runs(backend, index_path):
+    """Refresh the index as a new process would and look up the runs of the project"""
+    index = FlowcellIndex(str(index_path))
+    index.refresh(statusdb.X_FlowcellRunMetricsConnection(client=backend))
+    return index.project_runs(DBNAME, PROJECT, OPEN_DATE)
+
+
+def add_run(backend, run_name, project_ids):
+    doc_id = f"doc_{run_name}"
+    backend.put_document(
+        DBNAME,
+        {"_id": doc_id, "_rev": "1-added"},
+        {VIEW: [{"key": run_name, "value": project_ids}]},
+    )
+
+
+def test_rebuild(backend, rebuilds, tmp_path):
+    assert project_runs(backend, tmp_path / "index.sqlite") == [
+        "240122_22S0002LT3",
+        "240115_22S0001LT3",
+        "240108_22S0000LT3",
+    ]
+    assert rebuilds == [DBNAME]
+
+
+def test_incremental_update(backend, rebuilds, tmp_path):
+    index_path = tmp_path / "index.sqlite"
+    project_runs(backend, index_path)
+
+    # A new run, a run of another project that now lists the project, and a deleted run
+    add_run(backend, "240129_22S0003LT3", [PROJECT])
+    (other_run,) = [
+        row for row in backend.views[VIEW] if row["key"] == "240104_22U0006LT3"
+    ]
+    add_run(backend, other_run["key"], other_run["value"] + [PROJECT])
+    backend.delete_document(DBNAME, "doc_240115_22S0001LT3")
+
+    expected = [
+        "240129_22S0003LT3",
+        "240122_22S0002LT3",
+        "240108_22S0000LT3",
+        "240104_22U0006LT3",
+    ]
+    assert project_runs(backend, index_path) == expected
+    assert rebuilds == [DBNAME]
+    # Nothing changed since, the index is used as it is
+    assert project_runs(backend, index_path) == expected
+    assert rebuilds == [DBNAME]
+    assert project_runs(backend, tmp_path / "fresh.sqlite") == expected
+
+
+def test_backdated_run(backend, rebuilds, tmp_path):
+    index_path = tmp_path / "index.sqlite"
+    project_runs(backend, index_path)
+
+    # Dated before the runs that are looked for new ones among, so all runs are indexed again
+    add_run(backend, "240102_22S0004LT3", [PROJECT])
+    assert project_runs(backend, index_path) == [
+        "240122_22S0002LT3",
+        "240115_22S0001LT3",
+        "240108_22S0000LT3",
+        "240102_22S0004LT3",
+    ]
+    assert rebuilds == [DBNAME, DBNAME]
+
+
+def test_index_fetch_mode(backend, tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(
+        flowcell_index, "DEFAULT_INDEX_PATH", str(tmp_path / "index.sqlite")
+    )
+    log = logging.getLogger("ngi_reports_test")
+    flowcells = {}
+    for fetch_mode in ["index", "bounded"]:
+        connection = statusdb.X_FlowcellRunMetricsConnection(
+            fetch_mode=fetch_mode, log=log, client=backend
+        )
+        flowcells[fetch_mode] = connection.get_project_flowcell(PROJECT, "2024-01-01")
+    assert not caplog.records
+    assert list(flowcells["index"]) == ["22S0002LT3", "22S0001LT3", "22S0000LT3"]
+    assert flowcells["index"] == flowcells["bounded"]
@@ -0,0 +1,119 @@
+"""Barcodes taken from the flowcells with --barcode_from_fc, see Project.replace_barcodes"""
+
+import pytest
+import synthetic
+
+from ngi_reports.utils import errors
+
+PROJECT = "P10000"
+# Run names and flowcell names of the two runs of the project, the first is the older
+RUNS = ["240108_22S0000LT3", "240115_22S0001LT3"]
+FLOWCELLS = ["22S0000LT3", "22S0001LT3"]
+# Sample sequenced on the first run that is not in LIMS
+UNDETERMINED = f"{PROJECT}_1099"
+
+
+def barcode(run, sample, lane):
+    return f"R{run}S{sample[-1]}L{lane}+AC"
+
+
+@pytest.fixture
+def fixture():
+    """Project of three samples with two preps each. Prep A was sequenced on both
+    runs, prep B on the second run only. The barcode rows of a sample on a run
+    differ by lane, and the first run has a sample more than LIMS."""
+    fixture, project_id = synthetic.project_fixture(
+        platform="illumina",
+        samples=3,
+        preps=2,
+        flowcells=2,
+        lanes=2,
+        other_projects=1,
+        other_samples=2,
+        other_runs=0,
+        project_id=PROJECT,
+    )
+    for sample in fixture["docs"]["projects"][f"doc_{PROJECT}"]["samples"].values():
+        sample["details"].pop("status_(manual)", None)
+        sample["library_prep"]["A"]["sequenced_fc"] = list(RUNS)
+        sample["library_prep"]["B"]["sequenced_fc"] = [RUNS[1]]
+    for r, run_name in enumerate(RUNS):
+        run = fixture["docs"]["x_flowcells"][f"doc_{run_name}"]
+        rows = run["illumina"]["Demultiplex_Stats"]["Barcode_lane_statistics"]
+        if r == 0:
+            for lane in ["1", "2"]:
+                rows.append(dict(rows[0], Lane=lane, Sample=UNDETERMINED))
+                run["samplesheet_csv"].append(
+                    dict(run["samplesheet_csv"][0], Lane=lane, Sample_Name=UNDETERMINED)
+                )
+        for row in rows:
+            if row["Sample"].startswith(PROJECT):
+                row["Barcode sequence"] = barcode(r, row["Sample"], row["Lane"])
+    return fixture
+
+
+def lims_barcode(fixture, sample, prep):
+    doc = fixture["docs"]["projects"][f"doc_{PROJECT}"]
+    return doc["samples"][sample]["library_prep"][prep]["reagent_label"]
+
+
+def test_barcodes_from_flowcells(fixture, populate):
+    proj = populate(fixture, PROJECT, barcode_from_fc=True)
+    barcodes = {
+        (sample, prep): prepObj.barcode
+        for sample, sampleObj in proj.samples.items()
+        for prep, prepObj in sampleObj.preps.items()
+    }
+    # The flowcells are processed newest first, so the older run sets prep A
+    assert barcodes == {
+        ("P10000_1001", "A"): "R0S1L2-AC",
+        ("P10000_1001", "B"): "R1S1L2-AC",
+        ("P10000_1002", "A"): "R0S2L2-AC",
+        ("P10000_1002", "B"): "R1S2L2-AC",
+        ("P10000_1003", "A"): "R0S3L2-AC",
+        ("P10000_1003", "B"): "R1S3L2-AC",
+        (UNDETERMINED, "NA"): "R0S9L2-AC",
+    }
+
+
+def test_seq_fc_of_preps(fixture, populate):
+    proj = populate(fixture, PROJECT, barcode_from_fc=True)
+    for sample in ["P10000_1001", "P10000_1002", "P10000_1003"]:
+        assert proj.samples[sample].preps["A"].seq_fc == FLOWCELLS
+        assert proj.samples[sample].preps["B"].seq_fc == FLOWCELLS[1:]
+    assert proj.samples[UNDETERMINED].preps["NA"].seq_fc == []
+
+
+def test_unknown_additional_samples(fixture, populate):
+    proj = populate(fixture, PROJECT, barcode_from_fc=True)
+    assert list(proj.samples) == [
+        "P10000_1001",
+        "P10000_1002",
+        "P10000_1003",
+        UNDETERMINED,
+    ]
+    sample = proj.samples[UNDETERMINED]
+    assert sample.customer_name == "unknown1"
+    assert sample.status == "Sequenced"
+    assert sample.initial_qc == {"initial_qc_status": "NA"}
+    assert list(sample.preps) == ["NA"]
+    assert sample.preps["NA"].label == "NA"
+
+
+def test_exclude_fc(fixture, populate):
+    proj = populate(fixture, PROJECT, barcode_from_fc=True, exclude_fc=[FLOWCELLS[1]])
+    assert list(proj.flowcells) == FLOWCELLS[:1]
+    for sample in ["P10000_1001", "P10000_1002", "P10000_1003"]:
+        assert proj.samples[sample].preps["A"].barcode == f"R0S{sample[-1]}L2-AC"
+        # Only sequenced on the excluded flowcell, so the barcode from LIMS is kept
+        assert proj.samples[sample].preps["B"].barcode == lims_barcode(
+            fixture, sample, "B"
+        )
+    assert proj.samples[UNDETERMINED].preps["NA"].barcode == "R0S9L2-AC"
+
+
+def test_missing_sequenced_fc(fixture, populate):
+    doc = fixture["docs"]["projects"][f"doc_{PROJECT}"]
+    del doc["samples"]["P10000_1002"]["library_prep"]["B"]["sequenced_fc"]
+    with pytest.raises(errors.DataError):
+        populate(fixture, PROJECT, barcode_from_fc=True)
@@ -0,0 +1,131 @@
+"""Run documents streamed from StatusDB and parsed incrementally, keeping only the
+parts of the reported project, see statusdb.iter_stream_rows"""
+
+import io
+import json
+import tracemalloc
+
+import pytest
+import requests
+import synthetic
+
+from ngi_reports.utils import backends, statusdb
+from ngi_reports.utils.entities import (
+    extract_project_fc_details,
+    project_fc_fields,
+    row_in_projects,
+    samplesheet_row_in_projects,
+)
+
+PROJECT = "P10000"
+PROJECT_NAME = "A.Synthetic_10000_24_01"
+CONNECTIONS = {
+    "illumina": statusdb.X_FlowcellRunMetricsConnection,
+    "element": statusdb.ElementRunConnection,
+    "ont": statusdb.NanoporeRunConnection,
+}
+
+
+def project_runs(platform):
+    fixture, project_id = synthetic.project_fixture(
+        platform=platform,
+        samples=4,
+        flowcells=2,
+        lanes=2,
+        other_projects=3,
+        other_samples=4,
+        other_runs=2,
+        project_id=PROJECT,
+    )
+    return fixture, synthetic.PLATFORMS[platform][0]
+
+
+@pytest.mark.parametrize("platform", ["illumina", "element", "ont"])
+def test_same_as_extracted(platform):
+    fixture, dbname = project_runs(platform)
+    connection = CONNECTIONS[platform](client=backends.FileBackend(fixture))
+    view = fixture["views"][f"{dbname}/names/project_ids_list"]
+    fields = project_fc_fields({PROJECT_NAME}, {PROJECT})
+
+    def extract(doc):
+        return extract_project_fc_details(doc, {PROJECT_NAME}, {PROJECT})
+
+    streamed = connection.get_entries([row["key"] for row in view], extract, fields)
+    assert streamed == {
+        row["key"]: extract(fixture["docs"][dbname][row["id"]]) for row in view
+    }
+
+
+def test_rows_of_other_projects_dropped():
+    fixture, dbname = project_runs("illumina")
+    result = backends.FileBackend(fixture).post_all_docs(
+        dbname, keys=list(fixture["docs"][dbname]), include_docs=True
+    )
+    rows = list(
+        statusdb.iter_stream_rows(
+            backends.StreamedResponse(result.get_result()["rows"]),
+            project_fc_fields({PROJECT_NAME}, {PROJECT}),
+        )
+    )
+    assert [row["id"] for row in rows] == list(fixture["docs"][dbname])
+    parsed = [row["doc"] for row in rows if "illumina" in row["doc"]]
+    assert parsed
+    for doc in parsed:
+        original = fixture["docs"][dbname][doc["_id"]]
+        barcode_rows = original["illumina"]["Demultiplex_Stats"][
+            "Barcode_lane_statistics"
+        ]
+        project_rows = [
+            row for row in barcode_rows if row_in_projects(row, {PROJECT_NAME})
+        ]
+        assert 0 < len(project_rows) < len(barcode_rows)
+        assert (
+            doc["illumina"]["Demultiplex_Stats"]["Barcode_lane_statistics"]
+            == project_rows
+        )
+        samplesheet_rows = [
+            row
+            for row in original["samplesheet_csv"]
+            if samplesheet_row_in_projects(row, {PROJECT})
+        ]
+        assert 0 < len(samplesheet_rows) < len(original["samplesheet_csv"])
+        assert doc["samplesheet_csv"] == samplesheet_rows
+
+
+def test_memory_bounded_by_project_share():
+    """Parsing a run with many samples of other projects takes a fraction of the
+    memory of the whole document"""
+    fixture, project_id = synthetic.project_fixture(
+        platform="illumina",
+        samples=2,
+        flowcells=1,
+        lanes=8,
+        other_projects=10,
+        other_samples=96,
+        other_runs=0,
+        project_id=PROJECT,
+    )
+    dbname = synthetic.PLATFORMS["illumina"][0]
+    content = json.dumps(
+        backends.FileBackend(fixture)
+        .post_all_docs(dbname, keys=list(fixture["docs"][dbname]), include_docs=True)
+        .get_result()
+    ).encode("utf-8")
+    # The HTTP response of the Cloudant client, with the content still to be read
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(content)
+
+    tracemalloc.start()
+    json.loads(content)
+    whole = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    rows = list(
+        statusdb.iter_stream_rows(
+            response, project_fc_fields({PROJECT_NAME}, {PROJECT})
+        )
+    )
+    streamed = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert [row["id"] for row in rows] == list(fixture["docs"][dbname])
+    assert streamed < whole / 5